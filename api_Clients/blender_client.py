@@ -1,22 +1,43 @@
 import os
+import signal
 import subprocess
 import tempfile
+import threading
 import shutil
 import time
 import re
-from typing import Optional
+import uuid
+from typing import Dict, List, Optional, Tuple
 from config_loader import get_config
+from event_bus import JobEvents
+from api_Clients.blender_remote import WorkerPool
+import metrics
+
+
+BLENDER_SECONDS = metrics.histogram('lighthouse_blender_seconds', 'Blender run time per job')
+BLENDER_EXITS = metrics.counter('lighthouse_blender_exits_total', 'Blender runs by exit code')
 
 
 class BlenderClient:
     
     def __init__(self):
-        cfg = get_config()
-        self.format = cfg.get('ai', 'reconstruction', 'output_format', default='glb')
-        self.blender_path = cfg.get('ai', 'reconstruction', 'blender_path', default='blender')
-        self.config = cfg
+        self.config = get_config()
         self.output_dir = 'models'
         os.makedirs(self.output_dir, exist_ok=True)
+        self.configure()
+        self.config.subscribe(self.configure, 'ai.reconstruction', 'app.cancel_grace_seconds')
+    
+    def configure(self, changed: Optional[List[str]] = None):
+        cfg = self.config
+        self.format = cfg.get('ai', 'reconstruction', 'output_format')
+        self.blender_path = cfg.get('ai', 'reconstruction', 'blender_path')
+        self.thumbnail = cfg.get('ai', 'reconstruction', 'thumbnail', 'enabled')
+        self.thumbnail_size = cfg.get('ai', 'reconstruction', 'thumbnail', 'size')
+        self.thumbnail_engine = cfg.get('ai', 'reconstruction', 'thumbnail', 'engine')
+        self.timeout = cfg.get('ai', 'reconstruction', 'timeout_seconds')
+        self.kill_grace = cfg.get('app', 'cancel_grace_seconds')
+        if changed is None or any(k.startswith('ai.reconstruction.remote.') for k in changed):
+            self.remote = WorkerPool()
     
     def _sanitize_code(self, raw_code: str) -> str:
         code = raw_code.strip()
@@ -41,26 +62,48 @@ class BlenderClient:
         
         return code
     
-    def generate_3d_model(self, code: str, progress_callback=None) -> Optional[str]:
+    def generate_3d_model(
+        self,
+        code: str,
+        events: Optional[JobEvents] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Optional[str]:
+        path, _ = self.generate_3d_model_with_thumbnail(code, events, cancel)
+        return path
+    
+    def generate_3d_model_with_thumbnail(
+        self,
+        code: str,
+        events: Optional[JobEvents] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
         try:
-            if progress_callback:
-                progress_callback("Preparing script...", 10)
+            if events:
+                events.progress("Preparing script...", 10)
             
             sanitized_code = self._sanitize_code(code)
+            output_abs, thumb_abs = self._output_paths(events.job_id if events else None)
+            full_script = self._wrap_code(sanitized_code, output_abs, thumb_abs)
+            
+            if self.remote.enabled:
+                result = self._run_remote(full_script, output_abs, thumb_abs, events, cancel)
+                if result:
+                    return result
+                if not self.remote.local_fallback:
+                    raise Exception("No Blender worker available")
+                print("[INFO] No Blender worker available, running Blender locally")
             
             script_file = tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False)
             script_path = script_file.name
             
             try:
-                full_script = self._wrap_code(sanitized_code, script_path)
                 script_file.write(full_script)
                 script_file.close()
                 
-                if progress_callback:
-                    progress_callback("Executing Blender...", 30)
+                if events:
+                    events.progress("Executing Blender...", 30)
                 
-                output_path = self._run_script(script_path, progress_callback)
-                return output_path
+                return self._run_script(script_path, events, cancel)
             
             finally:
                 try:
@@ -71,14 +114,45 @@ class BlenderClient:
         except Exception as e:
             raise Exception(f"Blender error: {str(e)}")
     
-    def _wrap_code(self, user_code: str, script_path: str) -> str:
-        ts = int(time.time())
-        filename = f"model_{ts}.{self.format}"
+    def _output_paths(self, job_id: Optional[str] = None) -> Tuple[str, str]:
+        job = re.sub(r'[^A-Za-z0-9-]', '', job_id or '')[:24] or str(time.time_ns())
+        filename = f"model_{job}_{uuid.uuid4().hex[:8]}.{self.format}"
         output_path = os.path.join(self.output_dir, filename)
         output_abs = os.path.abspath(output_path)
+        thumb_abs = os.path.splitext(output_abs)[0] + '_thumb.png'
         
         os.makedirs(self.output_dir, exist_ok=True)
+        return output_abs, thumb_abs
+    
+    def _run_remote(
+        self,
+        script: str,
+        output_abs: str,
+        thumb_abs: str,
+        events: Optional[JobEvents] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Optional[Tuple[str, Optional[str]]]:
+        start = time.perf_counter()
+        result = self.remote.run(script, self.format, self.thumbnail, self.timeout, events, cancel)
+        if result is None:
+            return None
         
+        worker, model, thumb = result
+        BLENDER_SECONDS.observe(time.perf_counter() - start, worker=worker)
+        with open(output_abs, 'wb') as f:
+            f.write(model)
+        thumb_path = None
+        if thumb:
+            with open(thumb_abs, 'wb') as f:
+                f.write(thumb)
+            thumb_path = thumb_abs
+        
+        if events:
+            events.progress("Model generated!", 100)
+        
+        return output_abs, thumb_path
+    
+    def _wrap_code(self, user_code: str, output_abs: str, thumb_abs: str) -> str:
         wrapper = f"""import bpy
 import sys
 import os
@@ -88,7 +162,7 @@ bpy.ops.object.delete(use_global=False)
 
 {user_code}
 
-output_path = r"{output_abs}"
+output_path = os.environ.get("LIGHTHOUSE_OUTPUT") or r"{output_abs}"
 
 try:
     bpy.ops.object.select_all(action='SELECT')
@@ -119,16 +193,81 @@ try:
         )
     
     print(f"SUCCESS: Model exported to {{output_path}}")
-    
+
 except Exception as e:
     print(f"ERROR: Export failed: {{e}}")
     sys.exit(1)
 """
+        if self.thumbnail:
+            wrapper += self._thumbnail_code(thumb_abs)
         return wrapper
     
-    def _run_script(self, script_path: str, progress_callback=None) -> str:
-        if progress_callback:
-            progress_callback("Running Blender...", 50)
+    def _thumbnail_code(self, thumb_abs: str) -> str:
+        return f"""
+thumb_path = os.environ.get("LIGHTHOUSE_THUMBNAIL") or r"{thumb_abs}"
+
+try:
+    from mathutils import Vector
+    
+    scene = bpy.context.scene
+    meshes = [o for o in scene.objects if o.type == 'MESH' and o.select_get()]
+    if not meshes:
+        meshes = [o for o in scene.objects if o.type == 'MESH']
+    
+    corners = [o.matrix_world @ Vector(c) for o in meshes for c in o.bound_box]
+    lo = Vector((min(p.x for p in corners), min(p.y for p in corners), min(p.z for p in corners)))
+    hi = Vector((max(p.x for p in corners), max(p.y for p in corners), max(p.z for p in corners)))
+    center = (lo + hi) / 2
+    radius = max((hi - lo).length / 2, 0.01)
+    
+    cam_data = bpy.data.cameras.new("ThumbnailCamera")
+    cam = bpy.data.objects.new("ThumbnailCamera", cam_data)
+    scene.collection.objects.link(cam)
+    cam.location = center + Vector((1.0, -1.0, 0.7)).normalized() * radius * 3.2
+    cam.rotation_euler = (center - cam.location).to_track_quat('-Z', 'Y').to_euler()
+    cam_data.clip_end = radius * 20
+    scene.camera = cam
+    
+    if "{self.thumbnail_engine}" == "eevee":
+        sun_data = bpy.data.lights.new("ThumbnailSun", type='SUN')
+        sun = bpy.data.objects.new("ThumbnailSun", sun_data)
+        scene.collection.objects.link(sun)
+        sun.rotation_euler = cam.rotation_euler
+        for engine in ('BLENDER_EEVEE_NEXT', 'BLENDER_EEVEE'):
+            try:
+                scene.render.engine = engine
+                break
+            except TypeError:
+                pass
+    else:
+        scene.render.engine = 'BLENDER_WORKBENCH'
+        scene.display.shading.light = 'STUDIO'
+        scene.display.shading.color_type = 'MATERIAL'
+    
+    scene.render.resolution_x = {self.thumbnail_size}
+    scene.render.resolution_y = {self.thumbnail_size}
+    scene.render.resolution_percentage = 100
+    scene.render.film_transparent = True
+    scene.render.image_settings.file_format = 'PNG'
+    scene.render.filepath = thumb_path
+    bpy.ops.render.render(write_still=True)
+    
+    print(f"THUMBNAIL: Preview rendered to {{thumb_path}}")
+
+except Exception as e:
+    print(f"WARNING: Thumbnail render failed: {{e}}")
+"""
+    
+    def _run_script(
+        self,
+        script_path: str,
+        events: Optional[JobEvents] = None,
+        cancel: Optional[threading.Event] = None,
+        env: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ) -> Tuple[str, Optional[str]]:
+        if events:
+            events.progress("Running Blender...", 50)
         
         blender_cmd = self._find_blender()
         
@@ -138,36 +277,75 @@ except Exception as e:
             '--python', script_path
         ]
         
+        start = time.perf_counter()
         try:
-            result = subprocess.run(
+            proc = subprocess.Popen(
                 cmd,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
-                timeout=120,
-                check=False
+                start_new_session=True,
+                env=dict(os.environ, **env) if env else None
             )
-            
-            if result.returncode != 0:
-                error_msg = result.stderr or result.stdout
-                raise Exception(f"Blender failed: {error_msg}")
-            
-            output_path = self._extract_path(result.stdout)
-            
-            if not output_path or not os.path.exists(output_path):
-                raise Exception("Model file not created")
-            
-            if progress_callback:
-                progress_callback("Model generated!", 100)
-            
-            return output_path
-        
-        except subprocess.TimeoutExpired:
-            raise Exception("Blender timed out")
         except FileNotFoundError:
+            BLENDER_EXITS.inc(code='not_found')
             raise Exception(f"Blender not found: {blender_cmd}")
+        
+        deadline = start + (timeout or self.timeout)
+        while True:
+            try:
+                stdout, stderr = proc.communicate(timeout=0.1)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel and cancel.is_set():
+                    self._kill(proc)
+                    BLENDER_SECONDS.observe(time.perf_counter() - start)
+                    BLENDER_EXITS.inc(code='cancelled')
+                    raise Exception("Blender cancelled")
+                if time.perf_counter() > deadline:
+                    self._kill(proc)
+                    BLENDER_SECONDS.observe(time.perf_counter() - start)
+                    BLENDER_EXITS.inc(code='timeout')
+                    raise Exception("Blender timed out")
+        
+        BLENDER_SECONDS.observe(time.perf_counter() - start)
+        BLENDER_EXITS.inc(code=proc.returncode)
+        
+        if proc.returncode != 0:
+            error_msg = stderr or stdout
+            raise Exception(f"Blender failed: {error_msg}")
+        
+        output_path = self._extract_path(stdout)
+        
+        if not output_path or not os.path.exists(output_path):
+            raise Exception("Model file not created")
+        
+        if events:
+            events.progress("Model generated!", 100)
+        
+        return output_path, self._extract_thumbnail(stdout)
+    
+    def _kill(self, proc: subprocess.Popen):
+        def signal_group(sig):
+            try:
+                if hasattr(os, 'killpg'):
+                    os.killpg(proc.pid, sig)
+                elif sig == signal.SIGTERM:
+                    proc.terminate()
+                else:
+                    proc.kill()
+            except (ProcessLookupError, PermissionError):
+                pass
+        
+        signal_group(signal.SIGTERM)
+        try:
+            proc.communicate(timeout=self.kill_grace)
+        except subprocess.TimeoutExpired:
+            signal_group(getattr(signal, 'SIGKILL', signal.SIGTERM))
+            proc.communicate()
     
     def _find_blender(self) -> str:
-        configured = self.config.get('ai', 'reconstruction', 'blender_path', default='')
+        configured = self.blender_path
         if configured and os.path.exists(configured):
             return configured
         
@@ -194,3 +372,11 @@ except Exception as e:
                     if os.path.exists(path):
                         return path
         return None
+    
+    def _extract_thumbnail(self, stdout: str) -> Optional[str]:
+        for line in stdout.split('\n'):
+            if 'THUMBNAIL:' in line and 'Preview rendered to' in line:
+                path = line.split('Preview rendered to', 1)[1].strip()
+                if os.path.exists(path):
+                    return path
+        return None
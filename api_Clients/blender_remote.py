@@ -0,0 +1,249 @@
+import json
+import select
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from config_loader import get_config
+from event_bus import JobEvents
+import metrics
+
+
+PROTOCOL_VERSION = 1
+MAX_HEADER = 1024 * 1024
+
+REMOTE_RUNS = metrics.counter('lighthouse_blender_remote_runs_total', 'Remote Blender runs by worker and result')
+WORKER_UP = metrics.gauge('lighthouse_blender_worker_up', 'Whether a remote Blender worker answered its last status check')
+
+
+class WorkerError(Exception):
+    pass
+
+
+class WorkerBusy(WorkerError):
+    pass
+
+
+def send_message(sock: socket.socket, header: Dict[str, Any], payload: bytes = b''):
+    header = dict(header, size=len(payload))
+    data = json.dumps(header).encode('utf-8')
+    sock.sendall(struct.pack('>I', len(data)) + data + payload)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    chunks = []
+    while n > 0:
+        chunk = sock.recv(min(n, 1024 * 1024))
+        if not chunk:
+            raise WorkerError("Connection closed")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Tuple[Dict[str, Any], bytes]:
+    length, = struct.unpack('>I', _recv_exact(sock, 4))
+    if length > MAX_HEADER:
+        raise WorkerError(f"Oversized header ({length} bytes)")
+    try:
+        header = json.loads(_recv_exact(sock, length))
+    except ValueError as e:
+        raise WorkerError(f"Malformed header: {e}")
+    size = header.get('size', 0)
+    return header, _recv_exact(sock, size) if size else b''
+
+
+def parse_address(address: str, default_port: int = 9555) -> Tuple[str, int]:
+    host, _, port = address.rpartition(':')
+    if not host:
+        return address, default_port
+    return host.strip('[]'), int(port)
+
+
+class RemoteWorker:
+    
+    def __init__(self, address: str, token: str, connect_timeout: float, idle_timeout: float):
+        self.address = address
+        self.host, self.port = parse_address(address)
+        self.token = token
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.failures = 0
+        self.down_until = 0.0
+        self.last_status: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+    
+    def _connect(self, timeout: float) -> socket.socket:
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=timeout)
+        except OSError as e:
+            raise WorkerError(f"Cannot reach {self.address}: {e}")
+        sock.settimeout(self.idle_timeout)
+        return sock
+    
+    def _request(self, kind: str, **fields) -> Dict[str, Any]:
+        return dict(fields, type=kind, version=PROTOCOL_VERSION, token=self.token)
+    
+    def status(self, timeout: float) -> Dict[str, Any]:
+        start = time.perf_counter()
+        with self._connect(timeout) as sock:
+            sock.settimeout(timeout)
+            try:
+                send_message(sock, self._request('status'))
+                header, _ = recv_message(sock)
+            except OSError as e:
+                raise WorkerError(f"Status from {self.address} failed: {e}")
+        if header.get('type') != 'status':
+            raise WorkerError(f"{self.address}: {header.get('message', 'unexpected status reply')}")
+        header['latency'] = time.perf_counter() - start
+        return header
+    
+    def load(self) -> float:
+        status = self.last_status or {}
+        return (status.get('active', 0) + status.get('queued', 0)) / max(1, status.get('slots', 1))
+    
+    def run(
+        self,
+        script: str,
+        fmt: str,
+        thumbnail: bool,
+        timeout: float,
+        events: Optional[JobEvents] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Tuple[bytes, Optional[bytes]]:
+        with self._connect(self.connect_timeout) as sock:
+            try:
+                send_message(
+                    sock,
+                    self._request('run', format=fmt, thumbnail=thumbnail, timeout=timeout),
+                    script.encode('utf-8')
+                )
+                while True:
+                    idle = time.perf_counter() + self.idle_timeout
+                    while not select.select([sock], [], [], 0.1)[0]:
+                        if cancel and cancel.is_set():
+                            send_message(sock, self._request('cancel'))
+                            cancel = None
+                        if time.perf_counter() > idle:
+                            raise WorkerError(f"{self.address} stopped responding")
+                    header, payload = recv_message(sock)
+                    kind = header.get('type')
+                    if kind == 'progress':
+                        if events:
+                            events.progress(f"{header.get('message', '')} [{self.address}]", header.get('progress', 50))
+                    elif kind == 'result':
+                        model_size = header.get('model_size', 0)
+                        return payload[:model_size], payload[model_size:] or None
+                    elif kind == 'error':
+                        error = header.get('kind', 'worker')
+                        message = header.get('message', 'unknown error')
+                        if error == 'blender':
+                            raise Exception(f"Blender failed on {self.address}: {message}")
+                        if error == 'cancelled':
+                            raise Exception("Blender cancelled")
+                        if error == 'busy':
+                            raise WorkerBusy(f"{self.address} is busy: {message}")
+                        raise WorkerError(f"{self.address} refused the job ({error}): {message}")
+                    else:
+                        raise WorkerError(f"{self.address} sent an unexpected {kind!r} message")
+            except OSError as e:
+                raise WorkerError(f"Connection to {self.address} failed: {e}")
+
+
+class WorkerPool:
+    
+    def __init__(self):
+        cfg = get_config()
+        addresses = cfg.get('ai', 'reconstruction', 'remote', 'workers')
+        token = cfg.get('ai', 'reconstruction', 'remote', 'token')
+        connect_timeout = cfg.get('ai', 'reconstruction', 'remote', 'connect_timeout_seconds')
+        idle_timeout = cfg.get('ai', 'reconstruction', 'remote', 'idle_timeout_seconds')
+        self.status_timeout = cfg.get('ai', 'reconstruction', 'remote', 'status_timeout_seconds')
+        self.retry_after = cfg.get('ai', 'reconstruction', 'remote', 'retry_seconds')
+        self.local_fallback = cfg.get('ai', 'reconstruction', 'remote', 'local_fallback')
+        self.workers = [RemoteWorker(a, token, connect_timeout, idle_timeout) for a in addresses]
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.workers)
+    
+    def _mark_down(self, worker: RemoteWorker, e: Exception):
+        with self._lock:
+            worker.failures += 1
+            worker.last_error = str(e)
+            worker.down_until = time.time() + min(self.retry_after * worker.failures, self.retry_after * 10)
+        WORKER_UP.set(0, worker=worker.address)
+        print(f"Warning: Blender worker {worker.address} unavailable: {e}")
+    
+    def _mark_up(self, worker: RemoteWorker, status: Dict[str, Any]):
+        with self._lock:
+            worker.failures = 0
+            worker.last_status = status
+            worker.down_until = 0.0
+        WORKER_UP.set(1, worker=worker.address)
+    
+    def ranked(self) -> List[RemoteWorker]:
+        now = time.time()
+        candidates = [w for w in self.workers if w.down_until <= now]
+        if not candidates:
+            return []
+        
+        def check(worker: RemoteWorker) -> Optional[RemoteWorker]:
+            try:
+                status = worker.status(self.status_timeout)
+            except WorkerError as e:
+                self._mark_down(worker, e)
+                return None
+            if status.get('version') != PROTOCOL_VERSION:
+                self._mark_down(worker, WorkerError(f"protocol version {status.get('version')}"))
+                return None
+            self._mark_up(worker, status)
+            return worker
+        
+        with ThreadPoolExecutor(max_workers=len(candidates)) as pool:
+            healthy = [w for w in pool.map(check, candidates) if w is not None]
+        return sorted(healthy, key=lambda w: (w.load(), w.last_status['latency']))
+    
+    def run(
+        self,
+        script: str,
+        fmt: str,
+        thumbnail: bool,
+        timeout: float,
+        events: Optional[JobEvents] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Optional[Tuple[str, bytes, Optional[bytes]]]:
+        for worker in self.ranked():
+            if cancel and cancel.is_set():
+                raise Exception("Blender cancelled")
+            if events:
+                events.progress(f"Sending script to {worker.address}...", 40)
+            try:
+                model, thumb = worker.run(script, fmt, thumbnail, timeout, events, cancel)
+            except WorkerBusy:
+                REMOTE_RUNS.inc(worker=worker.address, result='busy')
+                continue
+            except WorkerError as e:
+                REMOTE_RUNS.inc(worker=worker.address, result='unavailable')
+                self._mark_down(worker, e)
+                continue
+            except Exception as e:
+                REMOTE_RUNS.inc(worker=worker.address, result=metrics.error_type(e))
+                raise
+            REMOTE_RUNS.inc(worker=worker.address, result='ok')
+            return worker.address, model, thumb
+        return None
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            w.address: {
+                'up': w.down_until <= time.time(),
+                'load': w.load(),
+                'failures': w.failures,
+                'last_error': w.last_error,
+            }
+            for w in self.workers
+        }
@@ -1,22 +1,60 @@
-import google.generativeai as genai
 import re
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 from PIL import Image
 from config_loader import get_config
+from api_Clients.prompt_cache import PromptCache
+
+
+ImagePart = Union[Image.Image, Dict[str, Any]]
+
+
+PROMPT_PREFIX = """You are an expert 3D modeler using Blender Python API (bpy) version 4.0 or higher. You will be shown several views of one object from a 360° turntable rotation and must generate Python code that recreates this object procedurally.
+
+CRITICAL REQUIREMENTS (MUST FOLLOW):
+1. DELETE THE DEFAULT CUBE FIRST: bpy.ops.object.select_all(action='SELECT'); bpy.ops.object.delete(use_global=False)
+2. Use ONLY standard Blender primitives (cylinders for mugs/cups, spheres for balls/apples, cubes for boxes, etc.)
+3. Combine primitives to match the object shape
+4. Apply materials with colors matching the images
+5. Use accurate scale based on the camera distance given in the request (1 Blender unit = 1 meter)
+6. Code must be Blender 4.0+ compatible
+7. Code must be standalone and executable
+8. DO NOT include export commands - export is handled automatically by the system
+9. If the request contains a MODIFICATION REQUEST, apply it to the model
+
+OUTPUT FORMAT:
+- Return ONLY Python code
+- NO markdown backticks
+- NO explanations
+- NO comments
+- Pure executable bpy code
+- Code must start immediately with import statements"""
 
 
 class GeminiBlenderClient:
     
     def __init__(self):
         config = get_config()
-        api_key = config.get('ai', 'gemini', 'api_key', default='')
-        model_name = config.get('ai', 'gemini', 'model', default='gemini-2.5-pro')
+        api_key = config.get('ai', 'gemini', 'api_key')
+        model_name = config.get('ai', 'gemini', 'model')
+        endpoint = config.get('ai', 'gemini', 'api_endpoint')
         
         if not api_key:
             raise ValueError("Gemini API key not configured")
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)
+        import google.generativeai as genai
+        
+        if endpoint:
+            genai.configure(api_key=api_key, transport='rest', client_options={'api_endpoint': endpoint})
+        else:
+            genai.configure(api_key=api_key)
+        self.cache = PromptCache(genai, model_name, PROMPT_PREFIX)
+        self.supports_async = not endpoint
+        self.last_usage = None
+        self.configure()
+        config.subscribe(self.configure, 'ai.gemini.request_timeout_seconds')
+    
+    def configure(self, changed: Optional[List[str]] = None):
+        self.request_options = {'timeout': get_config().get('ai', 'gemini', 'request_timeout_seconds')}
     
     def _sanitize_code(self, raw_code: str) -> str:
         code = raw_code.strip()
@@ -41,74 +79,129 @@ class GeminiBlenderClient:
         
         return code
     
-    def generate_blender_code(
-        self,
-        imgs: List[Image.Image],
-        dist: float,
-        mod: Optional[str] = None
-    ) -> str:
-        if not imgs:
-            raise ValueError("No images provided")
-        
+    def _prompt(self, imgs: List[ImagePart], dist: float, mod: Optional[str], sheet: Optional[Dict[str, Any]] = None) -> str:
         modification_instruction = f"\n\nMODIFICATION REQUEST:\n{mod}\nApply this modification to the model." if mod else ""
         
-        system_prompt = f"""You are an expert 3D modeler using Blender Python API (bpy) version 4.0 or higher. Analyze these {len(imgs)} images and generate Python code that recreates this object procedurally.
+        if sheet:
+            views = ', '.join(f"{i + 1}: {angle:.0f}°" for i, angle in enumerate(sheet['angles']))
+            labels = "Each tile is labelled with its view number and turntable angle" if sheet.get('labels') else "Views in order"
+            return f"""Analyze this contact sheet and generate the Blender code.
 
 CONTEXT:
+- The single image is a grid of {sheet['views']} views of the SAME object ({sheet['rows']} rows x {sheet['columns']} columns), read left to right, top to bottom
+- {labels}: {views}
+- Treat every tile as a separate camera view; ignore the tile borders and labels
 - Object is {dist}cm from camera
 - Scale: {dist}cm = {dist/100:.3f} Blender units (1 unit = 1 meter)
-- {len(imgs)} views from 360° rotation
-- Object is centered on turntable
-
-CRITICAL REQUIREMENTS (MUST FOLLOW):
-1. DELETE THE DEFAULT CUBE FIRST: bpy.ops.object.select_all(action='SELECT'); bpy.ops.object.delete(use_global=False)
-2. Use ONLY standard Blender primitives (cylinders for mugs/cups, spheres for balls/apples, cubes for boxes, etc.)
-3. Combine primitives to match the object shape
-4. Apply materials with colors matching the images
-5. Use accurate scale based on {dist}cm distance
-6. Code must be Blender 4.0+ compatible
-7. Code must be standalone and executable
-8. DO NOT include export commands - export is handled automatically by the system
+- Object is centered on turntable{modification_instruction}
 
-{modification_instruction}
+Generate the code:"""
+        
+        return f"""Analyze these {len(imgs)} images and generate the Blender code.
 
-OUTPUT FORMAT:
-- Return ONLY Python code
-- NO markdown backticks
-- NO explanations
-- NO comments
-- Pure executable bpy code
-- Code must start immediately with import statements
+CONTEXT:
+- Object is {dist}cm from camera
+- Scale: {dist}cm = {dist/100:.3f} Blender units (1 unit = 1 meter)
+- {len(imgs)} views from 360° rotation
+- Object is centered on turntable{modification_instruction}
 
 Generate the code:"""
+    
+    def _generation_config(self) -> dict:
+        return {
+            "temperature": 0.2,
+            "top_p": 0.9,
+            "top_k": 30,
+            "max_output_tokens": 4096,
+        }
+    
+    def _extract_code(self, response) -> str:
+        usage = getattr(response, 'usage_metadata', None)
+        self.last_usage = {
+            'prompt_tokens': getattr(usage, 'prompt_token_count', None),
+            'output_tokens': getattr(usage, 'candidates_token_count', None),
+            'cached_tokens': getattr(usage, 'cached_content_token_count', None)
+        }
+        if usage is not None:
+            self.cache.record_usage(usage)
+        
+        if not response.text:
+            raise ValueError("Empty response from Gemini")
+        
+        sanitized_code = self._sanitize_code(response.text)
+        
+        if not sanitized_code:
+            raise ValueError("No code extracted from response")
+        
+        return sanitized_code
+    
+    def generate_blender_code(
+        self,
+        imgs: List[ImagePart],
+        dist: float,
+        mod: Optional[str] = None,
+        sheet: Optional[Dict[str, Any]] = None
+    ) -> str:
+        if not imgs:
+            raise ValueError("No images provided")
         
+        contents = [self._prompt(imgs, dist, mod, sheet)] + list(imgs)
         try:
-            image_list = list(imgs)
-            generation_config = {
-                "temperature": 0.2,
-                "top_p": 0.9,
-                "top_k": 30,
-                "max_output_tokens": 4096,
-            }
-            
-            response = self.model.generate_content(
-                [system_prompt] + image_list,
-                generation_config=generation_config
-            )
-            
-            if not response.text:
-                raise ValueError("Empty response from Gemini")
-            
-            sanitized_code = self._sanitize_code(response.text)
-            
-            if not sanitized_code:
-                raise ValueError("No code extracted from response")
-            
-            return sanitized_code
+            try:
+                response = self.cache.model().generate_content(
+                    contents,
+                    generation_config=self._generation_config(),
+                    request_options=self.request_options
+                )
+            except Exception as e:
+                if not self.cache.is_cache_error(e):
+                    raise
+                self.cache.invalidate()
+                response = self.cache.model().generate_content(
+                    contents,
+                    generation_config=self._generation_config(),
+                    request_options=self.request_options
+                )
+            return self._extract_code(response)
         
         except Exception as e:
             raise Exception(f"Gemini error: {str(e)}")
     
-    def analyze_object(self, imgs: List[Image.Image], dist: float) -> str:
+    async def generate_blender_code_async(
+        self,
+        imgs: List[ImagePart],
+        dist: float,
+        mod: Optional[str] = None,
+        sheet: Optional[Dict[str, Any]] = None
+    ) -> str:
+        if not imgs:
+            raise ValueError("No images provided")
+        
+        contents = [self._prompt(imgs, dist, mod, sheet)] + list(imgs)
+        try:
+            try:
+                response = await self.cache.model().generate_content_async(
+                    contents,
+                    generation_config=self._generation_config(),
+                    request_options=self.request_options
+                )
+            except Exception as e:
+                if not self.cache.is_cache_error(e):
+                    raise
+                self.cache.invalidate()
+                response = await self.cache.model().generate_content_async(
+                    contents,
+                    generation_config=self._generation_config(),
+                    request_options=self.request_options
+                )
+            return self._extract_code(response)
+        
+        except Exception as e:
+            raise Exception(f"Gemini error: {str(e)}")
+    
+    def analyze_object(self, imgs: List[ImagePart], dist: float) -> str:
         generated_code = self.generate_blender_code(imgs, dist)
         return f"Code generated ({len(generated_code)} chars)"
+    
+    def close(self):
+        self.cache.release()
@@ -0,0 +1,159 @@
+import hashlib
+import threading
+import time
+from typing import Optional
+from config_loader import get_config
+from executors import get_executors
+import metrics
+
+
+CACHE_REQUESTS = metrics.counter('lighthouse_gemini_cache_requests_total', 'Gemini requests by prompt-cache use')
+CACHED_TOKENS = metrics.counter('lighthouse_gemini_cached_tokens_total', 'Prompt tokens served from the context cache')
+PROMPT_TOKENS = metrics.counter('lighthouse_gemini_prompt_tokens_total', 'Prompt tokens sent to Gemini')
+
+CACHE_ERROR_MARKERS = ('cachedcontent', 'cached content', 'cached_content')
+TOO_SMALL_MARKER = 'min_total_token_count'
+
+
+class PromptCache:
+    
+    def __init__(self, genai, model_name: str, prefix: str):
+        cfg = get_config()
+        self.genai = genai
+        self.model_name = model_name if '/' in model_name else f"models/{model_name}"
+        self.prefix = prefix
+        self.enabled = cfg.get('ai', 'gemini', 'prompt_cache', 'enabled')
+        self.ttl = cfg.get('ai', 'gemini', 'prompt_cache', 'ttl_seconds')
+        self.margin = cfg.get('ai', 'gemini', 'prompt_cache', 'refresh_margin_seconds')
+        self.retry_after = cfg.get('ai', 'gemini', 'prompt_cache', 'retry_seconds')
+        self.display_name = f"lighthouse-{hashlib.sha256((self.model_name + prefix).encode('utf-8')).hexdigest()[:16]}"
+        self.fallback = genai.GenerativeModel(model_name, system_instruction=prefix)
+        self.cache = None
+        self.cached_model = None
+        self.owned = False
+        self.expires = 0.0
+        self.unavailable_until = 0.0
+        self.last_error: Optional[str] = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+    
+    def model(self):
+        if not self.enabled:
+            CACHE_REQUESTS.inc(result='disabled')
+            return self.fallback
+        
+        with self._lock:
+            now = time.time()
+            if self.cache is not None:
+                stale = self.expires - self.margin <= now
+            else:
+                stale = now >= self.unavailable_until
+            if stale and not self._refreshing:
+                self._refreshing = True
+                get_executors().network.submit(self._refresh)
+            if self.cache is None or self.expires <= now:
+                CACHE_REQUESTS.inc(result='fallback')
+                return self.fallback
+            CACHE_REQUESTS.inc(result='cached')
+            return self.cached_model
+    
+    def _refresh(self):
+        try:
+            with self._lock:
+                cache = self.cache
+            if cache is not None:
+                self._extend(cache)
+            else:
+                self._acquire()
+        finally:
+            with self._lock:
+                self._refreshing = False
+    
+    def _use(self, cache, expires: float, owned: bool):
+        cached_model = self.genai.GenerativeModel.from_cached_content(cache)
+        with self._lock:
+            self.cache = cache
+            self.cached_model = cached_model
+            self.owned = owned
+            self.expires = expires
+            self.last_error = None
+    
+    def _acquire(self):
+        try:
+            for existing in self.genai.caching.CachedContent.list(page_size=20):
+                if existing.display_name != self.display_name or existing.model != self.model_name:
+                    continue
+                remaining = existing.expire_time.timestamp() - time.time()
+                if remaining > self.margin:
+                    self._use(existing, time.time() + remaining, owned=False)
+                    print(f"[CACHE] Reusing prompt cache {existing.name} ({remaining / 60:.0f} min left)")
+                    return
+        except Exception as e:
+            print(f"Warning: Could not list prompt caches: {e}")
+        
+        try:
+            cache = self.genai.caching.CachedContent.create(
+                model=self.model_name,
+                display_name=self.display_name,
+                system_instruction=self.prefix,
+                ttl=self.ttl
+            )
+            self._use(cache, time.time() + self.ttl, owned=True)
+            print(f"[CACHE] Created prompt cache {cache.name} (ttl {self.ttl}s)")
+        except Exception as e:
+            self._unavailable(e)
+    
+    def _extend(self, cache):
+        try:
+            cache.update(ttl=self.ttl)
+        except Exception as e:
+            print(f"Warning: Could not extend prompt cache {cache.name}: {e}")
+            with self._lock:
+                if self.cache is cache:
+                    self.cache = None
+                    self.cached_model = None
+            return
+        with self._lock:
+            if self.cache is cache:
+                self.expires = time.time() + self.ttl
+    
+    def _unavailable(self, e: Exception):
+        with self._lock:
+            self.cache = None
+            self.cached_model = None
+            self.last_error = str(e)
+            self.unavailable_until = time.time() + self.retry_after
+        if TOO_SMALL_MARKER in str(e).lower():
+            self.enabled = False
+            print(f"[CACHE] Prompt prefix is below the API's minimum cache size, prompt caching disabled: {e}")
+            return
+        print(f"[CACHE] Prompt caching unavailable, sending the full prompt for {self.retry_after}s: {e}")
+    
+    def is_cache_error(self, e: Exception) -> bool:
+        text = str(e).lower()
+        return self.cache is not None and any(marker in text for marker in CACHE_ERROR_MARKERS)
+    
+    def invalidate(self):
+        with self._lock:
+            self.cache = None
+            self.cached_model = None
+            self.expires = 0.0
+    
+    def record_usage(self, usage):
+        prompt = getattr(usage, 'prompt_token_count', None) or 0
+        cached = getattr(usage, 'cached_content_token_count', None) or 0
+        PROMPT_TOKENS.inc(prompt)
+        CACHED_TOKENS.inc(cached)
+    
+    def release(self):
+        with self._lock:
+            cache, owned = self.cache, self.owned
+            self.cache = None
+            self.cached_model = None
+            self.owned = False
+        if cache is None or not owned:
+            return
+        try:
+            cache.delete()
+        except Exception as e:
+            print(f"Warning: Could not delete prompt cache: {e}")
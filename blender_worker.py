@@ -0,0 +1,250 @@
+import argparse
+import hmac
+import ipaddress
+import os
+import re
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+from config_loader import ConfigWatcher, get_config
+from api_Clients.blender_client import BlenderClient
+from api_Clients.blender_remote import PROTOCOL_VERSION, WorkerError, recv_message, send_message
+
+
+class _Connection:
+    
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.cancel = threading.Event()
+        self._lock = threading.Lock()
+    
+    def send(self, header: Dict[str, Any], payload: bytes = b''):
+        with self._lock:
+            try:
+                send_message(self.sock, header, payload)
+            except OSError:
+                self.cancel.set()
+    
+    def progress(self, message: str, progress: int):
+        self.send({'type': 'progress', 'message': message, 'progress': progress})
+    
+    def error(self, kind: str, message: str):
+        self.send({'type': 'error', 'kind': kind, 'message': message})
+    
+    def watch(self, done: threading.Event):
+        while not done.is_set():
+            try:
+                header, _ = recv_message(self.sock)
+            except socket.timeout:
+                continue
+            except (OSError, WorkerError):
+                self.cancel.set()
+                return
+            if header.get('type') == 'cancel':
+                self.cancel.set()
+                return
+
+
+class BlenderWorker:
+    
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, slots: Optional[int] = None):
+        cfg = get_config()
+        self.host = host or cfg.get('ai', 'reconstruction', 'worker', 'host')
+        self.port = cfg.get('ai', 'reconstruction', 'worker', 'port') if port is None else port
+        self.slots = max(1, slots or cfg.get('ai', 'reconstruction', 'worker', 'slots'))
+        self.max_queue = cfg.get('ai', 'reconstruction', 'worker', 'max_queue')
+        self.max_timeout = cfg.get('ai', 'reconstruction', 'timeout_seconds')
+        self.token = cfg.get('ai', 'reconstruction', 'remote', 'token')
+        self.blender = BlenderClient()
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.started = time.time()
+        self._slots = threading.Semaphore(self.slots)
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.ThreadingTCPServer] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def address(self) -> str:
+        return f"{self.host}:{self.port}"
+    
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'type': 'status',
+                'version': PROTOCOL_VERSION,
+                'slots': self.slots,
+                'active': self.active,
+                'queued': self.queued,
+                'completed': self.completed,
+                'failed': self.failed,
+                'uptime': round(time.time() - self.started, 1),
+            }
+    
+    def handle(self, sock: socket.socket):
+        sock.settimeout(10.0)
+        conn = _Connection(sock)
+        try:
+            header, payload = recv_message(sock)
+        except (OSError, WorkerError):
+            return
+        
+        if header.get('version') != PROTOCOL_VERSION:
+            conn.error('version', f"Worker speaks protocol {PROTOCOL_VERSION}, got {header.get('version')}")
+        elif self.token and not hmac.compare_digest(str(header.get('token', '')), self.token):
+            conn.error('auth', "Invalid token")
+        elif header.get('type') == 'status':
+            conn.send(self.status())
+        elif header.get('type') == 'run':
+            self._run(conn, header, payload)
+        else:
+            conn.error('protocol', f"Unknown request {header.get('type')!r}")
+    
+    def _run(self, conn: _Connection, header: Dict[str, Any], payload: bytes):
+        with self._lock:
+            if self.active >= self.slots and self.queued >= self.max_queue:
+                conn.error('busy', f"{self.active} running, {self.queued} queued")
+                return
+            self.queued += 1
+        
+        done = threading.Event()
+        threading.Thread(target=conn.watch, args=(done,), daemon=True).start()
+        acquired = self._slots.acquire(blocking=False)
+        waited = time.perf_counter()
+        while not acquired and not conn.cancel.is_set():
+            conn.progress(f"Queued on worker ({time.perf_counter() - waited:.0f}s)...", 45)
+            acquired = self._slots.acquire(timeout=1.0)
+        with self._lock:
+            self.queued -= 1
+            if acquired:
+                self.active += 1
+        if not acquired:
+            done.set()
+            conn.error('cancelled', "Cancelled while queued")
+            return
+        
+        ok = False
+        try:
+            ok = self._execute(conn, header, payload, done)
+        finally:
+            done.set()
+            with self._lock:
+                self.active -= 1
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            self._slots.release()
+    
+    def _execute(self, conn: _Connection, header: Dict[str, Any], payload: bytes, done: threading.Event) -> bool:
+        fmt = header.get('format', 'glb')
+        if not re.fullmatch(r'[a-z0-9]{1,8}', str(fmt)):
+            conn.error('protocol', f"Invalid format {fmt!r}")
+            return False
+        timeout = min(float(header.get('timeout') or self.max_timeout), self.max_timeout)
+        
+        with tempfile.TemporaryDirectory(prefix='lighthouse_worker_') as workdir:
+            script_path = os.path.join(workdir, 'script.py')
+            with open(script_path, 'wb') as f:
+                f.write(payload)
+            env = {
+                'LIGHTHOUSE_OUTPUT': os.path.join(workdir, f"model.{fmt}"),
+                'LIGHTHOUSE_THUMBNAIL': os.path.join(workdir, 'model_thumb.png'),
+            }
+            
+            start = time.perf_counter()
+            
+            def heartbeat():
+                while not done.wait(1.0):
+                    conn.progress(f"Running Blender ({time.perf_counter() - start:.0f}s)...", 60)
+            
+            threading.Thread(target=heartbeat, daemon=True).start()
+            try:
+                path, thumb = self.blender._run_script(script_path, conn, conn.cancel, env=env, timeout=timeout)
+            except Exception as e:
+                message = str(e)
+                if conn.cancel.is_set():
+                    conn.error('cancelled', message)
+                elif message.startswith('Blender not found'):
+                    conn.error('unavailable', message)
+                else:
+                    conn.error('blender', message)
+                return False
+            
+            with open(path, 'rb') as f:
+                model = f.read()
+            thumbnail = b''
+            if thumb and header.get('thumbnail', True):
+                with open(thumb, 'rb') as f:
+                    thumbnail = f.read()
+            done.set()
+            conn.send({'type': 'result', 'format': fmt, 'model_size': len(model)}, model + thumbnail)
+            return True
+    
+    def start(self) -> 'BlenderWorker':
+        if not self.token and not _is_loopback(self.host):
+            raise Exception(f"Refusing to listen on {self.host} without ai.reconstruction.remote.token; "
+                            "anyone who can reach this port could run Python in Blender")
+        worker = self
+        
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                worker.handle(self.request)
+        
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _is_loopback(host: str) -> bool:
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == 'localhost'
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run Blender scripts for remote Lighthouse scanners")
+    parser.add_argument('--host', default=None, help="Bind address (default ai.reconstruction.worker.host)")
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--slots', type=int, default=None, help="Concurrent Blender processes")
+    args = parser.parse_args()
+    
+    try:
+        worker = BlenderWorker(args.host, args.port, args.slots).start()
+    except Exception as e:
+        print(f"Error starting Blender worker: {e}")
+        return 1
+    watcher = ConfigWatcher(get_config())
+    if get_config().get('app', 'config_reload', 'enabled'):
+        watcher.start()
+    print(f"[INFO] Blender worker listening on {worker.address} ({worker.slots} slots, "
+          f"blender: {worker.blender._find_blender()})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    watcher.stop()
+    worker.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
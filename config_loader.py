@@ -1,32 +1,300 @@
+import copy
 import os
+import threading
+import weakref
 import yaml
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+RELOADABLE = (
+    'app.scan_delay_seconds',
+    'app.cancel_grace_seconds',
+    'app.capture_mode',
+    'app.scan_container',
+    'app.image_quality',
+    'app.gemini_max_images',
+    'app.gemini_image_max_size',
+    'app.gemini_upload_mode',
+    'app.mosaic',
+    'app.settle',
+    'app.crop',
+    'app.latency_planner.enabled',
+    'app.latency_planner.target_seconds',
+    'app.latency_planner.min_samples',
+    'app.latency_planner.candidate_counts',
+    'app.latency_planner.candidate_sizes',
+    'app.retention.max_total_mb',
+    'app.retention.max_age_days',
+    'app.retention.keep_models_per_scan',
+    'app.retention.downgrade',
+    'app.executors',
+    'app.events.log_stages',
+    'app.config_reload.interval_seconds',
+    'ai.gemini.request_timeout_seconds',
+    'ai.reconstruction.method',
+    'ai.reconstruction.output_format',
+    'ai.reconstruction.blender_path',
+    'ai.reconstruction.timeout_seconds',
+    'ai.reconstruction.thumbnail',
+    'ai.reconstruction.visual_hull',
+    'ai.reconstruction.remote',
+    'hardware.turntable.burst_duration_ms',
+    'hardware.turntable.min_burst_ms',
+    'hardware.turntable.degrees_per_second',
+    'hardware.turntable.spin_up_ms',
+    'hardware.turntable.continuous_duty_cycle',
+    'hardware.depth_sensor.timeout_us',
+    'hardware.camera.continuous_exposure_us',
+    'hardware.camera.continuous_max_gain',
+)
+
+CHOICES = {
+    'app.capture_mode': ('step', 'continuous'),
+    'app.gemini_upload_mode': ('separate', 'mosaic'),
+    'app.executors.image.kind': ('process', 'thread'),
+    'ai.reconstruction.method': ('blender_bpy', 'visual_hull', 'auto'),
+    'ai.reconstruction.thumbnail.engine': ('workbench', 'eevee'),
+}
+
+UNIT_SUFFIXES = ('_seconds', '_ms', '_us', '_mb', '_days', '_per_minute')
+RIG_SECTIONS = ('turntable', 'depth_sensor', 'camera')
+
+_MISSING = object()
+
+
+class ConfigError(Exception):
+    pass
+
+
+class FrozenDict(dict):
+    
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("Config snapshots are read-only; use Config.set")
+    
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _immutable
+    
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return FrozenDict((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+def _dotted(keys: Tuple[str, ...]) -> str:
+    return '.'.join(str(k) for k in keys)
+
+
+def is_reloadable(key: str) -> bool:
+    return any(key == p or key.startswith(p + '.') for p in RELOADABLE)
+
+
+def _check_value(value: Any, default: Any, path: Tuple[str, ...], errors: List[str]) -> Any:
+    name = _dotted(path)
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            errors.append(f"{name}: expected true/false, got {value!r}")
+            return default
+    elif isinstance(default, (int, float)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f"{name}: expected a number, got {value!r}")
+            return default
+        if isinstance(default, float):
+            value = float(value)
+        elif isinstance(value, float) and not value.is_integer() and not str(path[-1]).endswith(UNIT_SUFFIXES):
+            errors.append(f"{name}: expected a whole number, got {value!r}")
+            return default
+    elif isinstance(default, str):
+        if not isinstance(value, str):
+            errors.append(f"{name}: expected a string, got {value!r}")
+            return default
+    elif isinstance(default, list):
+        if not isinstance(value, (list, tuple)):
+            errors.append(f"{name}: expected a list, got {value!r}")
+            return default
+        if default and not isinstance(default[0], dict):
+            value = [_check_value(v, default[0], path + (str(i),), errors) for i, v in enumerate(value)]
+    choices = CHOICES.get(name)
+    if choices and value not in choices:
+        errors.append(f"{name}: {value!r} is not one of {', '.join(choices)}")
+        return default
+    return value
+
+
+def _validate(
+    value: Any,
+    default: Any,
+    path: Tuple[str, ...],
+    errors: List[str],
+    unknown: List[str],
+    fill: bool = True
+) -> Any:
+    if not isinstance(default, dict):
+        return default if value is None else _check_value(value, default, path, errors)
+    if value is None:
+        return copy.deepcopy(default) if fill else {}
+    if not isinstance(value, dict):
+        errors.append(f"{_dotted(path)}: expected a mapping, got {value!r}")
+        return copy.deepcopy(default) if fill else {}
+    
+    merged = {}
+    for key, item in value.items():
+        if key in default:
+            merged[key] = _validate(item, default[key], path + (key,), errors, unknown, fill)
+        else:
+            if default:
+                unknown.append(_dotted(path + (key,)))
+            merged[key] = item
+    if fill:
+        for key, item in default.items():
+            if key not in merged:
+                merged[key] = copy.deepcopy(item)
+    return merged
+
+
+def _validate_rigs(data: Dict[str, Any], errors: List[str], unknown: List[str]):
+    hardware = data['hardware']
+    rigs = []
+    for i, entry in enumerate(hardware.get('rigs') or []):
+        path = ('hardware', 'rigs', str(i))
+        if not isinstance(entry, dict):
+            errors.append(f"{_dotted(path)}: expected a mapping, got {entry!r}")
+            continue
+        checked = {}
+        for key, item in entry.items():
+            if key in RIG_SECTIONS:
+                checked[key] = _validate(item, hardware[key], path + (key,), errors, unknown, fill=False)
+            elif key == 'name':
+                checked[key] = item
+            else:
+                unknown.append(_dotted(path + (key,)))
+                checked[key] = item
+        rigs.append(checked)
+    hardware['rigs'] = rigs
+
+
+def _flatten(value: Any, path: Tuple[str, ...], flat: Dict[Tuple[str, ...], Any], leaves: Dict[str, Any]):
+    flat[path] = value
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(item, path + (key,), flat, leaves)
+    else:
+        leaves[_dotted(path)] = value
+
+
+def _assign(data: Dict[str, Any], key: str, value: Any):
+    keys = key.split('.')
+    for part in keys[:-1]:
+        data = data.setdefault(part, {})
+    if value is _MISSING:
+        data.pop(keys[-1], None)
+    else:
+        data[keys[-1]] = value
+
+
+class ConfigSnapshot:
+    
+    def __init__(self, data: Dict[str, Any], version: int = 0):
+        self.data = _freeze(data)
+        self.version = version
+        self._flat: Dict[Tuple[str, ...], Any] = {}
+        self.leaves: Dict[str, Any] = {}
+        _flatten(self.data, (), self._flat, self.leaves)
+    
+    def get(self, *keys, default=None):
+        val = self._flat.get(keys, _MISSING)
+        if val is _MISSING or val is None:
+            return default
+        return val
+    
+    def changed(self, other: 'ConfigSnapshot') -> List[str]:
+        keys = set(self.leaves) | set(other.leaves)
+        return sorted(k for k in keys if self.leaves.get(k, _MISSING) != other.leaves.get(k, _MISSING))
 
 
 class Config:
     
     def __init__(self, path: str = 'config.yaml'):
         self.path = path
-        self._config = self._load()
-        self._apply_env()
+        self._overrides: Dict[Tuple[str, ...], Any] = {}
+        self._listeners: List[Tuple[Callable[[], Optional[Callable]], Tuple[str, ...]]] = []
+        self._lock = threading.RLock()
+        self.mtime = self._mtime()
+        data, errors, unknown = self._build(self._load())
+        for key in unknown:
+            print(f"Warning: Unknown config key {key} (ignored)")
+        if errors:
+            print(f"Error in {self.path}, using defaults for: " + '; '.join(errors))
+        self.snapshot = ConfigSnapshot(data)
+    
+    def _mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+    
+    def _read(self) -> Dict[str, Any]:
+        with open(self.path, 'r') as f:
+            raw = yaml.safe_load(f) or {}
+        if not isinstance(raw, dict):
+            raise ConfigError(f"{self.path} must contain a mapping at the top level")
+        return raw
     
     def _load(self) -> Dict[str, Any]:
         try:
-            with open(self.path, 'r') as f:
-                return yaml.safe_load(f) or {}
+            return self._read()
         except FileNotFoundError:
             print(f"Warning: Config file {self.path} not found. Using defaults.")
-            return self._defaults()
+            return {}
         except Exception as e:
             print(f"Error loading config: {e}. Using defaults.")
-            return self._defaults()
+            return {}
+    
+    def _build(self, raw: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str], List[str]]:
+        errors: List[str] = []
+        unknown: List[str] = []
+        data = _validate(raw, self._defaults(), (), errors, unknown)
+        _validate_rigs(data, errors, unknown)
+        self._apply_env(data)
+        for keys, value in self._overrides.items():
+            _assign(data, _dotted(keys), copy.deepcopy(value))
+        return data, errors, unknown
     
     def _defaults(self) -> Dict[str, Any]:
         return {
             'hardware': {
                 'turntable': {
+                    'motor_pin': 12,
                     'burst_duration_ms': 500,
-                    'steps_per_scan': 8
+                    'steps_per_scan': 8,
+                    'degrees_per_second': 90.0,
+                    'spin_up_ms': 0,
+                    'continuous_duty_cycle': 50,
+                    'min_burst_ms': 50,
+                    'calibration': {
+                        'path': 'scans/turntable_calibration.json',
+                        'durations_ms': [150, 250, 350, 450, 550],
+                        'repeats': 3,
+                        'band': [0.80, 0.95],
+                        'span': [0.25, 0.75],
+                        'max_angle': 70.0,
+                        'bins': 480,
+                        'rows': 32,
+                        'min_confidence': 0.3,
+                        'correct_position': True
+                    }
                 },
                 'depth_sensor': {
                     'trigger_pin': 18,
@@ -34,51 +302,270 @@ class Config:
                     'timeout_us': 30000
                 },
                 'camera': {
+                    'index': 0,
                     'resolution_width': 1920,
                     'resolution_height': 1080,
-                    'rotation': 0
-                }
+                    'rotation': 0,
+                    'continuous_exposure_us': 2000,
+                    'continuous_max_gain': 8.0,
+                    'preview_width': 320,
+                    'preview_height': 240
+                },
+                'rigs': []
             },
             'ai': {
                 'gemini': {
                     'api_key': '',
-                    'model': 'gemini-2.5-pro'
+                    'model': 'gemini-2.5-pro',
+                    'api_endpoint': '',
+                    'request_timeout_seconds': 120,
+                    'prompt_cache': {
+                        'enabled': False,
+                        'ttl_seconds': 3600,
+                        'refresh_margin_seconds': 300,
+                        'retry_seconds': 900
+                    }
                 },
                 'reconstruction': {
                     'method': 'blender_bpy',
                     'output_format': 'glb',
-                    'blender_path': 'blender'
+                    'blender_path': 'blender',
+                    'timeout_seconds': 120,
+                    'thumbnail': {
+                        'enabled': True,
+                        'size': 256,
+                        'engine': 'workbench'
+                    },
+                    'visual_hull': {
+                        'voxels': 64,
+                        'fov_degrees': 62.2,
+                        'silhouette_size': 320,
+                        'max_misses': 0,
+                        'margin': 0.1,
+                        'smooth_iterations': 3
+                    },
+                    'remote': {
+                        'workers': [],
+                        'token': '',
+                        'local_fallback': True,
+                        'connect_timeout_seconds': 2.0,
+                        'status_timeout_seconds': 0.5,
+                        'idle_timeout_seconds': 15.0,
+                        'retry_seconds': 30
+                    },
+                    'worker': {
+                        'host': '127.0.0.1',
+                        'port': 9555,
+                        'slots': 1,
+                        'max_queue': 4
+                    }
                 }
             },
             'app': {
                 'scan_delay_seconds': 0.5,
+                'capture_mode': 'step',
                 'mock_delay_seconds': 0.5,
-                'voice_enabled': False
+                'voice_enabled': False,
+                'scan_container': False,
+                'cancel_grace_seconds': 2.0,
+                'image_quality': 85,
+                'gemini_max_images': 8,
+                'gemini_image_max_size': 1024,
+                'config_reload': {
+                    'enabled': True,
+                    'interval_seconds': 2.0
+                },
+                'settle': {
+                    'enabled': True,
+                    'min_wait_seconds': 0.05,
+                    'max_wait_seconds': 1.0,
+                    'poll_interval_seconds': 0.02,
+                    'diff_threshold': 0.01,
+                    'stable_frames': 2,
+                    'min_sharpness_ratio': 0.6,
+                    'max_retries': 2
+                },
+                'crop': {
+                    'enabled': False,
+                    'reference_path': 'scans/background.jpg',
+                    'margin': 0.08,
+                    'threshold': 40,
+                    'analysis_size': 256,
+                    'min_fraction': 0.01,
+                    'mask_background': False,
+                    'mask_color': [128, 128, 128]
+                },
+                'gemini_upload_mode': 'separate',
+                'mosaic': {
+                    'size': 1536,
+                    'labels': True
+                },
+                'latency_planner': {
+                    'enabled': False,
+                    'target_seconds': 30.0,
+                    'history_path': 'gemini_history.jsonl',
+                    'history_limit': 200,
+                    'min_samples': 5,
+                    'candidate_counts': [2, 3, 4, 6, 8],
+                    'candidate_sizes': [512, 768, 1024, 1536]
+                },
+                'metrics': {
+                    'enabled': False,
+                    'host': '127.0.0.1',
+                    'port': 9464,
+                    'file_path': '',
+                    'interval_seconds': 15
+                },
+                'queue': {
+                    'enabled': False,
+                    'path': 'jobs',
+                    'max_concurrent': 2,
+                    'rate_per_minute': 10,
+                    'burst': 3,
+                    'max_attempts': 8,
+                    'backoff_base_seconds': 5.0,
+                    'backoff_max_seconds': 600.0,
+                    'keep_finished': 200
+                },
+                'retention': {
+                    'enabled': False,
+                    'interval_seconds': 600,
+                    'max_total_mb': 2048,
+                    'max_age_days': 30,
+                    'keep_models_per_scan': 3,
+                    'downgrade': True
+                },
+                'profiling': {
+                    'enabled': False,
+                    'output_path': 'memory_profile.jsonl',
+                    'frames': 1,
+                    'top_n': 10,
+                    'stage_sites': False,
+                    'leak_jobs': 3,
+                    'leak_threshold_mb': 5.0
+                },
+                'executors': {
+                    'image': {'kind': 'process', 'workers': 2},
+                    'network': {'workers': 8},
+                    'blender': {'slots': 2}
+                },
+                'events': {
+                    'log_stages': True,
+                    'subscribers': {
+                        'gui': {'max_queue': 64, 'policy': 'coalesce'},
+                        'log': {'max_queue': 256, 'policy': 'drop_oldest'},
+                        'metrics': {'max_queue': 1024, 'policy': 'drop_oldest'}
+                    }
+                },
+                'preview': {
+                    'enabled': True,
+                    'face_budget': 6000,
+                    'interactive_face_budget': 1500
+                }
             }
         }
     
-    def _apply_env(self):
+    def _apply_env(self, data: Dict[str, Any]):
         if 'GEMINI_API_KEY' in os.environ:
-            self._config['ai']['gemini']['api_key'] = os.environ['GEMINI_API_KEY']
+            data['ai']['gemini']['api_key'] = os.environ['GEMINI_API_KEY']
     
     def get(self, *keys, default=None):
-        val = self._config
-        for key in keys:
-            if isinstance(val, dict):
-                val = val.get(key)
-                if val is None:
-                    return default
-            else:
-                return default
-        return val
+        return self.snapshot.get(*keys, default=default)
     
     def set(self, *keys, value):
-        cfg = self._config
-        for key in keys[:-1]:
-            if key not in cfg:
-                cfg[key] = {}
-            cfg = cfg[key]
-        cfg[keys[-1]] = value
+        with self._lock:
+            default = ConfigSnapshot(self._defaults()).get(*keys, default=_MISSING)
+            if default is not _MISSING:
+                errors: List[str] = []
+                value = _validate(_thaw(value), _thaw(default), keys, errors, [])
+                if errors:
+                    raise ConfigError('; '.join(errors))
+            self._overrides[keys] = value
+            data = _thaw(self.snapshot.data)
+            _assign(data, _dotted(keys), copy.deepcopy(value))
+            self.snapshot = ConfigSnapshot(data, self.snapshot.version + 1)
+    
+    def subscribe(self, callback: Callable[[List[str]], None], *prefixes: str):
+        ref = weakref.WeakMethod(callback) if hasattr(callback, '__self__') else (lambda: callback)
+        with self._lock:
+            self._listeners.append((ref, prefixes))
+    
+    def _notify(self, changed: List[str]):
+        with self._lock:
+            self._listeners = [(ref, prefixes) for ref, prefixes in self._listeners if ref() is not None]
+            listeners = list(self._listeners)
+        for ref, prefixes in listeners:
+            callback = ref()
+            if callback is None:
+                continue
+            if prefixes and not any(k == p or k.startswith(p + '.') for k in changed for p in prefixes):
+                continue
+            try:
+                callback(changed)
+            except Exception as e:
+                print(f"Error applying config change: {e}")
+    
+    def reload(self) -> List[str]:
+        with self._lock:
+            self.mtime = self._mtime()
+            try:
+                raw = self._read()
+            except Exception as e:
+                raise ConfigError(f"Reload of {self.path} failed, keeping the running config: {e}")
+            data, errors, unknown = self._build(raw)
+            if errors:
+                raise ConfigError(f"Reload of {self.path} rejected, keeping the running config: " + '; '.join(errors))
+            
+            current = self.snapshot
+            changed = current.changed(ConfigSnapshot(data))
+            restart = [k for k in changed if not is_reloadable(k)]
+            applied = [k for k in changed if is_reloadable(k)]
+            for key in restart:
+                _assign(data, key, _thaw(current.leaves.get(key, _MISSING)))
+            if applied:
+                self.snapshot = ConfigSnapshot(data, current.version + 1)
+        
+        for key in unknown:
+            if tuple(key.split('.')) not in current._flat:
+                print(f"Warning: Unknown config key {key} (ignored)")
+        if applied:
+            print(f"[CONFIG] Reloaded {', '.join(applied)}")
+            self._notify(applied)
+        if restart:
+            raise ConfigError(f"Restart required to apply {', '.join(restart)} from {self.path}; keeping the running values")
+        return applied
+
+
+class ConfigWatcher:
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def check(self) -> List[str]:
+        mtime = self.config._mtime()
+        if mtime is None or mtime == self.config.mtime:
+            return []
+        try:
+            return self.config.reload()
+        except ConfigError as e:
+            print(f"[CONFIG] Error: {e}")
+            return []
+    
+    def _run(self):
+        while not self._stop.wait(self.config.get('app', 'config_reload', 'interval_seconds')):
+            self.check()
 
 
 _config = None
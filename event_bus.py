@@ -0,0 +1,326 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+from config_loader import get_config
+from rig import DEFAULT_RIG
+import metrics
+
+
+KINDS = ('progress', 'stage', 'artifact', 'finished')
+POLICIES = ('drop_oldest', 'drop_newest', 'coalesce')
+
+EVENTS_PUBLISHED = metrics.counter('lighthouse_events_published_total', 'Events published on the bus by kind')
+EVENTS_DROPPED = metrics.counter('lighthouse_events_dropped_total', 'Events dropped by a subscriber queue')
+STAGE_SECONDS = metrics.histogram(
+    'lighthouse_stage_seconds', 'Time spent in each job stage',
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+)
+
+_bus = None
+_ids = itertools.count(1)
+
+
+class Event:
+    
+    def __init__(
+        self,
+        kind: str,
+        job_id: str,
+        rig: str,
+        stage: Optional[str] = None,
+        message: str = '',
+        progress: Optional[int] = None,
+        duration: Optional[float] = None,
+        artifacts: Optional[Dict[str, str]] = None,
+        status: Optional[str] = None
+    ):
+        if kind not in KINDS:
+            raise Exception(f"Unknown event kind: {kind}")
+        self.kind = kind
+        self.job_id = job_id
+        self.rig = rig
+        self.stage = stage
+        self.message = message
+        self.progress = progress
+        self.duration = duration
+        self.artifacts = artifacts or {}
+        self.status = status
+        self.time = time.time()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'kind': self.kind,
+            'job_id': self.job_id,
+            'rig': self.rig,
+            'stage': self.stage,
+            'message': self.message,
+            'progress': self.progress,
+            'duration': self.duration,
+            'artifacts': self.artifacts,
+            'status': self.status,
+            'time': self.time,
+        }
+    
+    def __repr__(self) -> str:
+        return f"Event({self.kind}, job={self.job_id!r}, stage={self.stage!r}, progress={self.progress})"
+
+
+class Subscription:
+    
+    def __init__(
+        self,
+        name: str,
+        handler: Optional[Callable[[Event], None]] = None,
+        max_queue: int = 256,
+        policy: str = 'drop_oldest',
+        kinds: Optional[Sequence[str]] = None
+    ):
+        if policy not in POLICIES:
+            raise Exception(f"Unknown drop policy for subscriber {name}: {policy}")
+        self.name = name
+        self.handler = handler
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self.kinds = set(kinds) if kinds else None
+        self.dropped = 0
+        self._queue: Deque[Event] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+        if handler is not None:
+            self._thread = threading.Thread(target=self._run, name=f'events-{name}', daemon=True)
+            self._thread.start()
+    
+    def _drop(self, count: int = 1):
+        self.dropped += count
+        EVENTS_DROPPED.inc(count, subscriber=self.name)
+    
+    def offer(self, event: Event):
+        if self._closed or (self.kinds and event.kind not in self.kinds):
+            return
+        with self._cond:
+            if self.policy == 'coalesce' and event.kind == 'progress':
+                stale = [e for e in self._queue if e.kind == 'progress' and e.job_id == event.job_id]
+                for e in stale:
+                    self._queue.remove(e)
+                if stale:
+                    self._drop(len(stale))
+            if len(self._queue) >= self.max_queue:
+                if self.policy == 'drop_newest':
+                    self._drop()
+                    return
+                self._queue.popleft()
+                self._drop()
+            self._queue.append(event)
+            self._cond.notify()
+    
+    def drain(self, limit: Optional[int] = None) -> List[Event]:
+        with self._cond:
+            count = len(self._queue) if limit is None else min(limit, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._queue:
+                    return
+                event = self._queue.popleft()
+            try:
+                self.handler(event)
+            except Exception as e:
+                print(f"Error in event subscriber {self.name}: {e}")
+    
+    def close(self, timeout: float = 1.0):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+
+class EventBus:
+    
+    def __init__(self):
+        self._subscribers: Dict[str, Subscription] = {}
+        self._lock = threading.Lock()
+    
+    def subscribe(
+        self,
+        name: str,
+        handler: Optional[Callable[[Event], None]] = None,
+        max_queue: Optional[int] = None,
+        policy: Optional[str] = None,
+        kinds: Optional[Sequence[str]] = None
+    ) -> Subscription:
+        settings = get_config().get('app', 'events', 'subscribers', name, default={}) or {}
+        sub = Subscription(
+            name,
+            handler,
+            max_queue or settings.get('max_queue', 256),
+            policy or settings.get('policy', 'drop_oldest'),
+            kinds
+        )
+        with self._lock:
+            old = self._subscribers.get(name)
+            self._subscribers[name] = sub
+        if old:
+            old.close()
+        return sub
+    
+    def configure(self, changed: Optional[List[str]] = None):
+        enabled = get_config().get('app', 'events', 'log_stages')
+        with self._lock:
+            active = 'log' in self._subscribers
+        if enabled and not active:
+            self.subscribe('log', log_event, kinds=('stage', 'finished'))
+        elif active and not enabled:
+            self.unsubscribe('log')
+    
+    def unsubscribe(self, name: str):
+        with self._lock:
+            sub = self._subscribers.pop(name, None)
+        if sub:
+            sub.close()
+    
+    def publish(self, event: Event):
+        EVENTS_PUBLISHED.inc(kind=event.kind)
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for sub in subscribers:
+            sub.offer(event)
+    
+    def job(self, rig: str, job_id: Optional[str] = None) -> 'JobEvents':
+        if job_id is None:
+            job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{next(_ids)}"
+        return JobEvents(self, job_id, rig)
+    
+    def close(self):
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+            self._subscribers.clear()
+        for sub in subscribers:
+            sub.close()
+
+
+class JobEvents:
+    
+    def __init__(self, bus: EventBus, job_id: str, rig: str, low: int = 0, high: int = 100, state: Optional[dict] = None):
+        self.bus = bus
+        self.job_id = job_id
+        self.rig = rig
+        self.low = low
+        self.high = high
+        self._state = state if state is not None else {
+            'started': time.perf_counter(),
+            'stage': None,
+            'stage_started': time.perf_counter(),
+            'timings': {},
+            'artifacts': {},
+        }
+    
+    @property
+    def stage_name(self) -> Optional[str]:
+        return self._state['stage']
+    
+    @property
+    def timings(self) -> Dict[str, float]:
+        return dict(self._state['timings'])
+    
+    def _publish(self, kind: str, **fields):
+        self.bus.publish(Event(kind, self.job_id, self.rig, fields.pop('stage', self._state['stage']), **fields))
+    
+    def _scale(self, progress: int) -> int:
+        if progress < 0:
+            return progress
+        return self.low + int(progress * (self.high - self.low) / 100)
+    
+    def span(self, low: int, high: int) -> 'JobEvents':
+        return JobEvents(self.bus, self.job_id, self.rig, self._scale(low), self._scale(high), self._state)
+    
+    def progress(self, message: str, progress: int):
+        self._publish('progress', message=message, progress=self._scale(progress))
+    
+    def _end_stage(self) -> Optional[float]:
+        stage = self._state['stage']
+        if stage is None:
+            return None
+        duration = time.perf_counter() - self._state['stage_started']
+        self._state['timings'][stage] = self._state['timings'].get(stage, 0.0) + duration
+        self._publish('stage', stage=stage, duration=duration)
+        return duration
+    
+    def stage(self, stage: str, message: Optional[str] = None, progress: Optional[int] = None):
+        if stage == self._state['stage']:
+            if message is not None:
+                self.progress(message, progress if progress is not None else 0)
+            return
+        self._end_stage()
+        self._state['stage'] = stage
+        self._state['stage_started'] = time.perf_counter()
+        if message is not None:
+            self.progress(message, progress if progress is not None else 0)
+    
+    def artifact(self, name: str, path: str):
+        self._state['artifacts'][name] = path
+        self._publish('artifact', message=path, artifacts={name: path})
+    
+    def finished(self, status: str, message: str = '', progress: Optional[int] = None):
+        self._end_stage()
+        self._state['stage'] = None
+        self._publish(
+            'finished',
+            message=message,
+            progress=progress,
+            duration=time.perf_counter() - self._state['started'],
+            artifacts=dict(self._state['artifacts']),
+            status=status
+        )
+
+
+def log_event(event: Event):
+    name = '' if event.rig == DEFAULT_RIG else f"[{event.rig}] "
+    if event.kind == 'stage':
+        print(f"[TIME] {name}Job {event.job_id} {event.stage}: {event.duration:.2f} s")
+    elif event.kind == 'finished':
+        print(f"[TIME] {name}Job {event.job_id} {event.status} after {event.duration:.2f} s"
+              + (f": {event.message}" if event.status == 'failed' and event.message else ''))
+
+
+def record_event(event: Event):
+    if event.kind == 'stage':
+        STAGE_SECONDS.observe(event.duration, stage=event.stage, rig=event.rig)
+
+
+def get_bus() -> EventBus:
+    global _bus
+    if _bus is None:
+        _bus = EventBus()
+        _bus.configure()
+        get_config().subscribe(_bus.configure, 'app.events.log_stages')
+        _bus.subscribe('metrics', record_event, kinds=('stage',))
+    return _bus
+
+
+@contextmanager
+def job(rig: str, events: Optional[JobEvents] = None, job_id: Optional[str] = None):
+    if events is not None:
+        yield events
+        return
+    
+    events = get_bus().job(rig, job_id)
+    try:
+        yield events
+    except BaseException as e:
+        if isinstance(e, (asyncio.CancelledError, KeyboardInterrupt)):
+            events.finished('cancelled', "Cancelled", 0)
+        else:
+            events.finished('failed', f"Error: {e}", -1)
+        raise
+    events.finished('done')
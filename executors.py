@@ -0,0 +1,180 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from config_loader import get_config
+import metrics
+
+
+POOLS = ('image', 'network', 'blender')
+
+EXECUTOR_WORKERS = metrics.gauge('lighthouse_executor_workers', 'Worker slots per executor')
+EXECUTOR_QUEUED = metrics.gauge('lighthouse_executor_queued', 'Tasks waiting for a free worker per executor')
+EXECUTOR_ACTIVE = metrics.gauge('lighthouse_executor_active', 'Tasks running per executor')
+EXECUTOR_BUSY = metrics.counter(
+    'lighthouse_executor_busy_seconds_total', 'Worker-seconds spent running tasks; rate / workers = utilization'
+)
+EXECUTOR_TASKS = metrics.counter('lighthouse_executor_tasks_total', 'Tasks completed per executor')
+
+_executors = None
+_lock = threading.Lock()
+
+
+def _noop():
+    return None
+
+
+class MonitoredExecutor(Executor):
+    
+    def __init__(self, name: str, executor: Executor, workers: int):
+        self.name = name
+        self.executor = executor
+        self.workers = workers
+        self.in_flight = 0
+        self.busy_seconds = 0.0
+        self.started = time.monotonic()
+        self._updated = self.started
+        self._lock = threading.Lock()
+        EXECUTOR_WORKERS.set(workers, pool=name)
+        self._publish()
+    
+    @property
+    def active(self) -> int:
+        return min(self.in_flight, self.workers)
+    
+    @property
+    def queued(self) -> int:
+        return max(0, self.in_flight - self.workers)
+    
+    def _advance(self):
+        now = time.monotonic()
+        busy = self.active * (now - self._updated)
+        self.busy_seconds += busy
+        self._updated = now
+        if busy:
+            EXECUTOR_BUSY.inc(busy, pool=self.name)
+    
+    def _publish(self):
+        EXECUTOR_QUEUED.set(self.queued, pool=self.name)
+        EXECUTOR_ACTIVE.set(self.active, pool=self.name)
+    
+    def submit(self, fn, *args, **kwargs) -> Future:
+        with self._lock:
+            self._advance()
+            self.in_flight += 1
+            self._publish()
+            executor = self.executor
+        try:
+            try:
+                future = executor.submit(fn, *args, **kwargs)
+            except RuntimeError:
+                if executor is self.executor:
+                    raise
+                future = self.executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+    
+    def _done(self, future: Optional[Future]):
+        with self._lock:
+            self._advance()
+            self.in_flight -= 1
+            self._publish()
+        if future is not None:
+            EXECUTOR_TASKS.inc(pool=self.name)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._advance()
+            elapsed = max(1e-9, self._updated - self.started)
+            return {
+                'workers': self.workers,
+                'queued': self.queued,
+                'active': self.active,
+                'utilization': self.busy_seconds / (elapsed * self.workers),
+            }
+    
+    def replace(self, executor: Executor, workers: int):
+        with self._lock:
+            self._advance()
+            old, self.executor, self.workers = self.executor, executor, workers
+            self._publish()
+        EXECUTOR_WORKERS.set(workers, pool=self.name)
+        old.shutdown(wait=False)
+    
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+class Executors:
+    
+    def __init__(self):
+        cfg = get_config()
+        self.sizes = self._sizes()
+        self.image = MonitoredExecutor('image', self._build('image', *self.sizes['image']), self.sizes['image'][1])
+        self.network = MonitoredExecutor('network', self._build('network', *self.sizes['network']), self.sizes['network'][1])
+        self.blender = MonitoredExecutor('blender', self._build('blender', *self.sizes['blender']), self.sizes['blender'][1])
+        cfg.subscribe(self.configure, 'app.executors')
+    
+    def _sizes(self) -> Dict[str, Tuple[str, int]]:
+        cfg = get_config()
+        return {
+            'image': (
+                cfg.get('app', 'executors', 'image', 'kind'),
+                max(1, cfg.get('app', 'executors', 'image', 'workers'))
+            ),
+            'network': ('thread', max(1, cfg.get('app', 'executors', 'network', 'workers'))),
+            'blender': ('thread', max(1, cfg.get('app', 'executors', 'blender', 'slots'))),
+        }
+    
+    def _build(self, name: str, kind: str, workers: int) -> Executor:
+        if kind == 'process':
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        if kind == 'thread':
+            return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        raise Exception(f"Unknown {name} executor kind: {kind} (expected process or thread)")
+    
+    def configure(self, changed: Optional[List[str]] = None):
+        sizes = self._sizes()
+        for name in POOLS:
+            if sizes[name] != self.sizes[name]:
+                kind, workers = sizes[name]
+                getattr(self, name).replace(self._build(name, kind, workers), workers)
+                print(f"[INFO] {name} executor resized to {workers} {kind} workers")
+        self.sizes = sizes
+    
+    def pools(self) -> Dict[str, MonitoredExecutor]:
+        return {name: getattr(self, name) for name in POOLS}
+    
+    def warm_up(self):
+        if isinstance(self.image.executor, ProcessPoolExecutor):
+            for future in [self.image.executor.submit(_noop) for _ in range(self.image.workers)]:
+                future.result()
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: pool.stats() for name, pool in self.pools().items()}
+    
+    def shutdown(self, wait: bool = False):
+        for pool in self.pools().values():
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def get_executors() -> Executors:
+    global _executors
+    with _lock:
+        if _executors is None:
+            _executors = Executors()
+        return _executors
+
+
+def shutdown(wait: bool = False):
+    global _executors
+    with _lock:
+        if _executors is not None:
+            _executors.shutdown(wait)
+            _executors = None
@@ -4,9 +4,16 @@ import asyncio
 import threading
 import time
 import os
-from typing import Optional
-from scanner import Scanner
-from config_loader import get_config
+from typing import Dict, Optional
+from scanner import Scanner, SharedClients
+from config_loader import ConfigWatcher, get_config
+from rig import load_rigs
+from retention import RetentionManager
+from metrics import MetricsExporter
+from job_queue import Job, JobQueue
+from event_bus import get_bus
+import executors
+import memory_profile
 
 
 class MainWindow:
@@ -17,13 +24,53 @@ class MainWindow:
         self.root.geometry("1200x800")
         self.root.configure(bg='#1a1a1a')
         
-        self.scanner = Scanner()
-        self.scan_task = None
-        self.cancel_event = None
-        self.current_model_url = None
+        self.shared = SharedClients()
+        self.scanners: Dict[str, Scanner] = {rig.name: Scanner(rig, self.shared) for rig in load_rigs()}
+        self.current_rig = next(iter(self.scanners))
+        self.queue = None
+        if get_config().get('app', 'queue', 'enabled'):
+            self.queue = JobQueue(self._run_job)
+            self.queue.listeners.append(lambda job: self.root.after(0, lambda: self._job_changed(job)))
+        self.retention = RetentionManager(
+            [s.scans_dir for s in self.scanners.values()],
+            protected=self._protected_scans
+        )
+        if get_config().get('app', 'retention', 'enabled'):
+            self.retention.start()
+        self.metrics = MetricsExporter()
+        if get_config().get('app', 'metrics', 'enabled'):
+            self.metrics.start()
+        self.config_watcher = ConfigWatcher(get_config())
+        if get_config().get('app', 'config_reload', 'enabled'):
+            self.config_watcher.start()
+        self.tasks: Dict[str, object] = {}
+        self.cancel_events: Dict[str, asyncio.Event] = {}
+        self.model_urls: Dict[str, str] = {}
+        self.progress: Dict[str, tuple] = {}
+        self.job_ids: Dict[str, str] = {}
+        self.bus = get_bus()
+        self.events = self.bus.subscribe('gui', kinds=('progress',))
         
         self._setup_ui()
         self._setup_async_loop()
+        self._start_warm_up()
+        if self.queue:
+            self.queue.start(self.async_loop)
+        self._poll_events()
+    
+    @property
+    def scanner(self) -> Scanner:
+        return self.scanners[self.current_rig]
+    
+    def _protected_scans(self) -> set:
+        paths = set().union(*(s.active_scan_paths() for s in self.scanners.values()))
+        if self.queue:
+            paths |= self.queue.pending_paths()
+        return paths
+    
+    async def _run_job(self, job: Job, on_state, cancel: asyncio.Event):
+        scanner = self.scanners.get(job.rig) or self.scanner
+        return await scanner.run_job(job, on_state, cancel)
     
     def _setup_ui(self):
         header = tk.Frame(self.root, bg='#1a1a1a', pady=20)
@@ -54,6 +101,19 @@ class MainWindow:
         left.pack(side=tk.LEFT, fill=tk.Y, padx=(0, 10))
         left.pack_propagate(False)
         
+        self.rig_var = tk.StringVar(value=self.current_rig)
+        if len(self.scanners) > 1:
+            rig_selector = ttk.Combobox(
+                left,
+                textvariable=self.rig_var,
+                values=list(self.scanners),
+                state='readonly',
+                font=('Arial', 14),
+                width=18
+            )
+            rig_selector.pack(pady=(20, 0))
+            rig_selector.bind('<<ComboboxSelected>>', lambda e: self._on_rig_selected())
+        
         self.scan_button = tk.Button(
             left,
             text="SCAN",
@@ -105,6 +165,39 @@ class MainWindow:
             cursor='hand2'
         )
         
+        self.reference_button = tk.Button(
+            left,
+            text="Capture Empty Turntable",
+            font=('Arial', 10),
+            bg='#555555',
+            fg='white',
+            activebackground='#666666',
+            activeforeground='white',
+            relief=tk.FLAT,
+            padx=10,
+            pady=5,
+            command=self._on_reference_clicked,
+            cursor='hand2'
+        )
+        if get_config().get('app', 'crop', 'enabled'):
+            self.reference_button.pack(side=tk.BOTTOM, pady=10)
+        
+        self.calibrate_button = tk.Button(
+            left,
+            text="Calibrate Turntable",
+            font=('Arial', 10),
+            bg='#555555',
+            fg='white',
+            activebackground='#666666',
+            activeforeground='white',
+            relief=tk.FLAT,
+            padx=10,
+            pady=5,
+            command=self._on_calibrate_clicked,
+            cursor='hand2'
+        )
+        self.calibrate_button.pack(side=tk.BOTTOM, pady=(10, 0))
+        
         voice_frame = tk.LabelFrame(
             left,
             text="Voice Modification",
@@ -158,6 +251,10 @@ class MainWindow:
         )
         self.display_label.pack(expand=True)
         
+        self.preview_parent = right
+        self.viewer = None
+        self.preview_enabled = get_config().get('app', 'preview', 'enabled')
+        
         self.status_text = scrolledtext.ScrolledText(
             right,
             font=('Arial', 10),
@@ -187,12 +284,79 @@ class MainWindow:
         
         self.async_loop = loop_ref['loop']
     
+    def _start_warm_up(self):
+        for name, scanner in self.scanners.items():
+            self.progress[name] = ("Warming up hardware...", 0)
+            scanner.start_warm_up(
+                on_done=lambda err, n=name: self.root.after(0, lambda: self._warm_up_done(n, err))
+            )
+        self._refresh_controls()
+    
+    def _warm_up_done(self, name: str, err: Optional[str]):
+        scanner = self.scanners[name]
+        total = scanner.warmup_timings.get('total', 0.0)
+        if err:
+            self.progress[name] = (f"Hardware error: {err}", -1)
+            self._log(f"{scanner.rig.label}✗ Hardware init failed: {err}\n")
+        else:
+            self.progress[name] = ("Ready to scan", 0)
+            self._log(f"{scanner.rig.label}✓ Hardware ready ({total:.1f}s)\n")
+        self._refresh_controls()
+    
+    def _busy(self, name: str) -> bool:
+        task = self.tasks.get(name)
+        return task is not None and not task.done()
+    
+    def _refresh_controls(self):
+        scanner = self.scanner
+        busy = self._busy(self.current_rig)
+        ready = scanner.ready.is_set() and not scanner.warmup_error
+        self.scan_button.config(state=tk.NORMAL if ready and not busy else tk.DISABLED)
+        self.modify_button.config(
+            state=tk.NORMAL if self.model_urls.get(self.current_rig) and not busy else tk.DISABLED
+        )
+        if busy or (self.queue and self.queue.pending(self.current_rig)):
+            self.cancel_button.pack(pady=10)
+        else:
+            self.cancel_button.pack_forget()
+        self._update_progress_sync(*self.progress.get(self.current_rig, ("Ready to scan", 0)))
+    
+    def _on_rig_selected(self):
+        self.current_rig = self.rig_var.get()
+        self._refresh_controls()
+        path = self.model_urls.get(self.current_rig)
+        if path:
+            self.display_label.config(
+                text=f"3D Model Ready!\n\nFile: {os.path.basename(path)}\n\nPath: {path}"
+            )
+            self._show_preview(path, self.scanner.last_thumbnail)
+        else:
+            self._hide_preview()
+            self.display_label.config(text="Place object on turntable\nand click SCAN to begin")
+    
     def _run_async(self, coro):
         future = asyncio.run_coroutine_threadsafe(coro, self.async_loop)
         return future
     
-    def _update_progress(self, msg: str, prog: int):
-        self.root.after(0, lambda: self._update_progress_sync(msg, prog))
+    def _update_progress(self, msg: str, prog: int, rig: Optional[str] = None):
+        name = rig or self.current_rig
+        self.root.after(0, lambda: self._set_progress(name, msg, prog))
+    
+    def _poll_events(self):
+        for event in self.events.drain():
+            if event.job_id == self.job_ids.get(event.rig):
+                self._set_progress(event.rig, event.message, event.progress)
+        self.root.after(100, self._poll_events)
+    
+    def _job_events(self, name: str):
+        events = self.bus.job(name)
+        self.job_ids[name] = events.job_id
+        return events
+    
+    def _set_progress(self, name: str, msg: str, prog: int):
+        self.progress[name] = (msg, prog)
+        if name == self.current_rig:
+            self._update_progress_sync(msg, prog)
     
     def _update_progress_sync(self, msg: str, prog: int):
         self.progress_label.config(text=msg)
@@ -202,150 +366,296 @@ class MainWindow:
             self.progress_bar['value'] = 0
     
     def _on_scan_clicked(self):
-        if self.scan_task and not self.scan_task.done():
+        name = self.current_rig
+        if self._busy(name):
             return
         
-        self.scan_button.config(state=tk.DISABLED)
-        self.cancel_button.pack(pady=10)
-        self.progress_bar['value'] = 0
-        self.current_model_url = None
-        self.modify_button.config(state=tk.DISABLED)
+        self.model_urls.pop(name, None)
+        self.progress[name] = ("Starting scan...", 0)
+        self._hide_preview()
         
-        self.status_text.config(state=tk.NORMAL)
-        self.status_text.delete(1.0, tk.END)
-        self.status_text.config(state=tk.DISABLED)
+        if len(self.scanners) == 1:
+            self.status_text.config(state=tk.NORMAL)
+            self.status_text.delete(1.0, tk.END)
+            self.status_text.config(state=tk.DISABLED)
         
-        self.cancel_event = asyncio.Event()
-        self.scan_task = self._run_async(self._scan_workflow())
+        self.cancel_events[name] = asyncio.Event()
+        self.tasks[name] = self._run_async(self._scan_workflow(name))
+        self._refresh_controls()
     
     def _on_cancel_clicked(self):
-        if self.cancel_event:
-            self.cancel_event.set()
+        if not self._busy(self.current_rig) and self.queue:
+            jobs = self.queue.pending(self.current_rig)
+            for job in jobs:
+                self.queue.cancel(job.id)
+            self._update_progress(f"Cancelling {len(jobs)} queued job(s)...", 0)
+            return
+        event = self.cancel_events.get(self.current_rig)
+        if event:
+            self.async_loop.call_soon_threadsafe(event.set)
         self._update_progress("Cancelling...", 0)
     
+    def _on_reference_clicked(self):
+        name = self.current_rig
+        if self._busy(name):
+            return
+        self.tasks[name] = self._run_async(self._reference_workflow(name))
+    
+    async def _reference_workflow(self, name: str):
+        scanner = self.scanners[name]
+        try:
+            path = await scanner.capture_reference()
+            self._update_progress("Background reference captured", 0, name)
+            self.root.after(0, lambda: self._log(f"{scanner.rig.label}✓ Background reference saved to: {path}\n"))
+        except Exception as e:
+            self.root.after(0, lambda: self._scan_error(name, str(e)))
+    
+    def _on_calibrate_clicked(self):
+        name = self.current_rig
+        if self._busy(name):
+            return
+        self.cancel_events[name] = asyncio.Event()
+        self.tasks[name] = self._run_async(self._calibration_workflow(name))
+        self._refresh_controls()
+    
+    async def _calibration_workflow(self, name: str):
+        scanner = self.scanners[name]
+        events = self._job_events(name)
+        try:
+            table = await scanner.calibrate_turntable(events, self.cancel_events[name])
+            events.finished('done', "Turntable calibrated", 0)
+            self.root.after(0, lambda: self._log(f"{scanner.rig.label}✓ Turntable calibrated: {table.summary()}\n"))
+        except asyncio.CancelledError:
+            events.finished('cancelled', "Calibration cancelled", 0)
+        except Exception as e:
+            events.finished('failed', str(e), 0)
+            self.root.after(0, lambda: self._scan_error(name, str(e)))
+        finally:
+            self.root.after(0, lambda: self._calibration_done(name))
+    
+    def _calibration_done(self, name: str):
+        self.job_ids.pop(name, None)
+        self._refresh_controls()
+    
+    def _log(self, text: str):
+        self.status_text.config(state=tk.NORMAL)
+        self.status_text.insert(tk.END, text)
+        self.status_text.config(state=tk.DISABLED)
+    
     def _on_modify_clicked(self):
-        if not self.current_model_url:
+        name = self.current_rig
+        if not self.model_urls.get(name):
             messagebox.showwarning("No Model", "Please scan an object first.")
             return
+        if self._busy(name):
+            return
         
         mod = self.voice_entry.get().strip()
         if not mod or mod == "e.g., 'Turn it into gold'":
             messagebox.showwarning("No Modification", "Please enter a modification command.")
             return
         
-        self.modify_button.config(state=tk.DISABLED)
-        self._update_progress(f"Applying modification: {mod}...", 0)
-        self.scan_task = self._run_async(self._modify_workflow(mod))
+        self.cancel_events[name] = asyncio.Event()
+        self.progress[name] = (f"Applying modification: {mod}...", 0)
+        self.tasks[name] = self._run_async(self._modify_workflow(name, mod))
+        self._refresh_controls()
+    
+    async def _scan_workflow(self, name: str):
+        with memory_profile.job(f"{name}:scan"):
+            await self._run_scan(name)
     
-    async def _scan_workflow(self):
+    async def _run_scan(self, name: str):
+        scanner = self.scanners[name]
+        cancel = self.cancel_events[name]
+        events = self._job_events(name)
         try:
-            imgs, dist = await self.scanner.scan_object(
-                on_progress=self._update_progress,
-                cancel=self.cancel_event
-            )
+            imgs, dist = await scanner.scan_object(events, cancel)
             
             if not imgs:
                 raise Exception("No images captured")
             
-            path = await self.scanner.generate_model(
-                imgs,
-                dist,
-                None,
-                self._update_progress,
-                False,
-                self.cancel_event
-            )
+            if self.queue:
+                job = self.queue.submit(name, scanner.last_container or scanner.last_dir)
+                events.finished('queued', f"Queued as job {job.id}", 50)
+                self.root.after(0, lambda: self._scan_queued(name, job))
+                return
+            
+            path = await scanner.generate_model(imgs, dist, None, events, False, cancel)
             
             if path:
-                self.current_model_url = path
-                self.root.after(0, lambda: self._scan_complete(path))
+                events.finished('done', "Scan complete!", 100)
+                self.root.after(0, lambda: self._scan_complete(name, path))
             else:
-                self.root.after(0, lambda: self._scan_cancelled())
+                events.finished('cancelled', "Scan cancelled", 0)
+                self.root.after(0, lambda: self._scan_cancelled(name))
         
         except asyncio.CancelledError:
-            self.root.after(0, lambda: self._scan_cancelled())
+            events.finished('cancelled', "Scan cancelled", 0)
+            self.root.after(0, lambda: self._scan_cancelled(name))
         except Exception as e:
-            self.root.after(0, lambda: self._scan_error(str(e)))
+            events.finished('failed', f"Error: {e}", -1)
+            self.root.after(0, lambda: self._scan_error(name, str(e)))
     
-    async def _modify_workflow(self, mod: str):
+    async def _modify_workflow(self, name: str, mod: str):
+        scanner = self.scanners[name]
+        events = self._job_events(name)
         try:
-            self._update_progress(f"Generating modified model: {mod}...", 0)
+            events.progress(f"Generating modified model: {mod}...", 0)
             
-            path = await self.scanner.generate_model(
-                None,
-                None,
-                mod,
-                self._update_progress,
-                True,
-                self.cancel_event
-            )
+            path = await scanner.generate_model(None, None, mod, events, True, self.cancel_events[name])
             
             if path:
-                self.current_model_url = path
-                self.root.after(0, lambda: self._modify_complete(path))
+                events.finished('done', "Modification complete!", 100)
+                self.root.after(0, lambda: self._modify_complete(name, path))
             else:
-                self.root.after(0, lambda: self._modify_error("Failed to generate modified model"))
+                events.finished('failed', "Failed to generate modified model", -1)
+                self.root.after(0, lambda: self._modify_error(name, "Failed to generate modified model"))
         
         except asyncio.CancelledError:
-            self.root.after(0, lambda: self._modify_error("Modification cancelled"))
+            events.finished('cancelled', "Modification cancelled", 0)
+            self.root.after(0, lambda: self._modify_error(name, "Modification cancelled"))
         except Exception as e:
-            self.root.after(0, lambda: self._modify_error(str(e)))
+            events.finished('failed', f"Error: {e}", -1)
+            self.root.after(0, lambda: self._modify_error(name, str(e)))
     
-    def _scan_complete(self, path: str):
-        self.scan_button.config(state=tk.NORMAL)
-        self.cancel_button.pack_forget()
-        self.modify_button.config(state=tk.NORMAL)
-        self._update_progress_sync("Scan complete!", 100)
-        
-        filename = os.path.basename(path)
-        self.display_label.config(
-            text=f"3D Model Ready!\n\nFile: {filename}\n\nPath: {path}\n\n(3D viewer integration pending)"
-        )
+    def _scan_complete(self, name: str, path: str):
+        self.tasks.pop(name, None)
+        self.job_ids.pop(name, None)
+        scanner = self.scanners[name]
+        self.model_urls[name] = path
+        self.progress[name] = ("Scan complete!", 100)
+        self._refresh_controls()
+        
+        if name == self.current_rig:
+            filename = os.path.basename(path)
+            self.display_label.config(
+                text=f"3D Model Ready!\n\nFile: {filename}\n\nPath: {path}"
+            )
+            self._show_preview(path, scanner.last_thumbnail)
         
-        self.status_text.config(state=tk.NORMAL)
-        self.status_text.insert(tk.END, f"✓ Scan completed successfully\n")
-        self.status_text.insert(tk.END, f"Model saved to: {path}\n")
-        self.status_text.insert(tk.END, f"\nYou can open this file in any 3D viewer (Blender, MeshLab, etc.)\n")
-        self.status_text.config(state=tk.DISABLED)
+        self._log(f"{scanner.rig.label}✓ Scan completed successfully\n")
+        self._log(f"Model saved to: {path}\n")
+        self._log(f"\nYou can open this file in any 3D viewer (Blender, MeshLab, etc.)\n")
     
-    def _scan_cancelled(self):
-        self.scan_button.config(state=tk.NORMAL)
-        self.cancel_button.pack_forget()
-        self._update_progress_sync("Scan cancelled", 0)
-        self.display_label.config(text="Scan cancelled.\nClick SCAN to try again.")
+    def _scan_queued(self, name: str, job: Job):
+        self.tasks.pop(name, None)
+        self.job_ids.pop(name, None)
+        ahead = self.queue.position(job.id)
+        self.progress[name] = (f"Scan captured; model queued ({ahead} ahead)", 50)
+        self._refresh_controls()
+        if name == self.current_rig:
+            self.display_label.config(text="Scan captured.\nThe model will appear here when it is ready.")
+        self._log(f"{self.scanners[name].rig.label}✓ Scan captured, queued as job {job.id}\n")
     
-    def _scan_error(self, err: str):
-        self.scan_button.config(state=tk.NORMAL)
-        self.cancel_button.pack_forget()
-        self._update_progress_sync(f"Error: {err}", -1)
-        self.display_label.config(text=f"Error occurred:\n{err}")
-        
-        self.status_text.config(state=tk.NORMAL)
-        self.status_text.insert(tk.END, f"✗ Error: {err}\n")
-        self.status_text.config(state=tk.DISABLED)
-        
-        messagebox.showerror("Scan Error", f"An error occurred during scanning:\n\n{err}")
+    def _job_changed(self, job: Job):
+        scanner = self.scanners.get(job.rig)
+        if scanner is None:
+            return
+        label = scanner.rig.label
+        busy = self._busy(job.rig)
+        
+        if job.state == 'done':
+            self.model_urls[job.rig] = job.model_path
+            scanner.last_thumbnail = job.thumbnail_path
+            if not busy:
+                self.progress[job.rig] = ("Model ready!", 100)
+            if job.rig == self.current_rig and not busy:
+                filename = os.path.basename(job.model_path)
+                self.display_label.config(
+                    text=f"3D Model Ready!\n\nFile: {filename}\n\nPath: {job.model_path}"
+                )
+                self._show_preview(job.model_path, job.thumbnail_path)
+            self._log(f"{label}✓ Job {job.id} done, model saved to: {job.model_path}\n")
+        elif job.state == 'failed' and job.error == 'cancelled':
+            if not busy:
+                self.progress[job.rig] = (f"Job {job.id} cancelled", 0)
+            self._log(f"{label}✗ Job {job.id} cancelled\n")
+        elif job.state == 'failed':
+            if not busy:
+                self.progress[job.rig] = (f"Error: {job.error}", -1)
+            self._log(f"{label}✗ Job {job.id} failed: {job.error}\n")
+        elif job.state == 'captured' and job.attempts:
+            wait = max(0, job.next_attempt - time.time())
+            self._log(f"{label}… Job {job.id} retry {job.attempts} in {wait:.0f}s: {job.error}\n")
+        elif not busy:
+            stage = "Generating code" if job.state == 'generating' else "Executing Blender"
+            self.progress[job.rig] = (f"{stage} (job {job.id})...", 60 if job.state == 'generating' else 75)
+        self._refresh_controls()
     
-    def _modify_complete(self, path: str):
-        self.modify_button.config(state=tk.NORMAL)
-        self._update_progress_sync("Modification complete!", 100)
-        filename = os.path.basename(path)
-        self.display_label.config(
-            text=f"Modified 3D Model Ready!\n\nFile: {filename}\n\nPath: {path}"
-        )
+    def _show_preview(self, path: str, thumb: Optional[str] = None):
+        if not self.preview_enabled:
+            return
+        if self.viewer is None:
+            from gui.model_viewer import ModelViewer
+            self.viewer = ModelViewer(self.preview_parent, bg='#2a2a2a')
+        self.display_label.config(font=('Arial', 12))
+        self.display_label.pack_configure(expand=False, pady=10)
+        self.viewer.pack(fill=tk.BOTH, expand=True, padx=10, before=self.status_text)
+        self.viewer.load(path, thumb)
+    
+    def _hide_preview(self):
+        if self.viewer:
+            self.viewer.clear()
+            self.viewer.pack_forget()
+        self.display_label.config(font=('Arial', 18))
+        self.display_label.pack_configure(expand=True, pady=0)
+    
+    def _scan_cancelled(self, name: str):
+        self.tasks.pop(name, None)
+        self.job_ids.pop(name, None)
+        self.progress[name] = ("Scan cancelled", 0)
+        self._refresh_controls()
+        if name == self.current_rig:
+            self.display_label.config(text="Scan cancelled.\nClick SCAN to try again.")
+    
+    def _scan_error(self, name: str, err: str):
+        self.tasks.pop(name, None)
+        self.job_ids.pop(name, None)
+        label = self.scanners[name].rig.label
+        self.progress[name] = (f"Error: {err}", -1)
+        self._refresh_controls()
+        if name == self.current_rig:
+            self.display_label.config(text=f"Error occurred:\n{err}")
+        
+        self._log(f"{label}✗ Error: {err}\n")
+        
+        messagebox.showerror("Scan Error", f"{label}An error occurred during scanning:\n\n{err}")
+    
+    def _modify_complete(self, name: str, path: str):
+        self.tasks.pop(name, None)
+        self.job_ids.pop(name, None)
+        scanner = self.scanners[name]
+        self.model_urls[name] = path
+        self.progress[name] = ("Modification complete!", 100)
+        self._refresh_controls()
+        if name == self.current_rig:
+            filename = os.path.basename(path)
+            self.display_label.config(
+                text=f"Modified 3D Model Ready!\n\nFile: {filename}\n\nPath: {path}"
+            )
+            self._show_preview(path, scanner.last_thumbnail)
         
-        self.status_text.config(state=tk.NORMAL)
-        self.status_text.insert(tk.END, f"✓ Modification completed\n")
-        self.status_text.insert(tk.END, f"New Model: {path}\n")
-        self.status_text.config(state=tk.DISABLED)
+        self._log(f"{scanner.rig.label}✓ Modification completed\n")
+        self._log(f"New Model: {path}\n")
     
-    def _modify_error(self, err: str):
-        self.modify_button.config(state=tk.NORMAL)
-        self._update_progress_sync(f"Error: {err}", -1)
-        messagebox.showerror("Modification Error", f"An error occurred:\n\n{err}")
+    def _modify_error(self, name: str, err: str):
+        self.tasks.pop(name, None)
+        self.job_ids.pop(name, None)
+        label = self.scanners[name].rig.label
+        self.progress[name] = (f"Error: {err}", -1)
+        self._refresh_controls()
+        messagebox.showerror("Modification Error", f"{label}An error occurred:\n\n{err}")
     
     def cleanup(self):
-        if self.scanner:
-            self.scanner.cleanup()
+        if self.queue:
+            self.queue.stop()
+        self.retention.stop()
+        self.metrics.stop()
+        self.config_watcher.stop()
+        for scanner in self.scanners.values():
+            scanner.cleanup()
+        self.shared.cleanup()
+        self.bus.close()
+        executors.shutdown()
         if self.async_loop:
             self.async_loop.call_soon_threadsafe(self.async_loop.stop)
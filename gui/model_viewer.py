@@ -0,0 +1,505 @@
+import json
+import math
+import os
+import queue
+import struct
+import threading
+import tkinter as tk
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config_loader import get_config
+
+
+GLB_MAGIC = 0x46546C67
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+COMPONENT_TYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+
+TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT4': 16}
+
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1',
+    'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2',
+    'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4',
+    'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4',
+    'double': 'f8', 'float64': 'f8',
+}
+
+DEFAULT_COLOR = (0.75, 0.75, 0.78)
+
+Mesh = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def load_mesh(path: str) -> Mesh:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.glb':
+        return _load_glb(path)
+    if ext == '.ply':
+        return _load_ply(path)
+    raise ValueError(f"Unsupported preview format: {ext}")
+
+
+def _read_accessor(gltf: dict, blob: bytes, index: int) -> np.ndarray:
+    acc = gltf['accessors'][index]
+    if 'bufferView' not in acc:
+        raise ValueError("Sparse accessors are not supported")
+    view = gltf['bufferViews'][acc['bufferView']]
+    dtype = np.dtype(COMPONENT_TYPES[acc['componentType']])
+    width = TYPE_SIZES[acc['type']]
+    count = acc['count']
+    offset = view.get('byteOffset', 0) + acc.get('byteOffset', 0)
+    stride = view.get('byteStride', 0)
+    item = dtype.itemsize * width
+    
+    if not stride or stride == item:
+        data = np.frombuffer(blob, dtype=dtype, count=count * width, offset=offset)
+        return data.reshape(count, width)
+    
+    raw = np.frombuffer(blob, dtype=np.uint8, count=stride * (count - 1) + item, offset=offset)
+    rows = np.lib.stride_tricks.as_strided(raw, shape=(count, item), strides=(stride, 1))
+    return np.ascontiguousarray(rows).view(dtype).reshape(count, width)
+
+
+def _node_matrix(node: dict) -> np.ndarray:
+    if 'matrix' in node:
+        return np.array(node['matrix'], dtype=np.float64).reshape(4, 4).T
+    
+    t = np.eye(4)
+    t[:3, 3] = node.get('translation', [0.0, 0.0, 0.0])
+    
+    x, y, z, w = node.get('rotation', [0.0, 0.0, 0.0, 1.0])
+    r = np.eye(4)
+    r[:3, :3] = [
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ]
+    
+    s = np.diag(list(node.get('scale', [1.0, 1.0, 1.0])) + [1.0])
+    return t @ r @ s
+
+
+def _material_color(gltf: dict, index: Optional[int]) -> Tuple[float, float, float]:
+    if index is None:
+        return DEFAULT_COLOR
+    try:
+        factor = gltf['materials'][index]['pbrMetallicRoughness']['baseColorFactor']
+        return tuple(factor[:3])
+    except (KeyError, IndexError):
+        return DEFAULT_COLOR
+
+
+def _load_glb(path: str) -> Mesh:
+    with open(path, 'rb') as f:
+        data = f.read()
+    
+    magic, version, length = struct.unpack_from('<III', data, 0)
+    if magic != GLB_MAGIC:
+        raise ValueError("Not a GLB file")
+    
+    gltf = None
+    blob = b''
+    pos = 12
+    while pos < min(length, len(data)):
+        chunk_len, chunk_type = struct.unpack_from('<II', data, pos)
+        chunk = data[pos + 8:pos + 8 + chunk_len]
+        if chunk_type == CHUNK_JSON:
+            gltf = json.loads(chunk.decode('utf-8'))
+        elif chunk_type == CHUNK_BIN:
+            blob = chunk
+        pos += 8 + chunk_len
+    
+    if gltf is None:
+        raise ValueError("GLB has no JSON chunk")
+    if 'KHR_draco_mesh_compression' in gltf.get('extensionsUsed', []):
+        raise ValueError("Draco-compressed meshes are not supported")
+    
+    verts: List[np.ndarray] = []
+    faces: List[np.ndarray] = []
+    colors: List[np.ndarray] = []
+    base = 0
+    
+    if gltf.get('scenes'):
+        roots = gltf['scenes'][gltf.get('scene', 0)].get('nodes', [])
+    else:
+        children = {c for n in gltf.get('nodes', []) for c in n.get('children', [])}
+        roots = [i for i in range(len(gltf.get('nodes', []))) if i not in children]
+    stack = [(n, np.eye(4)) for n in roots]
+    
+    while stack:
+        idx, parent = stack.pop()
+        node = gltf['nodes'][idx]
+        world = parent @ _node_matrix(node)
+        stack.extend((c, world) for c in node.get('children', []))
+        
+        if 'mesh' not in node:
+            continue
+        
+        for prim in gltf['meshes'][node['mesh']]['primitives']:
+            if prim.get('mode', 4) != 4 or 'POSITION' not in prim['attributes']:
+                continue
+            
+            pos_arr = _read_accessor(gltf, blob, prim['attributes']['POSITION']).astype(np.float64)
+            pos_arr = pos_arr @ world[:3, :3].T + world[:3, 3]
+            
+            if 'indices' in prim:
+                tri = _read_accessor(gltf, blob, prim['indices']).astype(np.int64).reshape(-1, 3)
+            else:
+                tri = np.arange(len(pos_arr) - len(pos_arr) % 3, dtype=np.int64).reshape(-1, 3)
+            
+            verts.append(pos_arr)
+            faces.append(tri + base)
+            if 'COLOR_0' in prim['attributes']:
+                vcols = _read_accessor(gltf, blob, prim['attributes']['COLOR_0']).astype(np.float64)
+                if vcols.max() > 1.0:
+                    vcols /= 255.0 if vcols.max() <= 255.0 else 65535.0
+                colors.append(vcols[:, :3][tri].mean(axis=1) * _material_color(gltf, prim.get('material')))
+            else:
+                colors.append(np.tile(_material_color(gltf, prim.get('material')), (len(tri), 1)))
+            base += len(pos_arr)
+    
+    if not faces:
+        raise ValueError("GLB contains no triangle meshes")
+    
+    return np.vstack(verts), np.vstack(faces), np.vstack(colors)
+
+
+def _load_ply(path: str) -> Mesh:
+    with open(path, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError("Not a PLY file")
+        
+        fmt = None
+        elements = []
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError("Truncated PLY header")
+            parts = line.decode('ascii', 'replace').split()
+            if not parts or parts[0] in ('comment', 'obj_info'):
+                continue
+            if parts[0] == 'end_header':
+                break
+            if parts[0] == 'format':
+                fmt = parts[1]
+            elif parts[0] == 'element':
+                elements.append({'name': parts[1], 'count': int(parts[2]), 'props': []})
+            elif parts[0] == 'property':
+                if parts[1] == 'list':
+                    elements[-1]['props'].append((parts[4], 'list', parts[2], parts[3]))
+                else:
+                    elements[-1]['props'].append((parts[2], parts[1]))
+        
+        body = f.read()
+    
+    if fmt == 'ascii':
+        return _parse_ply_ascii(elements, body)
+    if fmt in ('binary_little_endian', 'binary_big_endian'):
+        return _parse_ply_binary(elements, body, '<' if fmt == 'binary_little_endian' else '>')
+    raise ValueError(f"Unsupported PLY format: {fmt}")
+
+
+def _triangulate(polys: List[List[int]]) -> np.ndarray:
+    tris = []
+    for poly in polys:
+        for i in range(1, len(poly) - 1):
+            tris.append((poly[0], poly[i], poly[i + 1]))
+    return np.array(tris, dtype=np.int64).reshape(-1, 3)
+
+
+def _ply_vertex_colors(names: List[str], table) -> Optional[np.ndarray]:
+    if all(c in names for c in ('red', 'green', 'blue')):
+        return np.column_stack([table['red'], table['green'], table['blue']]).astype(np.float64) / 255.0
+    return None
+
+
+def _finish_ply(verts: np.ndarray, faces: np.ndarray, vcols: Optional[np.ndarray]) -> Mesh:
+    if len(faces) == 0:
+        raise ValueError("PLY contains no faces")
+    if vcols is not None:
+        colors = vcols[faces].mean(axis=1)
+    else:
+        colors = np.tile(DEFAULT_COLOR, (len(faces), 1))
+    return verts.astype(np.float64), faces, colors
+
+
+def _parse_ply_ascii(elements: list, body: bytes) -> Mesh:
+    lines = iter(body.decode('ascii', 'replace').splitlines())
+    verts = faces = vcols = None
+    
+    for el in elements:
+        rows = [next(lines).split() for _ in range(el['count'])]
+        if el['name'] == 'vertex':
+            names = [p[0] for p in el['props']]
+            table = np.array(rows, dtype=np.float64).reshape(-1, len(names))
+            cols = {n: table[:, i] for i, n in enumerate(names)}
+            verts = np.column_stack([cols['x'], cols['y'], cols['z']])
+            vcols = _ply_vertex_colors(names, cols)
+        elif el['name'] == 'face':
+            faces = _triangulate([[int(v) for v in r[1:1 + int(r[0])]] for r in rows])
+    
+    if verts is None or faces is None:
+        raise ValueError("PLY is missing vertex or face data")
+    return _finish_ply(verts, faces, vcols)
+
+
+def _parse_ply_binary(elements: list, body: bytes, endian: str) -> Mesh:
+    offset = 0
+    verts = faces = vcols = None
+    
+    for el in elements:
+        props = el['props']
+        if all(len(p) == 2 for p in props):
+            dtype = np.dtype([(p[0], endian + PLY_TYPES[p[1]]) for p in props])
+            table = np.frombuffer(body, dtype=dtype, count=el['count'], offset=offset)
+            offset += dtype.itemsize * el['count']
+            if el['name'] == 'vertex':
+                verts = np.column_stack([table['x'], table['y'], table['z']])
+                vcols = _ply_vertex_colors(list(dtype.names), table)
+            continue
+        
+        if el['name'] != 'face' or len(props) != 1:
+            raise ValueError(f"Unsupported PLY element layout: {el['name']}")
+        
+        _, _, count_type, index_type = props[0]
+        count_dt = np.dtype(endian + PLY_TYPES[count_type])
+        index_dt = np.dtype(endian + PLY_TYPES[index_type])
+        
+        tri_dt = np.dtype([('n', count_dt), ('v', index_dt, (3,))])
+        if len(body) - offset >= tri_dt.itemsize * el['count']:
+            table = np.frombuffer(body, dtype=tri_dt, count=el['count'], offset=offset)
+            if np.all(table['n'] == 3):
+                faces = table['v'].astype(np.int64)
+                offset += tri_dt.itemsize * el['count']
+                continue
+        
+        polys = []
+        for _ in range(el['count']):
+            n = int(np.frombuffer(body, dtype=count_dt, count=1, offset=offset)[0])
+            offset += count_dt.itemsize
+            polys.append(np.frombuffer(body, dtype=index_dt, count=n, offset=offset).tolist())
+            offset += index_dt.itemsize * n
+        faces = _triangulate(polys)
+    
+    if verts is None or faces is None:
+        raise ValueError("PLY is missing vertex or face data")
+    return _finish_ply(verts, faces, vcols)
+
+
+def normalize_mesh(verts: np.ndarray) -> np.ndarray:
+    lo = verts.min(axis=0)
+    hi = verts.max(axis=0)
+    span = float(np.max(hi - lo)) or 1.0
+    return (verts - (lo + hi) / 2.0) / span
+
+
+def decimate(verts: np.ndarray, faces: np.ndarray, colors: np.ndarray, budget: int) -> Mesh:
+    if len(faces) <= budget:
+        return verts, faces, colors
+    
+    lo = verts.min(axis=0)
+    span = np.maximum(verts.max(axis=0) - lo, 1e-9)
+    res = max(4, int(math.sqrt(budget / 2.0)))
+    
+    for _ in range(8):
+        cells = np.minimum((((verts - lo) / span) * res).astype(np.int64), res - 1)
+        keys = (cells[:, 0] * res + cells[:, 1]) * res + cells[:, 2]
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        
+        counts = np.bincount(inverse, minlength=len(uniq)).astype(np.float64)
+        new_verts = np.column_stack([
+            np.bincount(inverse, weights=verts[:, k], minlength=len(uniq)) / counts
+            for k in range(3)
+        ])
+        
+        new_faces = inverse[faces]
+        keep = (
+            (new_faces[:, 0] != new_faces[:, 1])
+            & (new_faces[:, 1] != new_faces[:, 2])
+            & (new_faces[:, 0] != new_faces[:, 2])
+        )
+        new_faces = new_faces[keep]
+        new_colors = colors[keep]
+        
+        _, first = np.unique(np.sort(new_faces, axis=1), axis=0, return_index=True)
+        new_faces = new_faces[first]
+        new_colors = new_colors[first]
+        
+        if len(new_faces) <= budget or res <= 4:
+            return new_verts, new_faces, new_colors
+        res = max(4, int(res * math.sqrt(budget / len(new_faces)) * 0.95))
+    
+    return new_verts, new_faces, new_colors
+
+
+class ModelViewer(tk.Canvas):
+    
+    def __init__(self, parent, **kwargs):
+        kwargs.setdefault('highlightthickness', 0)
+        super().__init__(parent, **kwargs)
+        cfg = get_config()
+        self.face_budget = cfg.get('app', 'preview', 'face_budget')
+        self.interactive_budget = cfg.get('app', 'preview', 'interactive_face_budget')
+        
+        self.lods: Dict[str, Mesh] = {}
+        self.yaw = math.radians(35)
+        self.pitch = math.radians(-20)
+        self.dragging = False
+        self._drag_from = None
+        self._load_token = 0
+        self._results: queue.Queue = queue.Queue()
+        self._loading = 0
+        self._poll_id = None
+        self._pending_redraw = None
+        self._message = None
+        self._thumbnail = None
+        
+        self.bind('<Configure>', lambda e: self._schedule_redraw())
+        self.bind('<ButtonPress-1>', self._on_press)
+        self.bind('<B1-Motion>', self._on_drag)
+        self.bind('<ButtonRelease-1>', self._on_release)
+    
+    def load(self, path: str, thumbnail: Optional[str] = None):
+        self._load_token += 1
+        token = self._load_token
+        self.lods = {}
+        self._thumbnail = self._load_thumbnail(thumbnail) if thumbnail else None
+        self._show_message("Loading preview...")
+        
+        def worker():
+            try:
+                verts, faces, colors = load_mesh(path)
+                verts = normalize_mesh(verts)
+                full = decimate(verts, faces, colors, self.face_budget)
+                fast = decimate(*full, self.interactive_budget)
+                self._results.put((token, {'full': full, 'fast': fast}, None))
+            except Exception as e:
+                self._results.put((token, None, str(e)))
+        
+        self._loading += 1
+        threading.Thread(target=worker, daemon=True).start()
+        if self._poll_id is None:
+            self._poll_id = self.after(50, self._poll_results)
+    
+    def _poll_results(self):
+        while True:
+            try:
+                token, lods, err = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._loading -= 1
+            self._on_loaded(token, lods, err)
+        self._poll_id = self.after(50, self._poll_results) if self._loading else None
+    
+    def clear(self):
+        self._load_token += 1
+        self.lods = {}
+        self._thumbnail = None
+        self._message = None
+        self.delete('all')
+    
+    def _load_thumbnail(self, path: str) -> Optional[tk.PhotoImage]:
+        try:
+            return tk.PhotoImage(file=path)
+        except tk.TclError:
+            return None
+    
+    def _on_loaded(self, token: int, lods: Optional[Dict[str, Mesh]], err: Optional[str]):
+        if token != self._load_token:
+            return
+        if err:
+            self._show_message(f"Preview unavailable:\n{err}")
+            return
+        self.lods = lods
+        self._message = None
+        self._thumbnail = None
+        self._redraw()
+    
+    def _show_message(self, text: str):
+        self._message = text
+        self.delete('all')
+        if self._thumbnail:
+            self.create_image(self.winfo_width() // 2, self.winfo_height() // 2, image=self._thumbnail)
+        self.create_text(
+            self.winfo_width() // 2,
+            self.winfo_height() - 20 if self._thumbnail else self.winfo_height() // 2,
+            text=text,
+            fill='#888888',
+            font=('Arial', 14),
+            justify=tk.CENTER
+        )
+    
+    def _on_press(self, event):
+        self.dragging = True
+        self._drag_from = (event.x, event.y)
+    
+    def _on_drag(self, event):
+        if not self._drag_from:
+            return
+        dx = event.x - self._drag_from[0]
+        dy = event.y - self._drag_from[1]
+        self._drag_from = (event.x, event.y)
+        self.yaw += dx * 0.01
+        self.pitch = max(-math.pi / 2, min(math.pi / 2, self.pitch + dy * 0.01))
+        self._schedule_redraw()
+    
+    def _on_release(self, event):
+        self.dragging = False
+        self._drag_from = None
+        self._schedule_redraw()
+    
+    def _schedule_redraw(self):
+        if self._pending_redraw is None:
+            self._pending_redraw = self.after(16, self._redraw)
+    
+    def _redraw(self):
+        self._pending_redraw = None
+        if self._message:
+            self._show_message(self._message)
+            return
+        if not self.lods:
+            return
+        
+        verts, faces, colors = self.lods['fast' if self.dragging else 'full']
+        w = max(self.winfo_width(), 1)
+        h = max(self.winfo_height(), 1)
+        
+        cy, sy = math.cos(self.yaw), math.sin(self.yaw)
+        cp, sp = math.cos(self.pitch), math.sin(self.pitch)
+        rot = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+        rot = np.array([[1, 0, 0], [0, cp, -sp], [0, sp, cp]]) @ rot
+        v = verts @ rot.T
+        
+        tri = v[faces]
+        normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+        lengths = np.linalg.norm(normals, axis=1)
+        visible = (normals[:, 2] > 0) & (lengths > 0)
+        
+        tri = tri[visible]
+        normals = normals[visible] / lengths[visible, None]
+        light = np.array([0.4, 0.5, 0.77])
+        shade = 0.3 + 0.7 * np.clip(normals @ light, 0.0, 1.0)
+        rgb = np.clip(colors[visible] * shade[:, None] * 255, 0, 255).astype(np.uint8)
+        
+        order = np.argsort(tri[:, :, 2].mean(axis=1))
+        scale = 0.8 * min(w, h)
+        xy = np.empty((len(tri), 6))
+        xy[:, 0::2] = w / 2 + tri[:, :, 0] * scale
+        xy[:, 1::2] = h / 2 - tri[:, :, 1] * scale
+        
+        self.delete('all')
+        for i in order:
+            color = '#%02x%02x%02x' % tuple(rgb[i])
+            self.create_polygon(*xy[i], fill=color, outline=color)
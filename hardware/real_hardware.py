@@ -1,18 +1,22 @@
 import time
+import numpy as np
 import RPi.GPIO as GPIO
 from picamera2 import Picamera2
 from PIL import Image
-from typing import Optional
+from typing import Any, Dict, Optional
 from config_loader import get_config
 
 
 class Turntable:
     
-    def __init__(self):
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
         self.config = get_config()
-        self.burst_duration = self.config.get('hardware', 'turntable', 'burst_duration_ms', default=500) / 1000.0
+        s = settings if settings is not None else self.config.get('hardware', 'turntable')
+        self.steps = s['steps_per_scan']
+        self.calibration = None
+        self.configure(s)
         
-        self.motor_pin = 12
+        self.motor_pin = s['motor_pin']
         
         GPIO.setmode(GPIO.BCM)
         GPIO.setup(self.motor_pin, GPIO.OUT)
@@ -21,26 +25,80 @@ class Turntable:
         
         self.is_rotating = False
         self.current_position = 0.0
+        self._spin_started = None
     
-    def rotate_step(self) -> bool:
+    def configure(self, s: Dict[str, Any]):
+        self.burst_duration = s['burst_duration_ms'] / 1000.0
+        self.min_burst = s['min_burst_ms'] / 1000.0
+        self.degrees_per_second = s['degrees_per_second']
+        self.spin_up = s['spin_up_ms'] / 1000.0
+        self.continuous_duty = s['continuous_duty_cycle']
+    
+    @property
+    def step_angle(self) -> float:
+        return 360.0 / self.steps
+    
+    def burst_for(self, degrees: float) -> float:
+        if self.calibration is not None:
+            return max(self.min_burst, self.calibration.burst_ms(degrees) / 1000.0)
+        return max(self.min_burst, self.burst_duration * degrees / 45.0)
+    
+    def pulse(self, seconds: float) -> bool:
         if self.is_rotating:
             return False
         
         self.is_rotating = True
         try:
             self.motor_pwm.ChangeDutyCycle(50)
-            time.sleep(self.burst_duration)
+            time.sleep(seconds)
             self.motor_pwm.ChangeDutyCycle(0)
-            
-            self.current_position = (self.current_position + 45) % 360
             return True
         finally:
             self.is_rotating = False
     
+    def rotate_step(self, degrees: Optional[float] = None) -> bool:
+        degrees = self.step_angle if degrees is None else degrees
+        seconds = self.burst_for(degrees)
+        if not self.pulse(seconds):
+            return False
+        
+        if self.calibration is not None:
+            degrees = self.calibration.angle(seconds * 1000.0)
+        self.current_position = (self.current_position + degrees) % 360
+        return True
+    
+    def correct_position(self, position: float):
+        self.current_position = position % 360
+    
+    def start_continuous(self) -> bool:
+        if self.is_rotating:
+            return False
+        
+        self.is_rotating = True
+        self._spin_started = time.perf_counter()
+        self.motor_pwm.ChangeDutyCycle(self.continuous_duty)
+        return True
+    
+    def stop_continuous(self):
+        if self._spin_started is None:
+            return
+        
+        self.motor_pwm.ChangeDutyCycle(0)
+        elapsed = time.perf_counter() - self._spin_started - self.spin_up
+        self.current_position = (self.current_position + max(elapsed, 0.0) * self.degrees_per_second) % 360
+        self._spin_started = None
+        self.is_rotating = False
+    
     def reset_position(self):
-        steps_to_reset = int(self.current_position / 45)
-        for _ in range(steps_to_reset):
-            self.rotate_step()
+        remaining = (360.0 - self.current_position) % 360
+        while remaining > 1.0:
+            before = self.current_position
+            if not self.rotate_step(min(self.step_angle, remaining)):
+                break
+            moved = (self.current_position - before) % 360
+            if moved <= 0:
+                break
+            remaining -= moved
         self.current_position = 0.0
     
     def get_position(self) -> float:
@@ -53,11 +111,12 @@ class Turntable:
 
 class DepthSensor:
     
-    def __init__(self):
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
         self.config = get_config()
-        self.trigger_pin = self.config.get('hardware', 'depth_sensor', 'trigger_pin', default=18)
-        self.echo_pin = self.config.get('hardware', 'depth_sensor', 'echo_pin', default=24)
-        self.timeout_us = self.config.get('hardware', 'depth_sensor', 'timeout_us', default=30000)
+        s = settings if settings is not None else self.config.get('hardware', 'depth_sensor')
+        self.trigger_pin = s['trigger_pin']
+        self.echo_pin = s['echo_pin']
+        self.configure(s)
         
         GPIO.setmode(GPIO.BCM)
         GPIO.setup(self.trigger_pin, GPIO.OUT)
@@ -66,6 +125,9 @@ class DepthSensor:
         GPIO.output(self.trigger_pin, False)
         time.sleep(0.1)
     
+    def configure(self, s: Dict[str, Any]):
+        self.timeout_us = s['timeout_us']
+    
     def measure_distance(self) -> float:
         GPIO.output(self.trigger_pin, True)
         time.sleep(0.00001)
@@ -97,22 +159,33 @@ class DepthSensor:
 
 class Camera:
     
-    def __init__(self):
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
         self.config = get_config()
-        self.width = self.config.get('hardware', 'camera', 'resolution_width', default=1920)
-        self.height = self.config.get('hardware', 'camera', 'resolution_height', default=1080)
-        self.rotation = self.config.get('hardware', 'camera', 'rotation', default=0)
+        s = settings if settings is not None else self.config.get('hardware', 'camera')
+        self.index = s['index']
+        self.width = s['resolution_width']
+        self.height = s['resolution_height']
+        self.rotation = s['rotation']
+        self.configure(s)
+        self.preview_size = (
+            s['preview_width'],
+            s['preview_height']
+        )
         
-        self.camera = Picamera2()
+        self.camera = Picamera2(self.index)
         
         camera_config = self.camera.create_still_configuration(
-            main={"size": (self.width, self.height)}
+            main={"size": (self.width, self.height)},
+            lores={"size": self.preview_size}
         )
         self.camera.configure(camera_config)
         self.camera.start()
         
         time.sleep(2)
     
+    def configure(self, s: Dict[str, Any]):
+        self.gain_limit = s['continuous_max_gain']
+    
     def capture_image(self) -> Optional[Image.Image]:
         try:
             array = self.camera.capture_array()
@@ -127,6 +200,30 @@ class Camera:
             print(f"Error capturing image: {e}")
             return None
     
+    def capture_preview(self) -> np.ndarray:
+        yuv = self.camera.capture_array("lores")
+        return yuv[:self.preview_size[1], :self.preview_size[0]]
+    
+    def set_exposure(self, exposure_us: int):
+        try:
+            metadata = self.camera.capture_metadata()
+            auto_exposure = metadata.get('ExposureTime', exposure_us)
+            auto_gain = metadata.get('AnalogueGain', 1.0)
+            gain = min(self.gain_limit, auto_gain * max(auto_exposure / exposure_us, 1.0))
+            self.camera.set_controls({
+                'AeEnable': False,
+                'ExposureTime': int(exposure_us),
+                'AnalogueGain': float(gain)
+            })
+        except Exception as e:
+            print(f"Error setting exposure: {e}")
+    
+    def reset_exposure(self):
+        try:
+            self.camera.set_controls({'AeEnable': True})
+        except Exception as e:
+            print(f"Error resetting exposure: {e}")
+    
     def close(self):
         if hasattr(self, 'camera'):
             self.camera.stop()
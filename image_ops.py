@@ -0,0 +1,132 @@
+import io
+import math
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from PIL import Image, ImageDraw, ImageFont
+
+
+Frame = Union[Image.Image, bytes]
+
+
+def select_indices(count: int, max_imgs: int) -> List[int]:
+    if count <= max_imgs:
+        return list(range(count))
+    step = count / max_imgs
+    return [int(i * step) for i in range(max_imgs)]
+
+
+def select_views(imgs: List[Image.Image], max_imgs: int) -> List[Image.Image]:
+    return [imgs[i] for i in select_indices(len(imgs), max_imgs)]
+
+
+def optimize_images(imgs: List[Image.Image], max_size: int) -> List[Image.Image]:
+    result = []
+    for img in imgs:
+        if max(img.size) > max_size:
+            ratio = max_size / max(img.size)
+            new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
+            img = img.resize(new_size, Image.Resampling.BILINEAR)
+        result.append(img)
+    return result
+
+
+def decode(frame: Frame) -> Image.Image:
+    if isinstance(frame, Image.Image):
+        return frame
+    img = Image.open(io.BytesIO(frame))
+    img.load()
+    return img
+
+
+def frame_size(frame: Frame) -> Tuple[int, int]:
+    if isinstance(frame, Image.Image):
+        return frame.size
+    return Image.open(io.BytesIO(frame)).size
+
+
+def encode_jpeg(img: Image.Image, quality: int) -> bytes:
+    buf = io.BytesIO()
+    img.convert('RGB').save(buf, 'JPEG', quality=quality)
+    return buf.getvalue()
+
+
+def prepare_upload(
+    views: List[Frame],
+    max_size: int,
+    quality: int,
+    crop: Optional[Callable[[List[Image.Image]], List[Image.Image]]] = None,
+    sheet: Optional[Tuple[Sequence[float], int, bool]] = None
+) -> Tuple[List[bytes], List[Tuple[int, int]], Optional[Dict[str, Any]]]:
+    views = [decode(v) for v in views]
+    if crop is not None:
+        views = crop(views)
+    layout = None
+    if sheet is not None:
+        angles, size, labels = sheet
+        mosaic, layout = contact_sheet(views, angles, size, labels)
+        views = [mosaic]
+    else:
+        views = optimize_images(views, max_size)
+    return [encode_jpeg(img, quality) for img in views], [img.size for img in views], layout
+
+
+def sheet_grid(count: int, tile_w: int, tile_h: int, size: int) -> Tuple[int, int, float]:
+    best = (1, count, 0.0)
+    for columns in range(1, count + 1):
+        rows = math.ceil(count / columns)
+        scale = min(size / (columns * tile_w), size / (rows * tile_h))
+        if scale > best[2]:
+            best = (columns, rows, scale)
+    return best
+
+
+def _label_font(height: int):
+    try:
+        return ImageFont.load_default(size=max(10, height))
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def contact_sheet(
+    imgs: List[Image.Image],
+    angles: Sequence[float],
+    size: int,
+    labels: bool = True,
+    background: Tuple[int, int, int] = (0, 0, 0)
+) -> Tuple[Image.Image, Dict[str, Any]]:
+    if not imgs:
+        raise ValueError("No images for the contact sheet")
+    tile_w = max(img.size[0] for img in imgs)
+    tile_h = max(img.size[1] for img in imgs)
+    columns, rows, scale = sheet_grid(len(imgs), tile_w, tile_h, size)
+    scale = min(scale, 1.0)
+    cell_w, cell_h = max(1, int(tile_w * scale)), max(1, int(tile_h * scale))
+    
+    sheet = Image.new('RGB', (columns * cell_w, rows * cell_h), background)
+    draw = ImageDraw.Draw(sheet)
+    font = _label_font(cell_h // 12)
+    gap = max(2, min(cell_w, cell_h) // 100)
+    for i, (img, angle) in enumerate(zip(imgs, angles)):
+        tile = img.convert('RGB')
+        ratio = min((cell_w - gap) / tile.size[0], (cell_h - gap) / tile.size[1])
+        if ratio < 1:
+            tile = tile.resize((max(1, int(tile.size[0] * ratio)), max(1, int(tile.size[1] * ratio))),
+                               Image.Resampling.BILINEAR)
+        x = (i % columns) * cell_w + (cell_w - tile.size[0]) // 2
+        y = (i // columns) * cell_h + (cell_h - tile.size[1]) // 2
+        sheet.paste(tile, (x, y))
+        if labels:
+            text = f"{i + 1}: {angle:.0f} deg"
+            left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+            pad = max(2, (bottom - top) // 4)
+            box = (x, y, x + right - left + 2 * pad, y + bottom - top + 2 * pad)
+            draw.rectangle(box, fill=(0, 0, 0))
+            draw.text((x + pad - left, y + pad - top), text, fill=(255, 255, 255), font=font)
+    
+    layout = {
+        'views': len(imgs),
+        'columns': columns,
+        'rows': rows,
+        'angles': [round(float(a), 1) for a in angles[:len(imgs)]],
+        'labels': labels,
+    }
+    return sheet, layout
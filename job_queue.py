@@ -0,0 +1,372 @@
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from config_loader import get_config
+import metrics
+
+
+STATES = ('captured', 'generating', 'building', 'done', 'failed')
+RATE_LIMIT_MARKERS = ('429', 'RESOURCE_EXHAUSTED', 'ResourceExhausted', 'quota', 'rate limit')
+
+QUEUE_JOBS = metrics.gauge('lighthouse_queue_jobs', 'Queued generation jobs by state')
+QUEUE_RETRIES = metrics.counter('lighthouse_queue_retries_total', 'Generation job retries by reason')
+QUEUE_WAIT_SECONDS = metrics.histogram('lighthouse_queue_wait_seconds', 'Time from capture to the start of generation')
+
+
+class Job:
+    
+    def __init__(
+        self,
+        job_id: str,
+        rig: str,
+        scan_path: str,
+        modification: Optional[str] = None,
+        state: str = 'captured',
+        attempts: int = 0,
+        next_attempt: float = 0.0,
+        error: Optional[str] = None,
+        created: Optional[float] = None,
+        updated: Optional[float] = None,
+        model_path: Optional[str] = None,
+        thumbnail_path: Optional[str] = None
+    ):
+        self.id = job_id
+        self.rig = rig
+        self.scan_path = scan_path
+        self.modification = modification
+        self.state = state
+        self.attempts = attempts
+        self.next_attempt = next_attempt
+        self.error = error
+        self.created = created or time.time()
+        self.updated = updated or self.created
+        self.model_path = model_path
+        self.thumbnail_path = thumbnail_path
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'rig': self.rig,
+            'scan_path': self.scan_path,
+            'modification': self.modification,
+            'state': self.state,
+            'attempts': self.attempts,
+            'next_attempt': self.next_attempt,
+            'error': self.error,
+            'created': self.created,
+            'updated': self.updated,
+            'model_path': self.model_path,
+            'thumbnail_path': self.thumbnail_path,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Job':
+        data = dict(data)
+        return cls(data.pop('id'), **data)
+    
+    @property
+    def finished(self) -> bool:
+        return self.state in ('done', 'failed')
+    
+    def __repr__(self) -> str:
+        return f"Job({self.id!r}, {self.state}, attempts={self.attempts})"
+
+
+class TokenBucket:
+    
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def delay(self) -> float:
+        self._refill()
+        blocked = max(0.0, self.blocked_until - time.monotonic())
+        if self.tokens >= 1.0:
+            return blocked
+        if self.rate <= 0:
+            return float('inf')
+        return max(blocked, (1.0 - self.tokens) / self.rate)
+    
+    def take(self) -> bool:
+        if self.delay() > 0:
+            return False
+        self.tokens -= 1.0
+        return True
+    
+    def pause(self, seconds: float):
+        self._refill()
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    text = f"{error} {metrics.error_type(error)}"
+    return any(marker.lower() in text.lower() for marker in RATE_LIMIT_MARKERS)
+
+
+class JobQueue:
+    
+    def __init__(self, runner: Callable[[Job, Callable[[str], None], asyncio.Event], Awaitable]):
+        cfg = get_config()
+        self.runner = runner
+        self.path = cfg.get('app', 'queue', 'path')
+        self.max_concurrent = cfg.get('app', 'queue', 'max_concurrent')
+        if cfg.get('app', 'profiling', 'enabled') and self.max_concurrent > 1:
+            print("[INFO] Memory profiling is on: running queued jobs one at a time")
+            self.max_concurrent = 1
+        self.max_attempts = cfg.get('app', 'queue', 'max_attempts')
+        self.backoff_base = cfg.get('app', 'queue', 'backoff_base_seconds')
+        self.backoff_max = cfg.get('app', 'queue', 'backoff_max_seconds')
+        self.keep_finished = cfg.get('app', 'queue', 'keep_finished')
+        self.bucket = TokenBucket(
+            cfg.get('app', 'queue', 'rate_per_minute'),
+            cfg.get('app', 'queue', 'burst')
+        )
+        self.listeners: List[Callable[[Job], None]] = []
+        self.jobs: Dict[str, Job] = {}
+        self._jobs_lock = threading.Lock()
+        self._running: Dict[str, asyncio.Future] = {}
+        self._cancels: Dict[str, asyncio.Event] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+    
+    def _load(self):
+        resumed = 0
+        for name in sorted(os.listdir(self.path)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.path, name), 'r') as f:
+                    job = Job.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"Error reading queued job {name}: {e}")
+                continue
+            if job.state in ('generating', 'building'):
+                job.state = 'captured'
+                self._save(job)
+            if job.state == 'captured':
+                resumed += 1
+            with self._jobs_lock:
+                self.jobs[job.id] = job
+        if resumed:
+            print(f"[QUEUE] Resuming {resumed} unfinished job(s)")
+        self._update_gauge()
+    
+    def _save(self, job: Job):
+        job.updated = time.time()
+        path = os.path.join(self.path, f'{job.id}.json')
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(job.to_dict(), f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Error saving job {job.id}: {e}")
+    
+    def _all(self) -> List[Job]:
+        with self._jobs_lock:
+            return list(self.jobs.values())
+    
+    def _prune(self):
+        finished = sorted((j for j in self._all() if j.finished), key=lambda j: j.updated)
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            with self._jobs_lock:
+                self.jobs.pop(job.id, None)
+            try:
+                os.unlink(os.path.join(self.path, f'{job.id}.json'))
+            except OSError:
+                pass
+    
+    def _update_gauge(self):
+        jobs = self._all()
+        for state in STATES:
+            QUEUE_JOBS.set(sum(1 for j in jobs if j.state == state), state=state)
+    
+    def _set_state(self, job: Job, state: str):
+        job.state = state
+        self._save(job)
+        self._update_gauge()
+        for listener in self.listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                print(f"Error in job listener: {e}")
+    
+    def submit(self, rig: str, scan_path: str, modification: Optional[str] = None) -> Job:
+        job_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        job = Job(job_id, rig, scan_path, modification)
+        with self._jobs_lock:
+            self.jobs[job.id] = job
+        self._set_state(job, 'captured')
+        self._notify()
+        return job
+    
+    def cancel(self, job_id: str):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._cancel, job_id)
+        else:
+            self._cancel(job_id)
+    
+    def _cancel(self, job_id: str):
+        with self._jobs_lock:
+            job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return
+        if job_id in self._cancels:
+            self._cancels[job_id].set()
+        else:
+            job.error = 'cancelled'
+            self._set_state(job, 'failed')
+    
+    def pending(self, rig: Optional[str] = None) -> List[Job]:
+        jobs = [j for j in self._all() if not j.finished and (rig is None or j.rig == rig)]
+        return sorted(jobs, key=lambda j: j.created)
+    
+    def pending_paths(self) -> set:
+        return {j.scan_path for j in self.pending()}
+    
+    def position(self, job_id: str) -> int:
+        ids = [j.id for j in self.pending()]
+        return ids.index(job_id) if job_id in ids else -1
+    
+    def _notify(self):
+        if self._loop and self._wake:
+            self._loop.call_soon_threadsafe(self._wake.set)
+    
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        return asyncio.run_coroutine_threadsafe(self.run(), loop)
+    
+    def stop(self):
+        self._stopping = True
+        self._notify()
+        if self._loop:
+            for event in list(self._cancels.values()):
+                self._loop.call_soon_threadsafe(event.set)
+    
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+    
+    def _next_ready(self) -> Optional[Job]:
+        now = time.time()
+        for job in self.pending():
+            if job.state == 'captured' and job.id not in self._running and job.next_attempt <= now:
+                return job
+        return None
+    
+    def _idle_delay(self) -> float:
+        waiting = [j.next_attempt for j in self.pending() if j.state == 'captured' and j.id not in self._running]
+        if not waiting:
+            return 60.0
+        return min(60.0, max(0.05, min(waiting) - time.time()))
+    
+    async def _sleep(self, seconds: float):
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=min(seconds, 60.0))
+        except asyncio.TimeoutError:
+            pass
+    
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        while not self._stopping:
+            if len(self._running) >= self.max_concurrent:
+                await self._sleep(60.0)
+                continue
+            job = self._next_ready()
+            if job is None:
+                await self._sleep(self._idle_delay())
+                continue
+            delay = self.bucket.delay()
+            if delay > 0:
+                await self._sleep(delay)
+                continue
+            self.bucket.take()
+            self._running[job.id] = asyncio.ensure_future(self._process(job))
+        
+        if self._running:
+            await asyncio.wait(list(self._running.values()))
+    
+    async def _process(self, job: Job):
+        cancel = self._cancels[job.id] = asyncio.Event()
+        if job.attempts == 0:
+            QUEUE_WAIT_SECONDS.observe(time.time() - job.created)
+        try:
+            path, thumb = await self.runner(job, lambda state: self._set_state(job, state), cancel)
+            if not path:
+                raise Exception("Blender produced no model")
+            job.model_path = path
+            job.thumbnail_path = thumb
+            job.error = None
+            self._set_state(job, 'done')
+        except asyncio.CancelledError:
+            if self._stopping and not job.finished:
+                self._set_state(job, 'captured')
+            else:
+                job.error = 'cancelled'
+                self._set_state(job, 'failed')
+        except Exception as e:
+            job.attempts += 1
+            job.error = str(e)
+            limited = is_rate_limited(e)
+            delay = self._backoff(job.attempts)
+            if limited:
+                self.bucket.pause(delay)
+            if job.attempts >= self.max_attempts:
+                print(f"[QUEUE] Job {job.id} failed after {job.attempts} attempts: {e}")
+                self._set_state(job, 'failed')
+            else:
+                QUEUE_RETRIES.inc(reason='rate_limit' if limited else 'error')
+                job.next_attempt = time.time() + delay
+                print(f"[QUEUE] Job {job.id} attempt {job.attempts} failed, retrying in {delay:.0f}s: {e}")
+                self._set_state(job, 'captured')
+        finally:
+            self._running.pop(job.id, None)
+            self._cancels.pop(job.id, None)
+            self._prune()
+            if self._wake:
+                self._wake.set()
+
+
+def main() -> int:
+    queue = JobQueue(runner=None)
+    if len(sys.argv) > 2 and sys.argv[1] == 'retry':
+        for job_id in sys.argv[2:]:
+            job = queue.jobs.get(job_id)
+            if job and job.state == 'failed':
+                job.attempts = 0
+                job.next_attempt = 0.0
+                job.error = None
+                queue._set_state(job, 'captured')
+                print(f"Requeued {job_id}")
+        return 0
+    
+    for job in sorted(queue.jobs.values(), key=lambda j: j.created):
+        print(f"{job.id}  {job.state:<10}  attempts={job.attempts}  rig={job.rig}  {job.scan_path}"
+              + (f"  error={job.error[:80]}" if job.error else ''))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from config_loader import get_config
+import image_ops
+
+
+class LatencyPlanner:
+    
+    def __init__(self):
+        cfg = get_config()
+        self.history_path = cfg.get('app', 'latency_planner', 'history_path')
+        self.history_limit = cfg.get('app', 'latency_planner', 'history_limit')
+        self._lock = threading.Lock()
+        self._file_lines = 0
+        self.samples: List[Dict[str, Any]] = self._load()
+        self.coefficients: Optional[np.ndarray] = None
+        self.output_k: Optional[float] = None
+        self.fit_status = ''
+        self._plans = 0
+        self.last_plan: Optional[Dict[str, Any]] = None
+        self.configure()
+        cfg.subscribe(
+            self.configure, 'app.latency_planner', 'app.gemini_max_images', 'app.gemini_image_max_size',
+            'app.gemini_upload_mode', 'app.mosaic.size'
+        )
+    
+    def configure(self, changed: Optional[List[str]] = None):
+        cfg = get_config()
+        self.enabled = cfg.get('app', 'latency_planner', 'enabled')
+        self.target = cfg.get('app', 'latency_planner', 'target_seconds')
+        self.min_samples = cfg.get('app', 'latency_planner', 'min_samples')
+        self.counts = cfg.get('app', 'latency_planner', 'candidate_counts')
+        self.sizes = cfg.get('app', 'latency_planner', 'candidate_sizes')
+        self.default_images = cfg.get('app', 'gemini_max_images')
+        self.default_size = cfg.get('app', 'gemini_image_max_size')
+        self.mode = cfg.get('app', 'gemini_upload_mode')
+        self.mosaic_size = cfg.get('app', 'mosaic', 'size')
+        self.fit()
+    
+    def _load(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.history_path):
+            return []
+        samples = []
+        with open(self.history_path, 'r') as f:
+            for line in f:
+                self._file_lines += 1
+                try:
+                    samples.append(json.loads(line))
+                except ValueError:
+                    pass
+        return samples[-self.history_limit:]
+    
+    def _compact_history(self):
+        tmp = self.history_path + '.tmp'
+        with open(tmp, 'w') as f:
+            for sample in self.samples:
+                f.write(json.dumps(sample) + '\n')
+        os.replace(tmp, self.history_path)
+        self._file_lines = len(self.samples)
+    
+    def record(
+        self,
+        images: int,
+        pixels: int,
+        payload_bytes: int,
+        latency: float,
+        prompt_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        **extra
+    ):
+        sample = {
+            'time': time.time(),
+            'images': images,
+            'pixels': pixels,
+            'payload_bytes': payload_bytes,
+            'latency': latency,
+            'prompt_tokens': prompt_tokens,
+            'output_tokens': output_tokens,
+        }
+        sample.update(extra)
+        
+        with self._lock:
+            self.samples.append(sample)
+            self.samples = self.samples[-self.history_limit:]
+            try:
+                with open(self.history_path, 'a') as f:
+                    f.write(json.dumps(sample) + '\n')
+                self._file_lines += 1
+                if self._file_lines > 2 * self.history_limit:
+                    self._compact_history()
+            except OSError as e:
+                print(f"Error writing latency history: {e}")
+            self.fit()
+    
+    def fit(self) -> Optional[np.ndarray]:
+        samples = [
+            s for s in self.samples
+            if s.get('latency') is not None and s.get('mode', 'separate') == self.mode
+        ]
+        self.coefficients = None
+        self.output_k = None
+        if len(samples) < self.min_samples:
+            self.fit_status = f"{len(samples)}/{self.min_samples} samples recorded"
+            return None
+        
+        rows = [[1.0, s.get('views', s['images']), s['pixels'] / 1e6] for s in samples]
+        points = len({(r[1], round(r[2], 3)) for r in rows})
+        outputs = [s.get('output_tokens') for s in samples]
+        if all(o is not None for o in outputs) and len(set(outputs)) > 1:
+            self.output_k = float(np.median(outputs)) / 1000
+            rows = [r + [o / 1000] for r, o in zip(rows, outputs)]
+        x = np.array(rows)
+        y = np.array([s['latency'] for s in samples])
+        if points < 2 or np.linalg.matrix_rank(x) < x.shape[1]:
+            self.output_k = None
+            self.fit_status = f"history covers {points} image budget(s), too few to separate per-image and per-megapixel cost"
+            return None
+        
+        self.coefficients = _nnls(x, y)
+        self.fit_status = f"fitted on {len(samples)} samples across {points} image budgets"
+        return self.coefficients
+    
+    def pixels(self, images: int, size: int, aspect: float = 0.5625) -> int:
+        tile_w, tile_h = (size, size * aspect) if aspect <= 1 else (size / aspect, size)
+        if self.mode != 'mosaic':
+            return int(images * tile_w * tile_h)
+        columns, rows, scale = image_ops.sheet_grid(images, tile_w, tile_h, self.mosaic_size)
+        return int(columns * tile_w * rows * tile_h * min(scale, 1.0) ** 2)
+    
+    def predict(self, images: int, size: int, aspect: float = 0.5625) -> Optional[float]:
+        if self.coefficients is None:
+            return None
+        mp = self.pixels(images, size, aspect) / 1e6
+        x = [1.0, images, mp] + ([self.output_k] if self.output_k is not None else [])
+        return float(self.coefficients @ np.array(x))
+    
+    def _explore(self, available: int) -> tuple[int, int, str]:
+        images = min(available, self.default_images)
+        options = [(images, self.default_size, "using static config")]
+        fewer = [c for c in self.counts if 0 < c < images]
+        if fewer:
+            options.append((max(fewer), self.default_size, "exploring fewer images"))
+        smaller = [s for s in self.sizes if s < self.default_size]
+        if smaller and self.mode != 'mosaic':
+            options.append((images, max(smaller), "exploring smaller images"))
+        self._plans += 1
+        return options[self._plans % len(options)]
+    
+    def plan(self, available: int, aspect: float = 0.5625) -> Dict[str, Any]:
+        plan: Dict[str, Any] = {
+            'target_seconds': self.target,
+            'samples': len(self.samples),
+            'model': None if self.coefficients is None else {
+                'base_seconds': round(float(self.coefficients[0]), 3),
+                'per_image_seconds': round(float(self.coefficients[1]), 3),
+                'per_megapixel_seconds': round(float(self.coefficients[2]), 3),
+                'per_1k_output_tokens_seconds': None if self.output_k is None else round(float(self.coefficients[3]), 3),
+                'median_output_tokens': None if self.output_k is None else round(self.output_k * 1000),
+            },
+            'candidates': [],
+        }
+        
+        if self.coefficients is None:
+            if len(self.samples) < self.min_samples:
+                images, size, step = min(available, self.default_images), self.default_size, "using static config"
+            else:
+                images, size, step = self._explore(available)
+            plan.update(
+                max_images=images,
+                max_size=size,
+                predicted_seconds=None,
+                reason=f"{step}: {self.fit_status}"
+            )
+            self.last_plan = plan
+            return plan
+        
+        sizes = [self.mosaic_size] if self.mode == 'mosaic' else self.sizes
+        for n in sorted({min(c, available) for c in self.counts if c > 0}):
+            for size in sizes:
+                plan['candidates'].append({
+                    'images': n,
+                    'size': size,
+                    'megapixels': round(self.pixels(n, size, aspect) / 1e6, 2),
+                    'predicted_seconds': round(self.predict(n, size, aspect), 2),
+                })
+        
+        within = [c for c in plan['candidates'] if c['predicted_seconds'] <= self.target]
+        if within:
+            best = max(within, key=lambda c: (c['megapixels'], c['images']))
+            reason = "largest payload predicted within target"
+        else:
+            best = min(plan['candidates'], key=lambda c: c['predicted_seconds'])
+            reason = "no candidate fits target; using fastest"
+        
+        plan.update(
+            max_images=best['images'],
+            max_size=best['size'],
+            predicted_seconds=best['predicted_seconds'],
+            reason=reason
+        )
+        self.last_plan = plan
+        return plan
+
+
+def _nnls(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    best = np.zeros(x.shape[1])
+    best_error = float(np.sum(y ** 2))
+    for mask in itertools.product((False, True), repeat=x.shape[1]):
+        cols = [i for i, use in enumerate(mask) if use]
+        if not cols:
+            continue
+        coef, *_ = np.linalg.lstsq(x[:, cols], y, rcond=None)
+        if (coef < 0).any():
+            continue
+        error = float(np.sum((x[:, cols] @ coef - y) ** 2))
+        if error < best_error:
+            best = np.zeros(x.shape[1])
+            best[cols] = coef
+            best_error = error
+    return best
+
+
+def main() -> int:
+    planner = LatencyPlanner()
+    plan = planner.plan(int(sys.argv[1]) if len(sys.argv) > 1 else planner.default_images)
+    print(json.dumps(plan, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,14 @@
+import time
+
+_START = time.perf_counter()
+
 import tkinter as tk
 import sys
 from gui.main_window import MainWindow
 from config_loader import get_config
 
+_IMPORTED = time.perf_counter()
+
 
 def main():
     print("*" * 60)
@@ -10,7 +16,7 @@ def main():
     print("*" * 60)
     
     cfg = get_config()
-    key = cfg.get('ai', 'gemini', 'api_key', default='')
+    key = cfg.get('ai', 'gemini', 'api_key')
     
     if not key:
         print("\n*** ACTION REQUIRED ***")
@@ -23,6 +29,11 @@ def main():
     
     root = tk.Tk()
     app = MainWindow(root)
+    root.update_idletasks()
+    
+    ready = time.perf_counter()
+    print(f"[TIME] Imports: {(_IMPORTED - _START) * 1000:.0f} ms")
+    print(f"[TIME] Window ready: {(ready - _START) * 1000:.0f} ms")
     
     def on_closing():
         app.cleanup()
@@ -0,0 +1,261 @@
+import contextvars
+import gc
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image
+from config_loader import get_config
+
+
+MB = 1024 * 1024
+_IGNORED = (tracemalloc.__file__, '<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>', '<unknown>')
+
+_current: contextvars.ContextVar[Optional['JobProfile']] = contextvars.ContextVar('memory_profile_job', default=None)
+_profiler = None
+
+
+def rss_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, ValueError):
+        return None
+
+
+def live_images() -> Dict[str, Any]:
+    count = loaded = 0
+    total = 0
+    for obj in gc.get_objects():
+        if isinstance(obj, Image.Image):
+            count += 1
+            if getattr(obj, 'im', None) is not None:
+                loaded += 1
+                total += obj.width * obj.height * len(obj.getbands())
+    return {'count': count, 'loaded': loaded, 'mb': round(total / MB, 2)}
+
+
+SiteStats = Dict[str, Tuple[int, int]]
+SITES_KEPT = 1000
+
+
+def _site_stats() -> Tuple[SiteStats, int]:
+    stats = []
+    own = 0
+    for stat in tracemalloc.take_snapshot().statistics('lineno'):
+        frame = stat.traceback[0]
+        if frame.filename == __file__:
+            own += stat.size
+        elif frame.filename not in _IGNORED:
+            stats.append((f"{frame.filename}:{frame.lineno}", (stat.size, stat.count)))
+    return dict(stats[:SITES_KEPT]), own
+
+
+def _top_sites(new: SiteStats, old: SiteStats, limit: int) -> List[Dict[str, Any]]:
+    diffs = []
+    for site in new.keys() | old.keys():
+        size, count = new.get(site, (0, 0))
+        old_size, old_count = old.get(site, (0, 0))
+        if size != old_size:
+            diffs.append((size - old_size, site, size, count - old_count))
+    diffs.sort(key=lambda d: abs(d[0]), reverse=True)
+    return [
+        {
+            'site': site,
+            'size_diff_kb': round(diff / 1024, 1),
+            'size_kb': round(size / 1024, 1),
+            'count_diff': count_diff,
+        }
+        for diff, site, size, count_diff in diffs[:limit]
+    ]
+
+
+class JobProfile:
+    
+    def __init__(self, profiler: 'MemoryProfiler', label: str):
+        self.profiler = profiler
+        self.label = label
+        self.started = time.time()
+        self.stages: List[Dict[str, Any]] = []
+        self._first: Optional[SiteStats] = None
+        self._previous: Optional[SiteStats] = None
+        self._own = 0
+        self.overlapped = False
+        self.mark('start', sites=True)
+    
+    def mark(self, stage: str, sites: bool = False):
+        current, peak = tracemalloc.get_traced_memory()
+        top = []
+        if sites or self.profiler.stage_sites:
+            snapshot, self._own = _site_stats()
+            if self._previous is not None:
+                top = _top_sites(snapshot, self._previous, self.profiler.top_n)
+            if self._first is None:
+                self._first = snapshot
+            self._previous = snapshot
+        rss = rss_bytes()
+        self.stages.append({
+            'stage': stage,
+            'elapsed_s': round(time.time() - self.started, 3),
+            'traced_mb': round((current - self._own) / MB, 2),
+            'peak_mb': round((peak - self._own) / MB, 2),
+            'rss_mb': round(rss / MB, 2) if rss is not None else None,
+            'images': live_images(),
+            'top_sites': top,
+        })
+        if not self.overlapped:
+            tracemalloc.reset_peak()
+    
+    def finish(self) -> Dict[str, Any]:
+        gc.collect()
+        self.mark('end', sites=True)
+        report = {
+            'job': self.label,
+            'time': self.started,
+            'duration_s': round(time.time() - self.started, 3),
+            'peak_mb': max(s['peak_mb'] for s in self.stages),
+            'retained_mb': self.stages[-1]['traced_mb'],
+            'retained_images': self.stages[-1]['images'],
+            'growth_sites': _top_sites(self._previous, self._first, self.profiler.top_n),
+            'overlapped': self.overlapped,
+            'stages': self.stages,
+        }
+        return report
+
+
+class MemoryProfiler:
+    
+    def __init__(self):
+        cfg = get_config()
+        self.enabled = cfg.get('app', 'profiling', 'enabled')
+        self.frames = cfg.get('app', 'profiling', 'frames')
+        self.top_n = cfg.get('app', 'profiling', 'top_n')
+        self.stage_sites = cfg.get('app', 'profiling', 'stage_sites')
+        self.output_path = cfg.get('app', 'profiling', 'output_path')
+        self.leak_jobs = cfg.get('app', 'profiling', 'leak_jobs')
+        self.leak_threshold = cfg.get('app', 'profiling', 'leak_threshold_mb')
+        self.history: List[Dict[str, Any]] = []
+        self._baselines: List[tuple] = []
+        self._active: List[JobProfile] = []
+        self._lock = threading.Lock()
+        if self.enabled and cfg.get('app', 'executors', 'image', 'kind') == 'process':
+            print("Warning: memory profiling traces this process only; image work in the process pool is not "
+                  "counted (set app.executors.image.kind: thread while profiling)")
+    
+    def start(self, label: str) -> JobProfile:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        profile = JobProfile(self, label)
+        with self._lock:
+            if self._active:
+                profile.overlapped = True
+                for other in self._active:
+                    other.overlapped = True
+            self._active.append(profile)
+        return profile
+    
+    def finish(self, profile: JobProfile) -> Dict[str, Any]:
+        report = profile.finish()
+        with self._lock:
+            self._active.remove(profile)
+        if profile.overlapped:
+            report['leak_suspected'] = False
+        else:
+            self._baselines.append((profile.label, report['retained_mb'], profile._previous))
+            self._baselines = self._baselines[-(self.leak_jobs + 1):]
+            report['leak_suspected'] = self._check_leak(report)
+        self.history.append(report)
+        
+        images = report['retained_images']
+        print(f"[MEM] {profile.label}: peak {report['peak_mb']:.1f} MB, retained {report['retained_mb']:.1f} MB, "
+              f"{images['loaded']}/{images['count']} images live ({images['mb']:.1f} MB)")
+        if profile.overlapped:
+            print("[MEM]   ran alongside another job: figures mix both jobs and are left out of the leak check")
+        for site in report['growth_sites'][:3]:
+            print(f"[MEM]   {site['size_diff_kb']:+.0f} KB  {site['site']}")
+        
+        if self.output_path:
+            try:
+                with open(self.output_path, 'a') as f:
+                    f.write(json.dumps(report) + '\n')
+            except OSError as e:
+                print(f"Error writing memory profile: {e}")
+        return report
+    
+    def _check_leak(self, report: Dict[str, Any]) -> bool:
+        if len(self._baselines) <= self.leak_jobs:
+            return False
+        retained = [b[1] for b in self._baselines]
+        growing = all(b > a for a, b in zip(retained, retained[1:]))
+        if not growing or retained[-1] - retained[0] < self.leak_threshold:
+            return False
+        
+        sites = _top_sites(self._baselines[-1][2], self._baselines[0][2], self.top_n)
+        report['leak_sites'] = sites
+        print(f"[MEM] Possible leak: retained memory grew {retained[-1] - retained[0]:.1f} MB "
+              f"over the last {self.leak_jobs} jobs")
+        for site in sites[:5]:
+            print(f"[MEM]   {site['size_diff_kb']:+.0f} KB  {site['site']}")
+        return True
+
+
+def get_profiler() -> MemoryProfiler:
+    global _profiler
+    if _profiler is None:
+        _profiler = MemoryProfiler()
+    return _profiler
+
+
+@contextmanager
+def job(label: str):
+    profiler = get_profiler()
+    if not profiler.enabled or _current.get() is not None:
+        yield _current.get()
+        return
+    
+    profile = profiler.start(label)
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+        profiler.finish(profile)
+
+
+def mark(stage: str):
+    profile = _current.get()
+    if profile is not None:
+        profile.mark(stage)
+
+
+def main() -> int:
+    path = sys.argv[1] if len(sys.argv) > 1 else get_profiler().output_path
+    if not os.path.exists(path):
+        print(f"No memory profile at {path}")
+        return 1
+    with open(path, 'r') as f:
+        reports = [json.loads(line) for line in f if line.strip()]
+    
+    print(f"{'job':<32} {'peak MB':>8} {'retained MB':>12} {'images':>7} {'leak':>5}")
+    for report in reports:
+        print(f"{report['job'][:32]:<32} {report['peak_mb']:>8.1f} {report['retained_mb']:>12.1f} "
+              f"{report['retained_images']['loaded']:>7} {'yes' if report.get('leak_suspected') else '':>5}")
+    if reports:
+        worst = max(reports, key=lambda r: r['peak_mb'])
+        stage = max(worst['stages'], key=lambda s: s['peak_mb'])
+        print(f"\nHighest peak: {worst['peak_mb']:.1f} MB in {worst['job']} during '{stage['stage']}'")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+from config_loader import get_config
+
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    body = ','.join('%s="%s"' % (k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs)
+    return '{' + body + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class Counter:
+    kind = 'counter'
+    
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0.0)
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+    
+    def set(self, value: float, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    kind = 'histogram'
+    
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels):
+        key = _key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+    
+    def time(self, **labels) -> 'Timer':
+        return Timer(self, labels)
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, state in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+                cumulative += count
+                le = ('le', '+Inf' if math.isinf(bound) else repr(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(cumulative)}")
+        return lines
+
+
+class Timer:
+    
+    def __init__(self, histogram: Histogram, labels: Dict[str, object]):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+    
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+    
+    def _get(self, cls, name: str, help_text: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+    
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get(Counter, name, help_text)
+    
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get(Gauge, name, help_text)
+    
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets=buckets)
+    
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help_text: str) -> Counter:
+    return REGISTRY.counter(name, help_text)
+
+
+def gauge(name: str, help_text: str) -> Gauge:
+    return REGISTRY.gauge(name, help_text)
+
+
+def histogram(name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.histogram(name, help_text, buckets)
+
+
+def error_type(e: BaseException) -> str:
+    cause = e.__cause__ or e.__context__
+    return type(cause or e).__name__
+
+
+class MetricsExporter:
+    
+    def __init__(self, registry: Registry = REGISTRY):
+        cfg = get_config()
+        self.registry = registry
+        self.host = cfg.get('app', 'metrics', 'host')
+        self.port = cfg.get('app', 'metrics', 'port')
+        self.file_path = cfg.get('app', 'metrics', 'file_path')
+        self.interval = cfg.get('app', 'metrics', 'interval_seconds')
+        self._server = None
+        self._started = False
+        self._stop = threading.Event()
+    
+    def start(self):
+        self._started = True
+        if self.port:
+            registry = self.registry
+            
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] not in ('/', '/metrics'):
+                        self.send_error(404)
+                        return
+                    body = registry.render().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                
+                def log_message(self, *args):
+                    pass
+            
+            try:
+                self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+                self._server.daemon_threads = True
+                threading.Thread(target=self._server.serve_forever, daemon=True).start()
+                print(f"[INFO] Metrics at http://{self.host}:{self.port}/metrics")
+            except OSError as e:
+                print(f"Error starting metrics endpoint: {e}")
+        
+        if self.file_path:
+            threading.Thread(target=self._write_loop, daemon=True).start()
+    
+    def _write_loop(self):
+        while not self._stop.is_set():
+            self.write_file()
+            self._stop.wait(self.interval)
+    
+    def write_file(self):
+        tmp = f"{self.file_path}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                f.write(self.registry.render())
+            os.replace(tmp, self.file_path)
+        except OSError as e:
+            print(f"Error writing metrics file: {e}")
+    
+    def stop(self):
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+            self._server = None
+        if self._started and self.file_path:
+            self.write_file()
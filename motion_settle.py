@@ -0,0 +1,80 @@
+import asyncio
+import time
+from typing import Dict, Optional
+import numpy as np
+from PIL import Image
+from config_loader import get_config
+
+
+def sharpness(luma: np.ndarray) -> float:
+    f = luma.astype(np.float32)
+    lap = 4 * f[1:-1, 1:-1] - f[:-2, 1:-1] - f[2:, 1:-1] - f[1:-1, :-2] - f[1:-1, 2:]
+    return float(lap.var())
+
+
+def frame_difference(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.abs(a.astype(np.int16) - b.astype(np.int16)).mean() / 255.0)
+
+
+def image_luma(img: Image.Image, size) -> np.ndarray:
+    return np.asarray(img.convert('L').resize(size, Image.Resampling.BILINEAR))
+
+
+class MotionSettle:
+    
+    def __init__(self):
+        cfg = get_config()
+        self.enabled = cfg.get('app', 'settle', 'enabled')
+        self.max_wait = cfg.get('app', 'settle', 'max_wait_seconds')
+        self.min_wait = cfg.get('app', 'settle', 'min_wait_seconds')
+        self.poll_interval = cfg.get('app', 'settle', 'poll_interval_seconds')
+        self.diff_threshold = cfg.get('app', 'settle', 'diff_threshold')
+        self.stable_frames = cfg.get('app', 'settle', 'stable_frames')
+        self.min_sharpness_ratio = cfg.get('app', 'settle', 'min_sharpness_ratio')
+        self.max_retries = cfg.get('app', 'settle', 'max_retries')
+    
+    async def wait(self, camera) -> Dict[str, float]:
+        start = time.perf_counter()
+        await asyncio.sleep(self.min_wait)
+        
+        prev: Optional[np.ndarray] = None
+        stable = 0
+        diff = 1.0
+        
+        while True:
+            frame = camera.capture_preview()
+            if prev is not None:
+                diff = frame_difference(prev, frame)
+                stable = stable + 1 if diff < self.diff_threshold else 0
+            prev = frame
+            
+            elapsed = time.perf_counter() - start
+            if stable >= self.stable_frames or elapsed >= self.max_wait:
+                return {
+                    'waited': elapsed,
+                    'settled': stable >= self.stable_frames,
+                    'difference': diff,
+                    'sharpness': sharpness(frame),
+                    'size': (frame.shape[1], frame.shape[0]),
+                }
+            await asyncio.sleep(self.poll_interval)
+    
+    async def capture(self, camera) -> tuple[Optional[Image.Image], Dict[str, float]]:
+        stats = await self.wait(camera)
+        best_img = None
+        best_score = -1.0
+        
+        for attempt in range(self.max_retries + 1):
+            img = camera.capture_image()
+            if img is None:
+                continue
+            score = sharpness(image_luma(img, stats['size']))
+            if score > best_score:
+                best_img, best_score = img, score
+            if score >= stats['sharpness'] * self.min_sharpness_ratio:
+                break
+            await asyncio.sleep(self.poll_interval)
+        
+        stats['capture_sharpness'] = best_score
+        stats['retries'] = attempt
+        return best_img, stats
@@ -0,0 +1,120 @@
+import os
+from typing import List, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageFilter
+from config_loader import get_config
+
+
+Box = Tuple[int, int, int, int]
+
+
+def _analysis_array(img: Image.Image, size: Tuple[int, int]) -> np.ndarray:
+    return np.asarray(img.convert('RGB').resize(size, Image.Resampling.BILINEAR), dtype=np.int16)
+
+
+def _open(mask: np.ndarray) -> np.ndarray:
+    eroded = mask.copy()
+    eroded[1:, :] &= mask[:-1, :]
+    eroded[:-1, :] &= mask[1:, :]
+    eroded[:, 1:] &= mask[:, :-1]
+    eroded[:, :-1] &= mask[:, 1:]
+    dilated = eroded.copy()
+    dilated[1:, :] |= eroded[:-1, :]
+    dilated[:-1, :] |= eroded[1:, :]
+    dilated[:, 1:] |= eroded[:, :-1]
+    dilated[:, :-1] |= eroded[:, 1:]
+    return dilated
+
+
+class ObjectCropper:
+    
+    def __init__(self):
+        cfg = get_config()
+        self.enabled = cfg.get('app', 'crop', 'enabled')
+        self.reference_path = cfg.get('app', 'crop', 'reference_path')
+        self.margin = cfg.get('app', 'crop', 'margin')
+        self.threshold = cfg.get('app', 'crop', 'threshold')
+        self.analysis_size = cfg.get('app', 'crop', 'analysis_size')
+        self.min_fraction = cfg.get('app', 'crop', 'min_fraction')
+        self.mask_background = cfg.get('app', 'crop', 'mask_background')
+        self.mask_color = tuple(cfg.get('app', 'crop', 'mask_color'))
+    
+    def save_reference(self, img: Image.Image):
+        os.makedirs(os.path.dirname(self.reference_path) or '.', exist_ok=True)
+        img.convert('RGB').save(self.reference_path, 'JPEG', quality=95)
+    
+    def load_reference(self) -> Optional[Image.Image]:
+        if not os.path.exists(self.reference_path):
+            return None
+        try:
+            return Image.open(self.reference_path)
+        except OSError:
+            return None
+    
+    def _grid(self, img: Image.Image) -> Tuple[int, int]:
+        scale = self.analysis_size / max(img.size)
+        return max(1, int(img.size[0] * scale)), max(1, int(img.size[1] * scale))
+    
+    def masks(self, imgs: List[Image.Image]) -> List[np.ndarray]:
+        size = self._grid(imgs[0])
+        ref = self.load_reference()
+        ref_arr = _analysis_array(ref, size) if ref is not None else None
+        
+        result = []
+        for img in imgs:
+            arr = _analysis_array(img, size)
+            if ref_arr is not None:
+                background = ref_arr
+            else:
+                border = np.concatenate([arr[0], arr[-1], arr[:, 0], arr[:, -1]])
+                background = np.median(border, axis=0)
+            diff = np.abs(arr - background).max(axis=2)
+            result.append(_open(diff > self.threshold))
+        return result
+    
+    def bounding_box(self, imgs: List[Image.Image], masks: Optional[List[np.ndarray]] = None) -> Optional[Box]:
+        if not imgs:
+            return None
+        masks = masks if masks is not None else self.masks(imgs)
+        union = np.logical_or.reduce(masks)
+        h, w = union.shape
+        
+        cols = np.flatnonzero(union.sum(axis=0) >= max(1, self.min_fraction * h))
+        rows = np.flatnonzero(union.sum(axis=1) >= max(1, self.min_fraction * w))
+        if len(cols) == 0 or len(rows) == 0:
+            return None
+        
+        full_w, full_h = imgs[0].size
+        sx, sy = full_w / w, full_h / h
+        left, right = cols[0] * sx, (cols[-1] + 1) * sx
+        top, bottom = rows[0] * sy, (rows[-1] + 1) * sy
+        
+        pad = self.margin * max(right - left, bottom - top)
+        return (
+            max(0, int(left - pad)),
+            max(0, int(top - pad)),
+            min(full_w, int(right + pad)),
+            min(full_h, int(bottom + pad)),
+        )
+    
+    def apply(self, imgs: List[Image.Image]) -> List[Image.Image]:
+        if not imgs:
+            return imgs
+        masks = self.masks(imgs)
+        box = self.bounding_box(imgs, masks)
+        if box is None:
+            return imgs
+        
+        result = []
+        for img, mask in zip(imgs, masks):
+            cropped = img.crop(box)
+            if self.mask_background:
+                cropped = self._mask(img, cropped, mask, box)
+            result.append(cropped)
+        return result
+    
+    def _mask(self, img: Image.Image, cropped: Image.Image, mask: np.ndarray, box: Box) -> Image.Image:
+        full = Image.fromarray((mask * 255).astype(np.uint8)).resize(img.size, Image.Resampling.NEAREST)
+        alpha = full.crop(box).filter(ImageFilter.MaxFilter(9)).filter(ImageFilter.GaussianBlur(2))
+        backdrop = Image.new('RGB', cropped.size, self.mask_color)
+        return Image.composite(cropped.convert('RGB'), backdrop, alpha)
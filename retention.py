@@ -0,0 +1,310 @@
+import io
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Set, Union
+from PIL import Image
+from config_loader import get_config
+from scan_container import ScanContainer, EXTENSION, path_lock
+
+
+class ScanEntry:
+    
+    def __init__(self, scan_id: str, path: str):
+        self.scan_id = scan_id
+        self.path = path
+        self.is_container = path.endswith(EXTENSION)
+        self.created = self._created()
+        self.size = _path_size(path)
+        self.meta = self._read_meta()
+    
+    def _created(self) -> float:
+        try:
+            return datetime.strptime(self.scan_id, "%Y%m%d_%H%M%S").timestamp()
+        except ValueError:
+            return os.path.getmtime(self.path)
+    
+    def _read_meta(self) -> Dict:
+        if self.is_container:
+            try:
+                with ScanContainer(self.path) as container:
+                    return dict(container.meta)
+            except (ValueError, OSError):
+                return {}
+        
+        meta = {}
+        for name in ('model_path', 'downgraded'):
+            full = os.path.join(self.path, f'{name}.txt')
+            if os.path.exists(full):
+                with open(full, 'r') as f:
+                    meta[name] = f.read().strip()
+        history = os.path.join(self.path, 'model_history.txt')
+        if os.path.exists(history):
+            with open(history, 'r') as f:
+                meta['model_history'] = [line.strip() for line in f if line.strip()]
+        return meta
+    
+    @property
+    def models(self) -> List[str]:
+        history = list(self.meta.get('model_history', []))
+        current = self.meta.get('model_path')
+        if current and current not in history:
+            history.append(current)
+        return history
+
+
+def _path_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _model_files(path: str) -> List[str]:
+    thumb = os.path.splitext(path)[0] + '_thumb.png'
+    return [p for p in (path, thumb) if os.path.exists(p)]
+
+
+class RetentionManager:
+    
+    def __init__(
+        self,
+        scans_dir: Union[str, Sequence[str]] = 'scans',
+        models_dir: str = 'models',
+        protected: Optional[Callable[[], Set[str]]] = None
+    ):
+        cfg = get_config()
+        self.scans_dirs = [scans_dir] if isinstance(scans_dir, str) else list(scans_dir)
+        self.models_dir = models_dir
+        self.protected = protected or (lambda: set())
+        self.interval = cfg.get('app', 'retention', 'interval_seconds')
+        self.configure()
+        cfg.subscribe(self.configure, 'app.retention', 'app.gemini_image_max_size', 'app.image_quality')
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def configure(self, changed: Optional[List[str]] = None):
+        cfg = get_config()
+        self.max_bytes = cfg.get('app', 'retention', 'max_total_mb') * 1024 * 1024
+        self.max_age = cfg.get('app', 'retention', 'max_age_days') * 86400
+        self.keep_models = cfg.get('app', 'retention', 'keep_models_per_scan')
+        self.downgrade_old = cfg.get('app', 'retention', 'downgrade')
+        self.image_max_size = cfg.get('app', 'gemini_image_max_size')
+        self.quality = cfg.get('app', 'image_quality')
+    
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                summary = self.run_once()
+                if any(summary.values()):
+                    print(f"[RETENTION] {summary}")
+            except Exception as e:
+                print(f"Error during retention pass: {e}")
+            self._stop.wait(self.interval)
+    
+    def _scans(self, scans_dir: Optional[str] = None) -> List[ScanEntry]:
+        if scans_dir is None:
+            entries = [e for d in self.scans_dirs for e in self._scans(d)]
+            return sorted(entries, key=lambda e: e.created)
+        if not os.path.exists(scans_dir):
+            return []
+        entries = []
+        for name in os.listdir(scans_dir):
+            full = os.path.join(scans_dir, name)
+            if name.endswith(EXTENSION) and os.path.isfile(full):
+                entries.append(ScanEntry(name[:-len(EXTENSION)], full))
+            elif os.path.isdir(full):
+                entries.append(ScanEntry(name, full))
+        return sorted(entries, key=lambda e: e.created)
+    
+    def _models(self) -> List[str]:
+        if not os.path.exists(self.models_dir):
+            return []
+        return [
+            os.path.join(self.models_dir, name)
+            for name in os.listdir(self.models_dir)
+            if name.startswith('model_') and not name.endswith('_thumb.png')
+        ]
+    
+    def run_once(self) -> Dict[str, int]:
+        with self._lock:
+            return self._compact()
+    
+    def _compact(self) -> Dict[str, int]:
+        summary = {'models_deleted': 0, 'scans_downgraded': 0, 'scans_deleted': 0, 'bytes_freed': 0}
+        now = time.time()
+        scans = self._scans()
+        protected = {os.path.abspath(p) for p in self.protected()}
+        for scans_dir in self.scans_dirs:
+            newest = self._scans(scans_dir)
+            if newest:
+                protected.add(os.path.abspath(newest[-1].path))
+        
+        def is_protected(entry: ScanEntry) -> bool:
+            return os.path.abspath(entry.path) in protected
+        
+        referenced = set()
+        for entry in scans:
+            models = entry.models
+            keep = set(models[-self.keep_models:]) if self.keep_models > 0 else set()
+            if entry.meta.get('model_path'):
+                keep.add(entry.meta['model_path'])
+            if is_protected(entry):
+                keep.update(models)
+            referenced.update(os.path.abspath(m) for m in keep)
+            removed = [m for m in models if m not in keep]
+            for model in removed:
+                freed = self._delete_model(model)
+                if freed:
+                    summary['bytes_freed'] += freed
+                    summary['models_deleted'] += 1
+            if removed:
+                self._prune_history(entry, set(removed))
+        
+        for model in self._models():
+            if os.path.abspath(model) in referenced:
+                continue
+            if now - os.path.getmtime(model) > self.max_age:
+                freed = self._delete_model(model)
+                if freed:
+                    summary['bytes_freed'] += freed
+                    summary['models_deleted'] += 1
+        
+        for entry in scans:
+            if is_protected(entry) or now - entry.created <= self.max_age:
+                continue
+            summary['bytes_freed'] += self._retire(entry, summary)
+        
+        scans = [e for e in self._scans() if not is_protected(e)]
+        total = sum(e.size for e in self._scans()) + sum(
+            os.path.getsize(m) for m in self._models() if os.path.exists(m)
+        )
+        
+        if self.downgrade_old:
+            for entry in scans:
+                if total <= self.max_bytes:
+                    break
+                if entry.meta.get('downgraded'):
+                    continue
+                freed = self._downgrade(entry)
+                total -= freed
+                summary['bytes_freed'] += freed
+                summary['scans_downgraded'] += 1
+        
+        for entry in scans:
+            if total <= self.max_bytes:
+                break
+            freed = self._delete_scan(entry)
+            total -= freed
+            summary['bytes_freed'] += freed
+            summary['scans_deleted'] += 1
+        
+        return summary
+    
+    def _retire(self, entry: ScanEntry, summary: Dict[str, int]) -> int:
+        if self.downgrade_old:
+            if entry.meta.get('downgraded'):
+                return 0
+            summary['scans_downgraded'] += 1
+            return self._downgrade(entry)
+        summary['scans_deleted'] += 1
+        return self._delete_scan(entry)
+    
+    def _delete_model(self, path: str) -> int:
+        freed = 0
+        for p in _model_files(path):
+            try:
+                size = os.path.getsize(p)
+                os.unlink(p)
+                freed += size
+            except OSError:
+                pass
+        return freed
+    
+    def _prune_history(self, entry: ScanEntry, removed: Set[str]):
+        try:
+            with path_lock(entry.path):
+                if entry.is_container:
+                    with ScanContainer(entry.path) as container:
+                        history = [m for m in container.meta.get('model_history', []) if m not in removed]
+                    ScanContainer.update_meta(entry.path, {'model_history': history})
+                else:
+                    path = os.path.join(entry.path, 'model_history.txt')
+                    with open(path, 'r') as f:
+                        history = [line.strip() for line in f if line.strip() and line.strip() not in removed]
+                    with open(path, 'w') as f:
+                        f.writelines(f"{m}\n" for m in history)
+            entry.meta['model_history'] = history
+        except (OSError, ValueError) as e:
+            print(f"Error pruning model history of {entry.path}: {e}")
+    
+    def _delete_scan(self, entry: ScanEntry) -> int:
+        freed = 0
+        for model in entry.models:
+            freed += self._delete_model(model)
+        try:
+            if entry.is_container:
+                os.unlink(entry.path)
+            else:
+                shutil.rmtree(entry.path)
+            freed += entry.size
+        except OSError as e:
+            print(f"Error deleting scan {entry.path}: {e}")
+        return freed
+    
+    def _shrink(self, data: bytes) -> bytes:
+        img = Image.open(io.BytesIO(data))
+        if max(img.size) <= self.image_max_size:
+            return data
+        ratio = self.image_max_size / max(img.size)
+        img = img.resize((int(img.size[0] * ratio), int(img.size[1] * ratio)), Image.Resampling.BILINEAR)
+        buf = io.BytesIO()
+        img.convert('RGB').save(buf, 'JPEG', quality=self.quality, optimize=True)
+        return buf.getvalue()
+    
+    def _downgrade(self, entry: ScanEntry) -> int:
+        before = entry.size
+        try:
+            if entry.is_container:
+                with path_lock(entry.path):
+                    with ScanContainer(entry.path) as container:
+                        meta = dict(container.meta)
+                        blobs = [(name, self._shrink(bytes(container.blob(name)))) for name in container.names()]
+                    meta['downgraded'] = self.image_max_size
+                    ScanContainer.write(entry.path, meta, blobs)
+            else:
+                for name in os.listdir(entry.path):
+                    if not name.lower().endswith('.jpg'):
+                        continue
+                    full = os.path.join(entry.path, name)
+                    with open(full, 'rb') as f:
+                        data = self._shrink(f.read())
+                    tmp = full + '.tmp'
+                    with open(tmp, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp, full)
+                with open(os.path.join(entry.path, 'downgraded.txt'), 'w') as f:
+                    f.write(f"{self.image_max_size}\n")
+        except Exception as e:
+            print(f"Error downgrading scan {entry.path}: {e}")
+            return 0
+        return max(before - _path_size(entry.path), 0)
@@ -0,0 +1,61 @@
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+from config_loader import get_config
+
+
+DEFAULT_RIG = 'default'
+SECTIONS = ('turntable', 'depth_sensor', 'camera')
+
+
+class Rig:
+    
+    def __init__(self, name: str = DEFAULT_RIG, overrides: Optional[Dict[str, Any]] = None, scans_dir: str = 'scans'):
+        self.name = name
+        self.scans_dir = scans_dir
+        self.overrides = overrides or {}
+        self.settings: Dict[str, Dict[str, Any]] = {}
+        self.refresh()
+        self.capture_lock = asyncio.Lock()
+    
+    def refresh(self):
+        cfg = get_config()
+        settings = {}
+        for section in SECTIONS:
+            settings[section] = _merge(cfg.get('hardware', section), self.overrides.get(section) or {})
+        self.settings = settings
+    
+    @property
+    def steps(self) -> int:
+        return self.settings['turntable']['steps_per_scan']
+    
+    @property
+    def label(self) -> str:
+        return '' if self.name == DEFAULT_RIG else f"[{self.name}] "
+    
+    def __repr__(self) -> str:
+        return f"Rig({self.name!r}, scans_dir={self.scans_dir!r})"
+
+
+def _merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def load_rigs() -> List[Rig]:
+    declared = get_config().get('hardware', 'rigs')
+    if not declared:
+        return [Rig()]
+    
+    rigs = []
+    for i, entry in enumerate(declared):
+        name = str(entry.get('name') or f'rig{i + 1}')
+        if any(r.name == name for r in rigs):
+            raise Exception(f"Duplicate rig name in hardware.rigs: {name}")
+        rigs.append(Rig(name, entry, os.path.join('scans', name)))
+    return rigs
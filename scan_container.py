@@ -0,0 +1,213 @@
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from PIL import Image
+
+
+MAGIC = b'LHSCAN01'
+FOOTER = struct.Struct('<QQ8s')
+EXTENSION = '.lhscan'
+BLOB_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+Blob = Union[bytes, bytearray, memoryview]
+
+_locks: Dict[str, threading.RLock] = {}
+_locks_guard = threading.Lock()
+
+
+def path_lock(path: str) -> threading.RLock:
+    key = os.path.abspath(path)
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = threading.RLock()
+        return lock
+
+
+class ScanContainer:
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Empty scan container: {path}")
+        self._view = memoryview(self._mmap)
+        
+        if len(self._mmap) < len(MAGIC) + FOOTER.size or self._view[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Not a scan container: {path}")
+        
+        offset, length, magic = FOOTER.unpack_from(self._mmap, len(self._mmap) - FOOTER.size)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Truncated scan container: {path}")
+        
+        self.manifest = json.loads(bytes(self._view[offset:offset + length]).decode('utf-8'))
+        self._index = {b['name']: (b['offset'], b['length']) for b in self.manifest['blobs']}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self.manifest.get('meta', {})
+    
+    def names(self) -> List[str]:
+        return [b['name'] for b in self.manifest['blobs']]
+    
+    def blob(self, name: str) -> memoryview:
+        offset, length = self._index[name]
+        return self._view[offset:offset + length]
+    
+    def image(self, name: str) -> Image.Image:
+        img = Image.open(io.BytesIO(self.blob(name)))
+        img.load()
+        return img
+    
+    def close(self):
+        try:
+            self._view.release()
+            self._mmap.close()
+        except BufferError:
+            pass
+        self._file.close()
+    
+    @staticmethod
+    def write(path: str, meta: Dict[str, Any], blobs: Iterable[Tuple[str, Blob]]):
+        directory = os.path.dirname(os.path.abspath(path))
+        
+        with path_lock(path):
+            mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644
+            f = tempfile.NamedTemporaryFile(
+                'wb', dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp', delete=False
+            )
+            try:
+                with f:
+                    f.write(MAGIC)
+                    index = []
+                    for name, data in blobs:
+                        index.append({'name': name, 'offset': f.tell(), 'length': len(data)})
+                        f.write(data)
+                    
+                    manifest = json.dumps({'version': 1, 'meta': meta, 'blobs': index}).encode('utf-8')
+                    manifest_offset = f.tell()
+                    f.write(manifest)
+                    f.write(FOOTER.pack(manifest_offset, len(manifest), MAGIC))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.chmod(f.name, mode)
+                os.replace(f.name, path)
+            except BaseException:
+                try:
+                    os.unlink(f.name)
+                except OSError:
+                    pass
+                raise
+            
+            _fsync_dir(directory)
+    
+    @classmethod
+    def update_meta(cls, path: str, changes: Dict[str, Any]):
+        with path_lock(path):
+            with cls(path) as old:
+                meta = dict(old.meta)
+                blobs = [(name, bytes(old.blob(name))) for name in old.names()]
+            meta.update(changes)
+            cls.write(path, meta, blobs)
+
+
+def _fsync_dir(directory: str):
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _parse_meta(name: str, text: str) -> Any:
+    text = text.strip()
+    if name == 'model_history':
+        return [line for line in text.splitlines() if line.strip()]
+    if name == 'angles':
+        return [float(line) for line in text.splitlines() if line.strip()]
+    if name == 'distance':
+        try:
+            return float(text)
+        except ValueError:
+            return None
+    return text
+
+
+def import_directory(scan_dir: str, path: Optional[str] = None) -> str:
+    if path is None:
+        path = os.path.normpath(scan_dir) + EXTENSION
+    
+    meta = {}
+    names = []
+    for entry in sorted(os.listdir(scan_dir)):
+        full = os.path.join(scan_dir, entry)
+        stem, ext = os.path.splitext(entry)
+        if not os.path.isfile(full):
+            continue
+        if ext.lower() == '.txt':
+            with open(full, 'r') as f:
+                meta[stem] = _parse_meta(stem, f.read())
+        elif ext.lower() in BLOB_EXTENSIONS:
+            names.append(entry)
+    
+    def blobs():
+        for name in names:
+            with open(os.path.join(scan_dir, name), 'rb') as f:
+                yield name, f.read()
+    
+    ScanContainer.write(path, meta, blobs())
+    return path
+
+
+def export_directory(path: str, scan_dir: Optional[str] = None) -> str:
+    if scan_dir is None:
+        scan_dir = path[:-len(EXTENSION)] if path.endswith(EXTENSION) else path + '_export'
+    os.makedirs(scan_dir, exist_ok=True)
+    
+    with ScanContainer(path) as container:
+        for name in container.names():
+            with open(os.path.join(scan_dir, name), 'wb') as f:
+                f.write(container.blob(name))
+        for key, value in container.meta.items():
+            if value is None:
+                continue
+            if isinstance(value, list):
+                value = '\n'.join(str(v) for v in value)
+            with open(os.path.join(scan_dir, f'{key}.txt'), 'w') as f:
+                f.write(f"{value}\n")
+    
+    return scan_dir
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) != 3 or argv[1] not in ('import', 'export'):
+        print("Usage: python scan_container.py import <scan_dir> | export <scan.lhscan>")
+        return 2
+    if argv[1] == 'import':
+        print(import_directory(argv[2]))
+    else:
+        print(export_directory(argv[2]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
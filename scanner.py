@@ -1,53 +1,299 @@
 import asyncio
+import io
 import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Optional, Callable
+from typing import TYPE_CHECKING, Dict, List, Optional, Callable
 from PIL import Image
-from hardware import Turntable, DepthSensor, Camera
 from api_Clients import GeminiBlenderClient, BlenderClient
 from config_loader import get_config
+from scan_container import ScanContainer, EXTENSION, path_lock
+from rig import Rig
+from job_queue import Job
+from event_bus import JobEvents
+from executors import get_executors
+import event_bus
+import image_ops
+import memory_profile
+import metrics
 
+if TYPE_CHECKING:
+    from latency_planner import LatencyPlanner
+    from turntable_calibration import BurstTable
 
-class Scanner:
+
+SCAN_SECONDS = metrics.histogram('lighthouse_scan_duration_seconds', 'Time to capture all views of one scan')
+CAPTURE_SECONDS = metrics.histogram(
+    'lighthouse_capture_seconds', 'Time per captured angle including rotation and settle',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+)
+GEMINI_SECONDS = metrics.histogram('lighthouse_gemini_seconds', 'Gemini code generation latency')
+GEMINI_ERRORS = metrics.counter('lighthouse_gemini_errors_total', 'Failed Gemini requests by error type')
+JOBS_IN_FLIGHT = metrics.gauge('lighthouse_jobs_in_flight', 'Model generation jobs currently running')
+JOBS_TOTAL = metrics.counter('lighthouse_jobs_total', 'Finished model generation jobs by result')
+STEP_ERROR = metrics.histogram(
+    'lighthouse_turntable_step_error_degrees', 'Measured minus dead-reckoned rotation per step (absolute)',
+    buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 20.0)
+)
+UNMEASURED_STEPS = metrics.counter(
+    'lighthouse_turntable_unmeasured_steps_total', 'Steps whose rotation could not be measured from the images'
+)
+RECONSTRUCTION_FALLBACKS = metrics.counter(
+    'lighthouse_reconstruction_fallbacks_total', 'Jobs that fell back to the visual hull by error type'
+)
+
+
+class SharedClients:
     
     def __init__(self):
-        self.config = get_config()
-        self.turntable = Turntable()
-        self.depth_sensor = DepthSensor()
-        self.camera = Camera()
         self.gemini = None
         self.blender = None
-        self.delay = self.config.get('app', 'scan_delay_seconds', default=0.3)
-        self.steps = self.config.get('hardware', 'turntable', 'steps_per_scan', default=8)
-        self.quality = self.config.get('app', 'image_quality', default=85)
-        self.scans_dir = 'scans'
+        self._planner = None
+        self._lock = threading.Lock()
+    
+    @property
+    def planner(self) -> 'LatencyPlanner':
+        with self._lock:
+            if self._planner is None:
+                from latency_planner import LatencyPlanner
+                self._planner = LatencyPlanner()
+            return self._planner
+    
+    def init(self):
+        with self._lock:
+            if self.gemini is None:
+                try:
+                    self.gemini = GeminiBlenderClient()
+                except Exception as e:
+                    raise Exception(f"Gemini init failed: {e}")
+            if self.blender is None:
+                try:
+                    self.blender = BlenderClient()
+                except Exception as e:
+                    raise Exception(f"Blender init failed: {e}")
+    
+    def cleanup(self):
+        if self.gemini is not None:
+            self.gemini.close()
+
+
+class Scanner:
+    
+    def __init__(self, rig: Optional[Rig] = None, shared: Optional[SharedClients] = None):
+        self.config = get_config()
+        self.rig = rig or Rig()
+        self.shared = shared or SharedClients()
+        self.executors = get_executors()
+        self.turntable = None
+        self.depth_sensor = None
+        self.camera = None
+        self.ready = threading.Event()
+        self.warmup_error = None
+        self.warmup_timings: Dict[str, float] = {}
+        self.steps = self.rig.steps
+        self._settle = None
+        self._cropper = None
+        self._registration = None
+        self.scans_dir = self.rig.scans_dir
         os.makedirs(self.scans_dir, exist_ok=True)
+        self.configure()
+        self.config.subscribe(self.configure, 'app', 'ai.reconstruction.method', 'hardware')
+        self.calibration_settings = self.rig.settings['turntable']['calibration']
+        self.calibration_path = self.calibration_settings['path']
+        if self.rig.label:
+            self.calibration_path = os.path.join(self.scans_dir, os.path.basename(self.calibration_path))
+        self.last_corrections: List[Dict[str, float]] = []
         self.scan_id = None
         self.last_dir = None
+        self.last_container = None
+        self.last_angles: List[float] = []
+        self.last_thumbnail = None
+    
+    def configure(self, changed: Optional[List[str]] = None):
+        self.delay = self.config.get('app', 'scan_delay_seconds')
+        self.cancel_grace = self.config.get('app', 'cancel_grace_seconds')
+        self.quality = self.config.get('app', 'image_quality')
+        self.use_container = self.config.get('app', 'scan_container')
+        self.capture_mode = self.config.get('app', 'capture_mode')
+        self.method = self.config.get('ai', 'reconstruction', 'method')
+        self.upload_mode = self.config.get('app', 'gemini_upload_mode')
+        self.mosaic_size = self.config.get('app', 'mosaic', 'size')
+        self.mosaic_labels = self.config.get('app', 'mosaic', 'labels')
+        if changed is None or any(k.startswith('app.settle.') for k in changed):
+            self._settle = None
+        if changed is None or any(k.startswith('app.crop.') for k in changed):
+            self._cropper = None
+        if changed is not None and any(k.startswith('hardware.') for k in changed):
+            self.rig.refresh()
+            for device, section in ((self.turntable, 'turntable'), (self.depth_sensor, 'depth_sensor'), (self.camera, 'camera')):
+                if hasattr(device, 'configure'):
+                    device.configure(self.rig.settings[section])
+        self.exposure_us = self.rig.settings['camera']['continuous_exposure_us']
+    
+    @property
+    def gemini(self):
+        return self.shared.gemini
+    
+    @property
+    def blender(self):
+        return self.shared.blender
+    
+    @property
+    def planner(self) -> 'LatencyPlanner':
+        return self.shared.planner
+    
+    @property
+    def settle(self):
+        if self._settle is None:
+            from motion_settle import MotionSettle
+            self._settle = MotionSettle()
+        return self._settle
+    
+    @property
+    def cropper(self):
+        if self._cropper is None:
+            from object_crop import ObjectCropper
+            cropper = ObjectCropper()
+            if self.rig.label:
+                cropper.reference_path = os.path.join(self.scans_dir, os.path.basename(cropper.reference_path))
+            self._cropper = cropper
+        return self._cropper
+    
+    @property
+    def registration(self):
+        if self._registration is None:
+            from turntable_calibration import RimRegistration
+            self._registration = RimRegistration(self.calibration_settings)
+        return self._registration
+    
+    def start_warm_up(self, on_done: Optional[Callable[[Optional[str]], None]] = None):
+        def run():
+            self.warm_up()
+            if on_done:
+                on_done(self.warmup_error)
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def warm_up(self):
+        start = time.perf_counter()
+        try:
+            from hardware import Turntable, DepthSensor, Camera
+            self.warmup_timings['import'] = time.perf_counter() - start
+            
+            def build(name, cls):
+                t = time.perf_counter()
+                dev = cls(self.rig.settings[name])
+                self.warmup_timings[name] = time.perf_counter() - t
+                return dev
+            
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                executors = pool.submit(self.executors.warm_up)
+                futures = {
+                    'turntable': pool.submit(build, 'turntable', Turntable),
+                    'depth_sensor': pool.submit(build, 'depth_sensor', DepthSensor),
+                    'camera': pool.submit(build, 'camera', Camera),
+                }
+            devices, errors = {}, []
+            for name, future in futures.items():
+                try:
+                    devices[name] = future.result()
+                except Exception as e:
+                    errors.append(f"{name}: {e}")
+            if errors:
+                self._release(devices)
+                raise Exception('; '.join(errors))
+            self.turntable = devices['turntable']
+            self.depth_sensor = devices['depth_sensor']
+            self.camera = devices['camera']
+            executors.result()
+            from turntable_calibration import BurstTable
+            table = BurstTable.load(self.calibration_path)
+            if table is not None:
+                self.turntable.calibration = table
+                print(f"[INFO] {self.rig.label}Turntable calibration: {table.summary()}")
+        except Exception as e:
+            self.warmup_error = str(e)
+            print(f"{self.rig.label}Error initialising hardware: {e}")
+        finally:
+            self.warmup_timings['total'] = time.perf_counter() - start
+            self.ready.set()
+        
+        parts = ', '.join(f"{k} {v * 1000:.0f} ms" for k, v in self.warmup_timings.items() if k != 'total')
+        print(f"[TIME] {self.rig.label}Hardware warm-up: {self.warmup_timings['total'] * 1000:.0f} ms ({parts})")
+    
+    async def _wait_ready(self):
+        if not self.ready.is_set():
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self.ready.wait)
+        if self.warmup_error:
+            raise Exception(f"Hardware init failed: {self.warmup_error}")
     
     def _init_clients(self):
-        if self.gemini is None:
-            try:
-                self.gemini = GeminiBlenderClient()
-            except Exception as e:
-                raise Exception(f"Gemini init failed: {e}")
-        if self.blender is None:
-            try:
-                self.blender = BlenderClient()
-            except Exception as e:
-                raise Exception(f"Blender init failed: {e}")
+        self.shared.init()
+    
+    async def _cancellable(self, work, cancel: Optional[asyncio.Event], on_cancel: Optional[Callable[[], None]] = None):
+        task = asyncio.ensure_future(work)
+        if cancel is None:
+            return await task
+        
+        waiter = asyncio.ensure_future(cancel.wait())
+        try:
+            await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        if task.done():
+            return task.result()
+        
+        if on_cancel:
+            on_cancel()
+        task.cancel()
+        await asyncio.wait({task}, timeout=self.cancel_grace)
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        raise asyncio.CancelledError("Cancelled")
+    
+    def _list_scans(self) -> List[str]:
+        if not os.path.exists(self.scans_dir):
+            return []
+        ids = set()
+        for entry in os.listdir(self.scans_dir):
+            full = os.path.join(self.scans_dir, entry)
+            if entry.endswith(EXTENSION) and os.path.isfile(full):
+                ids.add(entry[:-len(EXTENSION)])
+            elif os.path.isdir(full):
+                ids.add(entry)
+        return sorted(ids)
     
-    def _load_scan(self, scan_id: Optional[str] = None) -> Optional[tuple[List[Image.Image], float]]:
+    def _load_scan(self, scan_id: Optional[str] = None) -> Optional[tuple[List[bytes], float]]:
         if scan_id is None:
-            if not os.path.exists(self.scans_dir):
-                return None
-            dirs = [d for d in os.listdir(self.scans_dir) 
-                   if os.path.isdir(os.path.join(self.scans_dir, d))]
-            if not dirs:
+            scans = self._list_scans()
+            if not scans:
                 return None
-            scan_id = sorted(dirs)[-1]
+            scan_id = scans[-1]
+        
+        container_path = os.path.join(self.scans_dir, scan_id + EXTENSION)
+        path = container_path if os.path.isfile(container_path) else os.path.join(self.scans_dir, scan_id)
+        data = self._read_scan(path)
+        if data is None:
+            return None
+        
+        imgs, dist, angles = data
+        if path == container_path:
+            self.last_dir = None
+            self.last_container = path
+        else:
+            self.last_dir = path
+            self.last_container = None
+        self.last_angles = angles
+        return imgs, dist
+    
+    def _read_scan(self, path: str) -> Optional[tuple[List[bytes], float, List[float]]]:
+        if path.endswith(EXTENSION):
+            return self._read_container(path)
         
-        scan_dir = os.path.join(self.scans_dir, scan_id)
+        scan_dir = path
         if not os.path.exists(scan_dir):
             return None
         
@@ -65,143 +311,440 @@ class Scanner:
             img_path = os.path.join(scan_dir, f'angle_{i:03d}.jpg')
             if os.path.exists(img_path):
                 try:
-                    imgs.append(Image.open(img_path))
+                    with open(img_path, 'rb') as f:
+                        imgs.append(f.read())
                 except:
                     pass
         
         if len(imgs) == self.steps:
-            self.last_dir = scan_dir
-            return imgs, dist
+            return imgs, dist, self._read_angles(os.path.join(scan_dir, 'angles.txt'))
         return None
     
+    def _read_container(self, path: str) -> Optional[tuple[List[bytes], float, List[float]]]:
+        try:
+            with ScanContainer(path) as container:
+                dist = container.meta.get('distance') or 15.0
+                imgs = [bytes(container.blob(f'angle_{i:03d}.jpg')) for i in range(self.steps)]
+                angles = container.meta.get('angles') or []
+        except (KeyError, ValueError, OSError) as e:
+            print(f"Error loading scan container {path}: {e}")
+            return None
+        
+        return imgs, dist, angles if len(angles) == len(imgs) else self._default_angles()
+    
+    def _default_angles(self) -> List[float]:
+        return [i * 360.0 / self.steps for i in range(self.steps)]
+    
+    def _read_angles(self, path: str) -> List[float]:
+        try:
+            with open(path, 'r') as f:
+                angles = [float(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            angles = []
+        return angles if len(angles) == self.steps else self._default_angles()
+    
+    def _meta_target(self, scan_path: Optional[str]) -> tuple[Optional[str], Optional[str]]:
+        if scan_path is None:
+            return self.last_dir, self.last_container
+        if scan_path.endswith(EXTENSION):
+            return None, scan_path
+        return scan_path, None
+    
+    def _save_meta(self, name: str, value, scan_path: Optional[str] = None):
+        scan_dir, container = self._meta_target(scan_path)
+        if container:
+            ScanContainer.update_meta(container, {name: value})
+        elif scan_dir:
+            with open(os.path.join(scan_dir, f'{name}.txt'), 'w') as f:
+                f.write(f"{value}\n")
+    
+    def _record_model(
+        self,
+        path: str,
+        thumb: Optional[str] = None,
+        mod: Optional[str] = None,
+        scan_path: Optional[str] = None
+    ):
+        scan_dir, container = self._meta_target(scan_path)
+        changes = {'model_path': path}
+        if thumb:
+            changes['thumbnail_path'] = thumb
+        if mod:
+            changes['modification'] = mod
+        if container:
+            with path_lock(container):
+                with ScanContainer(container) as c:
+                    changes['model_history'] = list(c.meta.get('model_history', [])) + [path]
+                ScanContainer.update_meta(container, changes)
+        elif scan_dir:
+            for name, value in changes.items():
+                self._save_meta(name, value, scan_dir)
+            with path_lock(scan_dir):
+                with open(os.path.join(scan_dir, 'model_history.txt'), 'a') as f:
+                    f.write(f"{path}\n")
+    
+    def active_scan_paths(self) -> set:
+        return {p for p in (self.last_dir, self.last_container) if p}
+    
     async def scan_object(
         self,
-        on_progress: Optional[Callable[[str, int], None]] = None,
+        events: Optional[JobEvents] = None,
         cancel: Optional[asyncio.Event] = None
-    ) -> tuple[List[Image.Image], float]:
-        imgs = []
-        
+    ) -> tuple[List[bytes], float]:
         if cancel and cancel.is_set():
             raise asyncio.CancelledError("Cancelled")
         
+        with event_bus.job(self.rig.name, events) as events:
+            await self._wait_ready()
+            if self.rig.capture_lock.locked():
+                events.stage('waiting', f"Waiting for {self.rig.name}...", 0)
+            async with self.rig.capture_lock:
+                with memory_profile.job(f"{self.rig.name}:capture"):
+                    try:
+                        return await self._scan_object(events, cancel)
+                    except asyncio.CancelledError:
+                        self._discard_partial_scan()
+                        raise
+    
+    def _discard_partial_scan(self):
+        if self.last_dir and os.path.isdir(self.last_dir):
+            shutil.rmtree(self.last_dir, ignore_errors=True)
+        self.last_dir = None
+        self.last_container = None
+    
+    async def _scan_object(
+        self,
+        events: JobEvents,
+        cancel: Optional[asyncio.Event]
+    ) -> tuple[List[bytes], float]:
+        scan_start = time.perf_counter()
+        
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.scan_id = ts
         scan_dir = os.path.join(self.scans_dir, ts)
-        os.makedirs(scan_dir, exist_ok=True)
-        self.last_dir = scan_dir
+        blobs = []
+        container = self.use_container
+        mode = self.capture_mode
+        if container:
+            self.last_dir = None
+            self.last_container = None
+        else:
+            os.makedirs(scan_dir, exist_ok=True)
+            self.last_dir = scan_dir
+            self.last_container = None
         
-        if on_progress:
-            on_progress("Measuring distance...", 5)
+        events.stage('capture', "Measuring distance...", 5)
         
         dist = self.depth_sensor.measure_distance()
         
-        with open(os.path.join(scan_dir, 'distance.txt'), 'w') as f:
-            f.write(f"{dist}\n")
+        if not container:
+            with open(os.path.join(scan_dir, 'distance.txt'), 'w') as f:
+                f.write(f"{dist}\n")
         
-        if on_progress:
-            on_progress("Resetting turntable...", 10)
+        events.progress("Resetting turntable...", 10)
         self.turntable.reset_position()
         
+        if mode == 'continuous':
+            frames = await self._capture_continuous(events, cancel)
+            for step, img, _ in frames:
+                self._store_frame(scan_dir, blobs, container, step, img)
+        else:
+            frames = await self._capture_steps(scan_dir, blobs, container, events, cancel)
+        
+        imgs = [data for _, data in blobs]
+        memory_profile.mark('captured')
+        self.last_angles = [angle for _, _, angle in frames]
+        
+        if container:
+            path = scan_dir + EXTENSION
+            ScanContainer.write(path, {'distance': dist, 'angles': self.last_angles}, blobs)
+            self.last_container = path
+        else:
+            with open(os.path.join(scan_dir, 'angles.txt'), 'w') as f:
+                f.write(''.join(f"{a:.2f}\n" for a in self.last_angles))
+        
+        SCAN_SECONDS.observe(time.perf_counter() - scan_start, rig=self.rig.name)
+        memory_profile.mark('scan_written')
+        
+        events.artifact('scan', self.last_container or self.last_dir)
+        events.progress("Scan complete!", 50)
+        
+        return imgs, dist
+    
+    async def capture_reference(self) -> str:
+        await self._wait_ready()
+        async with self.rig.capture_lock:
+            img = self.camera.capture_image()
+        if img is None:
+            raise Exception("Reference capture failed")
+        self.cropper.save_reference(img)
+        return self.cropper.reference_path
+    
+    async def calibrate_turntable(
+        self,
+        events: Optional[JobEvents] = None,
+        cancel: Optional[asyncio.Event] = None
+    ) -> 'BurstTable':
+        from turntable_calibration import TurntableCalibrator
+        await self._wait_ready()
+        async with self.rig.capture_lock:
+            calibrator = TurntableCalibrator(self.turntable, self.camera, self.settle, self.calibration_settings)
+            table = await calibrator.run(events, cancel)
+        table.save(self.calibration_path)
+        self.turntable.calibration = table
+        return table
+    
+    def _store_frame(self, scan_dir: str, blobs: list, container: bool, step: int, img: Image.Image):
+        name = f'angle_{step:03d}.jpg'
+        buf = io.BytesIO()
+        img.save(buf, 'JPEG', quality=self.quality, optimize=True)
+        blobs.append((name, buf.getvalue()))
+        if not container:
+            with open(os.path.join(scan_dir, name), 'wb') as f:
+                f.write(buf.getvalue())
+    
+    async def _capture_steps(
+        self,
+        scan_dir: str,
+        blobs: list,
+        container: bool,
+        events: JobEvents,
+        cancel: Optional[asyncio.Event]
+    ) -> List[tuple[int, Image.Image, float]]:
+        frames = []
+        self.last_corrections = []
+        settle = self.settle
+        loop = asyncio.get_event_loop()
+        closed_loop = self.registration.correct_position
+        previous = None
         for step in range(self.steps):
             if cancel and cancel.is_set():
                 raise asyncio.CancelledError("Cancelled")
             
-            if on_progress:
-                p = 10 + int((step / self.steps) * 40)
-                on_progress(f"Capturing {step + 1}/{self.steps}...", p)
+            events.progress(f"Capturing {step + 1}/{self.steps}...", 10 + int((step / self.steps) * 40))
             
+            step_start = time.perf_counter()
             if step > 0:
-                self.turntable.rotate_step()
-                await asyncio.sleep(self.delay)
+                if closed_loop:
+                    target = step * 360.0 / self.steps
+                    remaining = (target - self.turntable.get_position() + 180) % 360 - 180
+                    if remaining > 0.5:
+                        self.turntable.rotate_step(remaining)
+                else:
+                    self.turntable.rotate_step()
+            
+            if settle.enabled:
+                img, _ = await settle.capture(self.camera)
+            else:
+                if step > 0:
+                    await asyncio.sleep(self.delay)
+                img = self.camera.capture_image()
+            CAPTURE_SECONDS.observe(time.perf_counter() - step_start, mode='step', rig=self.rig.name)
             
-            img = self.camera.capture_image()
             if img:
-                imgs.append(img)
-                img_path = os.path.join(scan_dir, f'angle_{step:03d}.jpg')
-                img.save(img_path, 'JPEG', quality=self.quality, optimize=True)
+                if closed_loop:
+                    signature = await loop.run_in_executor(None, self.registration.signature, img)
+                    if previous is not None:
+                        await loop.run_in_executor(None, self._correct_position, previous[0], previous[1], signature)
+                    previous = (signature, self.turntable.get_position())
+                frames.append((step, img, self.turntable.get_position()))
+                self._store_frame(scan_dir, blobs, container, step, img)
             
             await asyncio.sleep(0.05)
         
-        if on_progress:
-            on_progress("Scan complete!", 50)
-        
-        return imgs, dist
+        return frames
     
-    def _optimize_images(self, imgs: List[Image.Image]) -> List[Image.Image]:
-        result = []
-        max_size = self.config.get('app', 'gemini_image_max_size', default=1024)
-        
-        for img in imgs:
-            if max(img.size) > max_size:
-                ratio = max_size / max(img.size)
-                new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
-                img = img.resize(new_size, Image.Resampling.BILINEAR)
-            result.append(img)
-        
-        return result
+    def _correct_position(self, before, position: float, signature):
+        predicted = (self.turntable.get_position() - position) % 360
+        measured, confidence = self.registration.measure(before, signature)
+        direction = getattr(self.turntable.calibration, 'direction', 1)
+        measured *= direction
+        plausible = 0 <= measured <= max(2 * predicted, predicted + 10)
+        if confidence < self.registration.min_confidence or not plausible:
+            UNMEASURED_STEPS.inc(rig=self.rig.name)
+            self.last_corrections.append({'predicted': predicted, 'measured': None, 'confidence': confidence})
+            return
+        STEP_ERROR.observe(abs(measured - predicted), rig=self.rig.name)
+        self.last_corrections.append({'predicted': predicted, 'measured': measured, 'confidence': confidence})
+        self.turntable.correct_position(position + measured)
+    
+    async def _capture_continuous(
+        self,
+        events: JobEvents,
+        cancel: Optional[asyncio.Event]
+    ) -> List[tuple[int, Image.Image, float]]:
+        speed = self.turntable.degrees_per_second
+        spin_up = self.turntable.spin_up
+        frames = []
+        
+        self.camera.set_exposure(self.exposure_us)
+        start = time.perf_counter()
+        self.turntable.start_continuous()
+        try:
+            for step in range(self.steps):
+                if cancel and cancel.is_set():
+                    raise asyncio.CancelledError("Cancelled")
+                
+                events.progress(
+                    f"Capturing {step + 1}/{self.steps} (continuous)...", 10 + int((step / self.steps) * 40)
+                )
+                
+                target = start + spin_up + (step * 360.0 / self.steps) / speed
+                wait = target - time.perf_counter()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                
+                t0 = time.perf_counter()
+                img = self.camera.capture_image()
+                t1 = time.perf_counter()
+                CAPTURE_SECONDS.observe(t1 - t0, mode='continuous', rig=self.rig.name)
+                if img:
+                    angle = max(0.0, ((t0 + t1) / 2 - start - spin_up) * speed) % 360
+                    frames.append((step, img, angle))
+        finally:
+            self.turntable.stop_continuous()
+            self.camera.reset_exposure()
+        
+        return frames
+    
+    def _record_latency(self, sizes: List[tuple[int, int]], views: int, latency: float, payload: int):
+        usage = getattr(self.gemini, 'last_usage', None) or {}
+        self.planner.record(
+            images=len(sizes),
+            pixels=sum(w * h for w, h in sizes),
+            payload_bytes=payload,
+            latency=latency,
+            prompt_tokens=usage.get('prompt_tokens'),
+            output_tokens=usage.get('output_tokens'),
+            cached_tokens=usage.get('cached_tokens'),
+            mode=self.upload_mode,
+            views=views
+        )
     
     async def generate_code(
         self,
-        imgs: List[Image.Image],
+        imgs: List[image_ops.Frame],
         dist: float,
         mod: Optional[str] = None,
-        on_progress: Optional[Callable[[str, int], None]] = None,
-        cancel: Optional[asyncio.Event] = None
+        events: Optional[JobEvents] = None,
+        cancel: Optional[asyncio.Event] = None,
+        angles: Optional[List[float]] = None
     ) -> str:
         if cancel and cancel.is_set():
             raise asyncio.CancelledError("Cancelled")
         
-        if on_progress:
-            on_progress("Optimizing images...", 55)
-        
-        opt_imgs = self._optimize_images(imgs)
+        with event_bus.job(self.rig.name, events) as events:
+            return await self._generate_code(imgs, dist, mod, events, cancel, angles)
+    
+    async def _generate_code(
+        self,
+        imgs: List[image_ops.Frame],
+        dist: float,
+        mod: Optional[str],
+        events: JobEvents,
+        cancel: Optional[asyncio.Event],
+        angles: Optional[List[float]]
+    ) -> str:
+        events.stage('prepare', "Optimizing images...", 55)
+        loop = asyncio.get_event_loop()
         
-        max_imgs = self.config.get('app', 'gemini_max_images', default=8)
-        if len(opt_imgs) > max_imgs:
-            step = len(opt_imgs) / max_imgs
-            opt_imgs = [opt_imgs[int(i * step)] for i in range(max_imgs)]
+        plan = None
+        if self.planner.enabled:
+            w, h = image_ops.frame_size(imgs[0])
+            plan = self.planner.plan(len(imgs), h / w)
+            print(f"[PLAN] {plan['max_images']} images @ {plan['max_size']}px, "
+                  f"predicted {plan['predicted_seconds']}s ({plan['reason']})")
+        
+        max_imgs = plan['max_images'] if plan else self.config.get('app', 'gemini_max_images')
+        max_size = plan['max_size'] if plan else self.config.get('app', 'gemini_image_max_size')
+        indices = image_ops.select_indices(len(imgs), max_imgs)
+        views = [imgs[i] for i in indices]
+        layout = None
+        if self.upload_mode == 'mosaic':
+            if not angles or len(angles) != len(imgs):
+                angles = [i * 360.0 / len(imgs) for i in range(len(imgs))]
+            layout = ([angles[i] for i in indices], self.mosaic_size, self.mosaic_labels)
+        jpegs, sizes, sheet = await loop.run_in_executor(
+            self.executors.image, image_ops.prepare_upload, views, max_size, self.quality,
+            self.cropper.apply if self.cropper.enabled else None, layout
+        )
+        opt_imgs = [{'mime_type': 'image/jpeg', 'data': data} for data in jpegs]
+        payload = sum(len(data) for data in jpegs)
+        memory_profile.mark('images_prepared')
         
-        if on_progress:
-            on_progress("Generating code...", 60)
+        events.stage('gemini', "Generating code...", 60)
         
         self._init_clients()
         
         if cancel and cancel.is_set():
             raise asyncio.CancelledError("Cancelled")
         
-        loop = asyncio.get_event_loop()
-        code = await loop.run_in_executor(
-            None,
-            lambda: self.gemini.generate_blender_code(opt_imgs, dist, mod)
-        )
+        start = time.perf_counter()
+        if self.gemini.supports_async:
+            request = self.gemini.generate_blender_code_async(opt_imgs, dist, mod, sheet)
+        else:
+            request = loop.run_in_executor(
+                self.executors.network,
+                lambda: self.gemini.generate_blender_code(opt_imgs, dist, mod, sheet)
+            )
+        try:
+            code = await self._cancellable(request, cancel)
+        except Exception as e:
+            GEMINI_ERRORS.inc(type=metrics.error_type(e))
+            raise
+        latency = time.perf_counter() - start
+        GEMINI_SECONDS.observe(latency, mode=self.upload_mode)
+        memory_profile.mark('gemini_done')
+        await loop.run_in_executor(self.executors.network, lambda: self._record_latency(sizes, len(views), latency, payload))
         
         if cancel and cancel.is_set():
             raise asyncio.CancelledError("Cancelled")
         
-        if on_progress:
-            on_progress("Code generated!", 70)
+        events.progress("Code generated!", 70)
         
         return code
     
     async def generate_model(
         self,
-        imgs: List[Image.Image],
+        imgs: List[image_ops.Frame],
         dist: float,
         mod: Optional[str] = None,
-        on_progress: Optional[Callable[[str, int], None]] = None,
+        events: Optional[JobEvents] = None,
         use_prev: bool = False,
         cancel: Optional[asyncio.Event] = None
     ) -> Optional[str]:
-        self._init_clients()
-        
+        JOBS_IN_FLIGHT.inc()
+        result = 'error'
+        try:
+            with memory_profile.job(f"{self.rig.name}:generate"), event_bus.job(self.rig.name, events) as events:
+                path = await self._generate_model(imgs, dist, mod, events, use_prev, cancel)
+            result = 'success' if path else 'empty'
+            return path
+        except asyncio.CancelledError:
+            result = 'cancelled'
+            raise
+        finally:
+            JOBS_IN_FLIGHT.dec()
+            JOBS_TOTAL.inc(result=result)
+    
+    async def _generate_model(
+        self,
+        imgs: List[image_ops.Frame],
+        dist: float,
+        mod: Optional[str],
+        events: JobEvents,
+        use_prev: bool,
+        cancel: Optional[asyncio.Event]
+    ) -> Optional[str]:
         if use_prev:
-            if on_progress:
-                on_progress("Loading previous scan...", 50)
+            events.stage('load', "Loading previous scan...", 50)
             data = self._load_scan()
             if data:
                 imgs, dist = data
             else:
                 raise Exception("No previous scan found")
+            memory_profile.mark('scan_loaded')
+        target = self.last_container or self.last_dir
         
         if not imgs:
             raise Exception("No images available")
@@ -209,72 +752,173 @@ class Scanner:
         if cancel and cancel.is_set():
             raise asyncio.CancelledError("Cancelled")
         
-        code = await self.generate_code(imgs, dist, mod, on_progress, cancel)
+        angles = self.last_angles if len(self.last_angles) == len(imgs) else self._default_angles()
+        path, thumb = await self._reconstruct(imgs, dist, angles, mod, events, cancel)
+        memory_profile.mark('model_built')
+        self.last_thumbnail = thumb
         
-        if cancel and cancel.is_set():
-            raise asyncio.CancelledError("Cancelled")
+        if path and target:
+            await asyncio.get_running_loop().run_in_executor(
+                self.executors.network, self._record_model, path, thumb, mod, target
+            )
         
-        if on_progress:
-            on_progress("Executing Blender...", 75)
+        return path
+    
+    async def _reconstruct(
+        self,
+        imgs: List[image_ops.Frame],
+        dist: float,
+        angles: List[float],
+        mod: Optional[str],
+        events: JobEvents,
+        cancel: Optional[asyncio.Event],
+        on_state: Optional[Callable[[str], None]] = None
+    ) -> tuple[Optional[str], Optional[str]]:
+        if self.method == 'visual_hull':
+            if mod:
+                raise Exception("Modifications need Gemini; set ai.reconstruction.method to blender_bpy or auto")
+            if on_state:
+                on_state('building')
+            return await self._build_hull(imgs, dist, angles, events), None
         
+        try:
+            self._init_clients()
+            if on_state:
+                on_state('generating')
+            code = await self.generate_code(imgs, dist, mod, events, cancel, angles)
+            
+            if cancel and cancel.is_set():
+                raise asyncio.CancelledError("Cancelled")
+            
+            if on_state:
+                on_state('building')
+            path, thumb = await self._build_model(code, events, cancel)
+            if path or self.method != 'auto' or mod:
+                return path, thumb
+            raise Exception("Blender produced no model")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if self.method != 'auto' or mod:
+                raise
+            RECONSTRUCTION_FALLBACKS.inc(type=metrics.error_type(e))
+            print(f"[INFO] {self.rig.label}Falling back to the visual hull: {e}")
+            return await self._build_hull(imgs, dist, angles, events), None
+    
+    async def _build_hull(
+        self,
+        imgs: List[image_ops.Frame],
+        dist: float,
+        angles: List[float],
+        events: JobEvents
+    ) -> Optional[str]:
+        events.stage('hull', "Carving visual hull...", 75)
         loop = asyncio.get_event_loop()
-        path = await loop.run_in_executor(
-            None,
-            lambda: self.blender.generate_3d_model(
-                code,
-                progress_callback=lambda s, p: (
-                    on_progress(s, 75 + int(p * 0.25)) if on_progress else None
-                )
-            )
+        from visual_hull import VisualHull
+        hull = VisualHull(self.cropper.reference_path)
+        path = await loop.run_in_executor(self.executors.image, hull.reconstruct, imgs, angles, dist)
+        if path:
+            events.artifact('model', path)
+        return path
+    
+    async def _build_model(
+        self,
+        code: str,
+        events: JobEvents,
+        cancel: Optional[asyncio.Event]
+    ) -> tuple[Optional[str], Optional[str]]:
+        events.stage('blender', "Executing Blender...", 75)
+        loop = asyncio.get_event_loop()
+        abort = threading.Event()
+        blender_events = events.span(75, 100)
+        path, thumb = await self._cancellable(
+            loop.run_in_executor(
+                self.executors.blender,
+                lambda: self.blender.generate_3d_model_with_thumbnail(code, blender_events, abort)
+            ),
+            cancel,
+            on_cancel=abort.set
         )
         
         if cancel and cancel.is_set():
             raise asyncio.CancelledError("Cancelled")
         
-        if self.last_dir and path:
-            with open(os.path.join(self.last_dir, 'model_path.txt'), 'w') as f:
-                f.write(f"{path}\n")
-            if mod:
-                with open(os.path.join(self.last_dir, 'modification.txt'), 'w') as f:
-                    f.write(f"{mod}\n")
+        if path:
+            events.artifact('model', path)
+        if thumb:
+            events.artifact('thumbnail', thumb)
+        return path, thumb
+    
+    async def run_job(
+        self,
+        job: Job,
+        on_state: Callable[[str], None],
+        cancel: Optional[asyncio.Event] = None
+    ) -> tuple[Optional[str], Optional[str]]:
+        with memory_profile.job(f"{job.rig}:job {job.id}"), event_bus.job(job.rig, job_id=job.id) as events:
+            events.stage('load', "Loading scan...", 50)
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(self.executors.network, self._read_scan, job.scan_path)
+            if data is None:
+                raise Exception(f"Scan not found: {job.scan_path}")
+            imgs, dist, angles = data
+            memory_profile.mark('scan_loaded')
+            
+            path, thumb = await self._reconstruct(imgs, dist, angles, job.modification, events, cancel, on_state)
+            del imgs
+            memory_profile.mark('model_built')
         
-        return path
+        if path:
+            await loop.run_in_executor(
+                self.executors.network, self._record_model, path, thumb, job.modification, job.scan_path
+            )
+        return path, thumb
     
     async def full_scan(
         self,
-        on_progress: Optional[Callable[[str, int], None]] = None,
+        events: Optional[JobEvents] = None,
         cancel: Optional[asyncio.Event] = None
     ) -> Optional[str]:
-        try:
-            if cancel and cancel.is_set():
-                return None
-            
-            imgs, dist = await self.scan_object(on_progress, cancel)
-            
-            if not imgs:
-                raise Exception("No images captured")
-            
-            if cancel and cancel.is_set():
+        with memory_profile.job(f"{self.rig.name}:full_scan"):
+            try:
+                with event_bus.job(self.rig.name, events) as events:
+                    return await self._full_scan(events, cancel)
+            except asyncio.CancelledError:
                 return None
-            
-            path = await self.generate_model(imgs, dist, None, on_progress, False, cancel)
-            
-            if on_progress:
-                on_progress("Complete!", 100)
-            
-            return path
+    
+    async def _full_scan(
+        self,
+        events: JobEvents,
+        cancel: Optional[asyncio.Event]
+    ) -> Optional[str]:
+        if cancel and cancel.is_set():
+            raise asyncio.CancelledError("Cancelled")
         
-        except asyncio.CancelledError:
-            if on_progress:
-                on_progress("Cancelled", 0)
-            return None
-        except Exception as e:
-            if on_progress:
-                on_progress(f"Error: {str(e)}", -1)
-            raise
+        imgs, dist = await self.scan_object(events, cancel)
+        
+        if not imgs:
+            raise Exception("No images captured")
+        
+        if cancel and cancel.is_set():
+            raise asyncio.CancelledError("Cancelled")
+        
+        path = await self.generate_model(imgs, dist, None, events, False, cancel)
+        events.progress("Complete!", 100)
+        return path
+    
+    def _release(self, devices: Dict[str, object]):
+        for name, device in devices.items():
+            try:
+                if hasattr(device, 'close'):
+                    device.close()
+                elif hasattr(device, 'cleanup'):
+                    device.cleanup()
+            except Exception as e:
+                print(f"{self.rig.label}Error releasing {name}: {e}")
     
     def cleanup(self):
-        self.camera.close()
+        if self.camera:
+            self.camera.close()
         if hasattr(self.turntable, 'cleanup'):
             self.turntable.cleanup()
         if hasattr(self.depth_sensor, 'cleanup'):
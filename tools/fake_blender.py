@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+import json
+import os
+import random
+import re
+import struct
+import sys
+import time
+
+
+def minimal_glb() -> bytes:
+    positions = struct.pack('<9f', 0, 0, 0, 1, 0, 0, 0, 1, 0)
+    gltf = {
+        'asset': {'version': '2.0', 'generator': 'fake_blender'},
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [{'mesh': 0}],
+        'meshes': [{'primitives': [{'attributes': {'POSITION': 0}}]}],
+        'buffers': [{'byteLength': len(positions)}],
+        'bufferViews': [{'buffer': 0, 'byteOffset': 0, 'byteLength': len(positions)}],
+        'accessors': [{
+            'bufferView': 0, 'componentType': 5126, 'count': 3, 'type': 'VEC3',
+            'min': [0, 0, 0], 'max': [1, 1, 0],
+        }],
+    }
+    js = json.dumps(gltf).encode('utf-8')
+    js += b' ' * (-len(js) % 4)
+    body = struct.pack('<II', len(js), 0x4E4F534A) + js + struct.pack('<II', len(positions), 0x004E4942) + positions
+    return struct.pack('<III', 0x46546C67, 2, 12 + len(body)) + body
+
+
+def main(argv) -> int:
+    if '--python' not in argv:
+        print("fake_blender: expected --python <script>")
+        return 2
+    with open(argv[argv.index('--python') + 1], 'r') as f:
+        script = f.read()
+
+    seconds = float(os.environ.get('FAKE_BLENDER_SECONDS', '3.0'))
+    jitter = float(os.environ.get('FAKE_BLENDER_JITTER', '0.2'))
+    fail_rate = float(os.environ.get('FAKE_BLENDER_FAIL_RATE', '0'))
+
+    time.sleep(max(0.0, random.gauss(seconds, seconds * jitter)))
+
+    if random.random() < fail_rate:
+        print("ERROR: Injected failure", file=sys.stderr)
+        return 1
+
+    match = re.search(r'^output_path = .*r"(.*)"$', script, re.MULTILINE)
+    if not match:
+        print("ERROR: Export failed: no output path in script")
+        return 1
+
+    output_path = os.environ.get('LIGHTHOUSE_OUTPUT') or match.group(1)
+    with open(output_path, 'wb') as f:
+        f.write(minimal_glb())
+    print(f"SUCCESS: Model exported to {output_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,242 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+from config_loader import get_config
+from event_bus import get_bus
+from executors import MonitoredExecutor, get_executors
+from image_ops import encode_jpeg
+import executors
+from tools.stub_gemini import StubGeminiServer, parse_error_rates
+
+
+FAKE_BLENDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_blender.py')
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def synthetic_scan(steps: int, size: Tuple[int, int]) -> Tuple[List[bytes], float]:
+    imgs = []
+    for i in range(steps):
+        img = Image.linear_gradient('L').resize(size).convert('RGB')
+        draw = ImageDraw.Draw(img)
+        w, h = size
+        shift = int(w * 0.05 * (i - steps / 2) / steps)
+        draw.ellipse((w * 0.35 + shift, h * 0.25, w * 0.65 + shift, h * 0.85), fill=(180, 60, 40))
+        imgs.append(encode_jpeg(img, 85))
+    return imgs, 15.0
+
+
+class SaturationSampler:
+
+    def __init__(self, pools: Dict[str, MonitoredExecutor], interval: float = 0.05):
+        self.pools = pools
+        self.interval = interval
+        self.samples: Dict[str, List[Tuple[int, int]]] = {name: [] for name in pools}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for name, pool in self.pools.items():
+                self.samples[name].append((pool.queued, pool.active))
+            self._stop.wait(self.interval)
+
+    def report(self, name: str) -> Dict[str, float]:
+        samples = self.samples[name]
+        if not samples:
+            return {}
+        workers = self.pools[name].workers
+        queued = [q for q, _ in samples]
+        busy = [b for _, b in samples]
+        return {
+            'workers': workers,
+            'mean_busy': sum(busy) / len(busy),
+            'utilization': sum(busy) / len(busy) / workers,
+            'saturated_fraction': sum(1 for b in busy if b >= workers) / len(busy),
+            'mean_queue': sum(queued) / len(queued),
+            'max_queue': max(queued),
+        }
+
+
+async def run_load(scanner, scans, jobs: int, concurrency: int) -> Tuple[List[float], Counter, float]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: Counter = Counter()
+
+    async def one(i: int):
+        imgs, dist = scans[i % len(scans)]
+        async with sem:
+            start = time.perf_counter()
+            try:
+                await scanner.generate_model(imgs, dist, None, None, False, None)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors[str(e).split(':')[0][:60]] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(jobs)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay scans through Scanner.generate_model against stubs "
+                    "(run from the repository root: python -m tools.loadtest)"
+    )
+    parser.add_argument('--jobs', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=5)
+    parser.add_argument('--scans', nargs='*', default=None, help="Scan ids under scans/ (default: all)")
+    parser.add_argument('--synthetic', type=int, default=0, help="Use N generated scans instead of stored ones")
+    parser.add_argument('--gemini-latency', type=float, default=2.0)
+    parser.add_argument('--gemini-sigma', type=float, default=0.3)
+    parser.add_argument('--gemini-errors', default='', help="e.g. 429=0.05,503=0.01")
+    parser.add_argument('--blender-seconds', type=float, default=3.0)
+    parser.add_argument('--blender-jitter', type=float, default=0.2)
+    parser.add_argument('--blender-fail-rate', type=float, default=0.0)
+    parser.add_argument('--image-workers', type=int, default=None, help="Override app.executors.image.workers")
+    parser.add_argument('--image-kind', choices=('process', 'thread'), default=None)
+    parser.add_argument('--network-workers', type=int, default=None, help="Override app.executors.network.workers")
+    parser.add_argument('--blender-slots', type=int, default=None, help="Override app.executors.blender.slots")
+    parser.add_argument('--upload-mode', choices=('separate', 'mosaic'), default=None,
+                        help="Override app.gemini_upload_mode")
+    parser.add_argument('--mosaic-size', type=int, default=None, help="Override app.mosaic.size")
+    parser.add_argument('--remote-workers', type=int, default=0,
+                        help="Start N Blender workers on localhost and build on them")
+    parser.add_argument('--worker-slots', type=int, default=1, help="Blender slots per remote worker")
+    args = parser.parse_args()
+
+    stub = StubGeminiServer(
+        latency_median=args.gemini_latency,
+        latency_sigma=args.gemini_sigma,
+        error_rates=parse_error_rates(args.gemini_errors)
+    ).start()
+    workdir = tempfile.mkdtemp(prefix='lighthouse_load_')
+
+    cfg = get_config()
+    cfg.set('ai', 'gemini', 'api_key', value='stub')
+    cfg.set('ai', 'gemini', 'api_endpoint', value=stub.endpoint)
+    cfg.set('ai', 'reconstruction', 'blender_path', value=FAKE_BLENDER)
+    cfg.set('ai', 'reconstruction', 'output_format', value='glb')
+    cfg.set('ai', 'reconstruction', 'thumbnail', 'enabled', value=False)
+    cfg.set('app', 'latency_planner', 'history_path', value=os.path.join(workdir, 'gemini_history.jsonl'))
+    cfg.set('app', 'events', 'log_stages', value=False)
+    if args.upload_mode:
+        cfg.set('app', 'gemini_upload_mode', value=args.upload_mode)
+    if args.mosaic_size:
+        cfg.set('app', 'mosaic', 'size', value=args.mosaic_size)
+    for pool, key, value in (('image', 'workers', args.image_workers), ('image', 'kind', args.image_kind),
+                             ('network', 'workers', args.network_workers), ('blender', 'slots', args.blender_slots)):
+        if value is not None:
+            cfg.set('app', 'executors', pool, key, value=value)
+    os.environ['FAKE_BLENDER_SECONDS'] = str(args.blender_seconds)
+    os.environ['FAKE_BLENDER_JITTER'] = str(args.blender_jitter)
+    os.environ['FAKE_BLENDER_FAIL_RATE'] = str(args.blender_fail_rate)
+
+    workers = []
+    if args.remote_workers:
+        from blender_worker import BlenderWorker
+        workers = [BlenderWorker('127.0.0.1', 0, args.worker_slots).start() for _ in range(args.remote_workers)]
+        cfg.set('ai', 'reconstruction', 'remote', 'workers', value=[w.address for w in workers])
+
+    from scanner import Scanner
+    scanner = Scanner()
+
+    if args.synthetic:
+        scans = [synthetic_scan(scanner.steps, (1920, 1080)) for _ in range(args.synthetic)]
+    else:
+        ids = args.scans if args.scans else scanner._list_scans()
+        scans = [s for s in (scanner._load_scan(i) for i in ids) if s]
+    if not scans:
+        print("No scans to replay; record some or pass --synthetic N")
+        return 1
+
+    scanner.last_dir = None
+    scanner.last_container = None
+    scanner._init_clients()
+    scanner.blender.output_dir = workdir
+
+    stages: Dict[str, List[float]] = {}
+    get_bus().subscribe(
+        'loadtest',
+        lambda e: stages.setdefault(e.stage, []).append(e.duration),
+        max_queue=10000,
+        kinds=('stage',)
+    )
+
+    pools = get_executors().pools()
+    get_executors().warm_up()
+    sampler = SaturationSampler(pools)
+
+    async def run():
+        sampler.start()
+        try:
+            return await run_load(scanner, scans, args.jobs, args.concurrency)
+        finally:
+            sampler.stop()
+
+    sizes = ', '.join(f"{name} {pool.workers}" for name, pool in pools.items())
+    print(f"Replaying {len(scans)} scan(s): {args.jobs} jobs, concurrency {args.concurrency}, "
+          f"upload {scanner.upload_mode}, executors: {sizes}")
+    latencies, errors, elapsed = asyncio.run(run())
+    stub.stop()
+    for worker in workers:
+        worker.stop()
+    get_bus().close()
+    executors.shutdown(wait=True)
+
+    print("\n=== Load test results ===")
+    print(f"Jobs:        {args.jobs} ({len(latencies)} ok, {sum(errors.values())} failed)")
+    print(f"Wall time:   {elapsed:.1f} s")
+    print(f"Throughput:  {len(latencies) / elapsed:.2f} jobs/s ({len(latencies) / elapsed * 3600:.0f} jobs/h)")
+    for pct in (50, 90, 95, 99):
+        print(f"p{pct}:         {percentile(latencies, pct):.2f} s")
+    if latencies:
+        print(f"max:         {max(latencies):.2f} s")
+    print(f"Gemini stub: {stub.stats['requests']} requests, {stub.stats['errors']} injected errors, "
+          f"peak {stub.stats['max_in_flight']} concurrent, {stub.stats['cache_hits']} prompt-cache hits")
+    answered = max(1, stub.stats['requests'] - stub.stats['errors'])
+    print(f"Tokens:      {stub.stats['prompt_tokens'] / answered:.0f} prompt / request "
+          f"({stub.stats['image_tokens'] / answered:.0f} for images)")
+    for name in pools:
+        sat = sampler.report(name)
+        if sat:
+            print(f"{name + ':':<13}{sat['utilization'] * 100:.0f}% utilization of {sat['workers']}, "
+                  f"saturated {sat['saturated_fraction'] * 100:.0f}% of the time, "
+                  f"queue mean {sat['mean_queue']:.1f} / max {sat['max_queue']}")
+    for worker in workers:
+        print(f"Worker {worker.address}: {worker.completed} built, {worker.failed} failed")
+    for stage, durations in stages.items():
+        print(f"  {stage:<10} p50 {percentile(durations, 50):.2f} s  p95 {percentile(durations, 95):.2f} s  (n={len(durations)})")
+    for err, count in errors.most_common():
+        print(f"  {count:4d} x {err}")
+    print(f"Artifacts in {workdir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
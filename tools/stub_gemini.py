@@ -0,0 +1,306 @@
+import argparse
+import base64
+import io
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+from PIL import Image
+
+
+STUB_CODE = """import bpy
+bpy.ops.object.select_all(action='SELECT')
+bpy.ops.object.delete(use_global=False)
+bpy.ops.mesh.primitive_cylinder_add(radius=0.04, depth=0.1, location=(0, 0, 0.05))
+mat = bpy.data.materials.new(name="Stub")
+mat.diffuse_color = (0.8, 0.2, 0.2, 1.0)
+bpy.context.active_object.data.materials.append(mat)
+"""
+
+ERRORS = {
+    429: 'RESOURCE_EXHAUSTED',
+    500: 'INTERNAL',
+    503: 'UNAVAILABLE',
+}
+
+
+class StubGeminiServer:
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency_median: float = 2.0,
+        latency_sigma: float = 0.3,
+        error_rates: Optional[Dict[int, float]] = None,
+        seed: Optional[int] = None,
+        cache_min_tokens: int = 4096
+    ):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rates = error_rates or {}
+        self.random = random.Random(seed)
+        self.cache_min_tokens = cache_min_tokens
+        self.caches: Dict[str, dict] = {}
+        self.stats = {'requests': 0, 'errors': 0, 'in_flight': 0, 'max_in_flight': 0,
+                      'cache_creates': 0, 'cache_hits': 0, 'prompt_tokens': 0, 'image_tokens': 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StubGeminiServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _sample(self):
+        with self._lock:
+            latency = self.latency_median * self.random.lognormvariate(0.0, self.latency_sigma)
+            roll = self.random.random()
+        error = None
+        for code, rate in sorted(self.error_rates.items()):
+            if roll < rate:
+                error = code
+                break
+            roll -= rate
+        return latency, error
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _body(self) -> bytes:
+                length = int(self.headers.get('Content-Length', 0))
+                return self.rfile.read(length)
+
+            def _cache_request(self, method: str, body: bytes) -> bool:
+                url = urlparse(self.path)
+                match = re.search(r'/(cachedContents(?:/[^/:]+)?)$', url.path)
+                if not match:
+                    return False
+                code, payload = server.cache_request(method, match.group(1), body, parse_qs(url.query))
+                self._reply(code, payload)
+                return True
+
+            def do_GET(self):
+                if not self._cache_request('GET', b''):
+                    self._reply(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+
+            def do_PATCH(self):
+                if not self._cache_request('PATCH', self._body()):
+                    self._reply(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+
+            def do_DELETE(self):
+                if not self._cache_request('DELETE', b''):
+                    self._reply(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+
+            def do_POST(self):
+                body = self._body()
+                if self._cache_request('POST', body):
+                    return
+
+                with server._lock:
+                    server.stats['requests'] += 1
+                    server.stats['in_flight'] += 1
+                    server.stats['max_in_flight'] = max(server.stats['max_in_flight'], server.stats['in_flight'])
+                try:
+                    latency, error = server._sample()
+                    time.sleep(latency)
+                    if not re.search(r':(stream)?[gG]enerateContent', self.path):
+                        self._reply(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+                    elif error:
+                        with server._lock:
+                            server.stats['errors'] += 1
+                        self._reply(error, {'error': {'code': error, 'message': 'Injected error', 'status': ERRORS.get(error, 'UNKNOWN')}})
+                    else:
+                        try:
+                            self._reply(200, server.response(body))
+                        except KeyError as e:
+                            self._reply(404, {'error': {'code': 404, 'status': 'NOT_FOUND',
+                                                        'message': f'CachedContent not found: {e.args[0]}'}})
+                finally:
+                    with server._lock:
+                        server.stats['in_flight'] -= 1
+
+            def _reply(self, code: int, payload: dict):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _text_tokens(self, node) -> int:
+        if isinstance(node, dict):
+            return sum(len(v) // 4 if k == 'text' else self._text_tokens(v) for k, v in node.items())
+        if isinstance(node, list):
+            return sum(self._text_tokens(v) for v in node)
+        return 0
+
+    def _expire(self):
+        now = datetime.now(timezone.utc)
+        for name in [n for n, c in self.caches.items() if c['_expires'] <= now]:
+            del self.caches[name]
+
+    def _cache_view(self, cache: dict) -> dict:
+        return {k: v for k, v in cache.items() if not k.startswith('_')}
+
+    def _ttl(self, request: dict) -> Optional[timedelta]:
+        ttl = request.get('ttl')
+        if ttl:
+            return timedelta(seconds=float(str(ttl).rstrip('s')))
+        if request.get('expireTime'):
+            return datetime.fromisoformat(request['expireTime'].replace('Z', '+00:00')) - datetime.now(timezone.utc)
+        return None
+
+    def cache_request(self, method: str, path: str, body: bytes, query: Dict[str, list]):
+        not_found = (404, {'error': {'code': 404, 'message': f'CachedContent not found: {path}', 'status': 'NOT_FOUND'}})
+        request = json.loads(body) if body else {}
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._expire()
+            if path == 'cachedContents':
+                if method == 'GET':
+                    return 200, {'cachedContents': [self._cache_view(c) for c in self.caches.values()]}
+                if method != 'POST':
+                    return not_found
+                tokens = self._text_tokens(request.get('systemInstruction')) + self._text_tokens(request.get('contents'))
+                if tokens < self.cache_min_tokens:
+                    return 400, {'error': {'code': 400, 'status': 'INVALID_ARGUMENT',
+                                           'message': f'Cached content is too small. total_token_count={tokens}, '
+                                                      f'min_total_token_count={self.cache_min_tokens}'}}
+                name = f'cachedContents/{uuid.uuid4().hex[:12]}'
+                expires = now + (self._ttl(request) or timedelta(hours=1))
+                self.caches[name] = {
+                    'name': name,
+                    'displayName': request.get('displayName', ''),
+                    'model': request.get('model', ''),
+                    'createTime': now.isoformat().replace('+00:00', 'Z'),
+                    'updateTime': now.isoformat().replace('+00:00', 'Z'),
+                    'expireTime': expires.isoformat().replace('+00:00', 'Z'),
+                    'usageMetadata': {'totalTokenCount': tokens},
+                    '_expires': expires,
+                }
+                self.stats['cache_creates'] += 1
+                return 200, self._cache_view(self.caches[name])
+
+            cache = self.caches.get(path)
+            if cache is None:
+                return not_found
+            if method == 'DELETE':
+                del self.caches[path]
+                return 200, {}
+            if method == 'PATCH':
+                ttl = self._ttl(request.get('cachedContent', request))
+                if ttl is not None:
+                    cache['_expires'] = now + ttl
+                    cache['expireTime'] = cache['_expires'].isoformat().replace('+00:00', 'Z')
+                    cache['updateTime'] = now.isoformat().replace('+00:00', 'Z')
+            return 200, self._cache_view(cache)
+
+    def _image_tokens(self, node) -> int:
+        if isinstance(node, dict):
+            blob = node.get('inlineData') or node.get('inline_data')
+            if blob is None:
+                return sum(self._image_tokens(v) for v in node.values())
+            try:
+                w, h = Image.open(io.BytesIO(base64.b64decode(blob.get('data', '')))).size
+            except Exception:
+                return 258
+            if w <= 384 and h <= 384:
+                return 258
+            return math.ceil(w / 768) * math.ceil(h / 768) * 258
+        if isinstance(node, list):
+            return sum(self._image_tokens(v) for v in node)
+        return 0
+
+    def response(self, body: bytes) -> dict:
+        try:
+            request = json.loads(body)
+        except ValueError:
+            request = {}
+        images = self._image_tokens(request.get('contents'))
+        prompt_tokens = len(body) // 4 if images == 0 else self._text_tokens(request.get('contents')) + images
+        cached_tokens = 0
+        name = request.get('cachedContent')
+        if name:
+            with self._lock:
+                self._expire()
+                cache = self.caches.get(name)
+                if cache is None:
+                    raise KeyError(name)
+                self.stats['cache_hits'] += 1
+                cached_tokens = cache['usageMetadata']['totalTokenCount']
+                prompt_tokens += cached_tokens
+        with self._lock:
+            self.stats['prompt_tokens'] += prompt_tokens
+            self.stats['image_tokens'] += images
+        return {
+            'candidates': [{
+                'content': {'role': 'model', 'parts': [{'text': STUB_CODE}]},
+                'finishReason': 'STOP',
+                'index': 0,
+            }],
+            'usageMetadata': {
+                'promptTokenCount': prompt_tokens,
+                'candidatesTokenCount': len(STUB_CODE) // 4,
+                'totalTokenCount': prompt_tokens + len(STUB_CODE) // 4,
+                'cachedContentTokenCount': cached_tokens,
+            },
+        }
+
+
+def parse_error_rates(spec: str) -> Dict[int, float]:
+    rates = {}
+    for part in filter(None, spec.split(',')):
+        code, rate = part.split('=')
+        rates[int(code)] = float(rate)
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini generateContent and cachedContents APIs")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=2.0, help="Median response latency in seconds")
+    parser.add_argument('--sigma', type=float, default=0.3, help="Log-normal spread of the latency")
+    parser.add_argument('--errors', default='', help="Injected errors, e.g. 429=0.05,503=0.01")
+    parser.add_argument('--cache-min-tokens', type=int, default=4096,
+                        help="Reject context caches smaller than this many tokens, like the real API")
+    args = parser.parse_args()
+
+    server = StubGeminiServer(args.host, args.port, args.latency, args.sigma, parse_error_rates(args.errors),
+                              cache_min_tokens=args.cache_min_tokens)
+    print(f"Stub Gemini listening on {server.endpoint}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
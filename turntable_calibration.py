@@ -0,0 +1,234 @@
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from config_loader import get_config
+from event_bus import JobEvents
+from motion_settle import MotionSettle
+
+
+class BurstTable:
+    
+    def __init__(
+        self,
+        deg_per_ms: float,
+        offset_ms: float,
+        direction: int = 1,
+        residual_deg: float = 0.0,
+        samples: Optional[List[Tuple[float, float]]] = None,
+        created: Optional[float] = None
+    ):
+        self.deg_per_ms = deg_per_ms
+        self.offset_ms = offset_ms
+        self.direction = direction
+        self.residual_deg = residual_deg
+        self.samples = samples or []
+        self.created = created or time.time()
+    
+    def burst_ms(self, degrees: float) -> float:
+        return self.offset_ms + degrees / self.deg_per_ms
+    
+    def angle(self, burst_ms: float) -> float:
+        return max(0.0, (burst_ms - self.offset_ms) * self.deg_per_ms)
+    
+    @classmethod
+    def fit(cls, samples: List[Tuple[float, float]], direction: int = 1) -> 'BurstTable':
+        durations = np.array([s[0] for s in samples], dtype=np.float64)
+        angles = np.array([s[1] for s in samples], dtype=np.float64)
+        if len(np.unique(durations)) < 2:
+            raise Exception(f"Calibration needs at least two burst lengths with good measurements, got {len(samples)} samples")
+        slope, intercept = np.polyfit(durations, angles, 1)
+        if slope <= 0:
+            raise Exception("Calibration failed: longer bursts did not rotate further (is the rim band visible?)")
+        residual = float(np.sqrt(np.mean((slope * durations + intercept - angles) ** 2)))
+        return cls(float(slope), float(-intercept / slope), direction, residual, [tuple(s) for s in samples])
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'deg_per_ms': self.deg_per_ms,
+            'offset_ms': self.offset_ms,
+            'direction': self.direction,
+            'residual_deg': self.residual_deg,
+            'samples': [list(s) for s in self.samples],
+            'created': self.created,
+        }
+    
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+    
+    @classmethod
+    def load(cls, path: str) -> Optional['BurstTable']:
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            return cls(
+                data['deg_per_ms'], data['offset_ms'], data.get('direction', 1), data.get('residual_deg', 0.0),
+                [tuple(s) for s in data.get('samples', [])], data.get('created')
+            )
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Error loading turntable calibration {path}: {e}")
+            return None
+    
+    def summary(self) -> str:
+        return (f"{self.deg_per_ms * 1000:.1f}°/s after {self.offset_ms:.0f} ms dead time "
+                f"(±{self.residual_deg:.1f}°, {len(self.samples)} samples); 45° = {self.burst_ms(45):.0f} ms")
+
+
+class RimRegistration:
+    
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        s = settings if settings is not None else get_config().get('hardware', 'turntable', 'calibration')
+        self.band = s['band']
+        self.span = s['span']
+        self.max_angle = s['max_angle']
+        self.bins = s['bins']
+        self.rows = s['rows']
+        self.min_confidence = s['min_confidence']
+        self.correct_position = s['correct_position']
+        phi = np.radians(np.linspace(-self.max_angle, self.max_angle, self.bins))
+        self.columns = 4 * self.bins
+        xs = (np.sin(phi) + 1) / 2 * (self.columns - 1)
+        self._i0 = np.floor(xs).astype(np.int64)
+        self._i1 = np.minimum(self._i0 + 1, self.columns - 1)
+        self._t = (xs - self._i0).astype(np.float32)
+        self._window = np.hanning(self.bins).astype(np.float32)
+    
+    @property
+    def deg_per_bin(self) -> float:
+        return 2 * self.max_angle / (self.bins - 1)
+    
+    def signature(self, img: Image.Image) -> np.ndarray:
+        w, h = img.size
+        box = (
+            int(self.span[0] * w), int(self.band[0] * h),
+            max(int(self.span[1] * w), int(self.span[0] * w) + 1), max(int(self.band[1] * h), int(self.band[0] * h) + 1)
+        )
+        luma = np.asarray(
+            img.crop(box).convert('L').resize((self.columns, self.rows), Image.Resampling.BILINEAR), dtype=np.float32
+        )
+        strip = luma[:, self._i0] * (1 - self._t) + luma[:, self._i1] * self._t
+        strip -= strip.mean(axis=1, keepdims=True)
+        return strip
+    
+    def _overlap_correlation(self, before: np.ndarray, after: np.ndarray, lag: int) -> float:
+        if lag >= 0:
+            x, y = before[:, :self.bins - lag], after[:, lag:]
+        else:
+            x, y = before[:, -lag:], after[:, :self.bins + lag]
+        x = x - x.mean()
+        y = y - y.mean()
+        if x.std() < 1.0 or y.std() < 1.0:
+            return 0.0
+        return float((x * y).sum()) / math.sqrt(float((x * x).sum()) * float((y * y).sum()))
+    
+    def measure(self, before: np.ndarray, after: np.ndarray, candidates: int = 5) -> Tuple[float, float]:
+        n = 2 * self.bins
+        a = np.fft.rfft(before * self._window, n=n, axis=1)
+        b = np.fft.rfft(after * self._window, n=n, axis=1)
+        cross = np.conj(a) * b
+        corr = np.fft.irfft(cross / (np.abs(cross) + 1e-6), n=n, axis=1).sum(axis=0)
+        
+        limit = int(self.bins * 0.6)
+        lags = np.concatenate([np.arange(0, limit + 1), np.arange(-limit, 0)])
+        values = np.concatenate([corr[:limit + 1], corr[-limit:]])
+        chosen: List[int] = []
+        for lag in lags[np.argsort(values)[::-1]]:
+            if all(abs(lag - c) > 2 for c in chosen):
+                chosen.append(int(lag))
+            if len(chosen) == candidates:
+                break
+        confidence, lag = max((self._overlap_correlation(before, after, lag), lag) for lag in chosen)
+        
+        left, right = corr[(lag - 1) % n], corr[(lag + 1) % n]
+        denom = left - 2 * corr[lag % n] + right
+        shift = lag + (0.5 * (left - right) / denom if denom < 0 else 0.0)
+        return float(shift * self.deg_per_bin), confidence
+
+
+class TurntableCalibrator:
+    
+    def __init__(self, turntable, camera, settle: Optional[MotionSettle] = None, settings: Optional[Dict[str, Any]] = None):
+        s = settings if settings is not None else get_config().get('hardware', 'turntable', 'calibration')
+        self.turntable = turntable
+        self.camera = camera
+        self.settle = settle or MotionSettle()
+        self.registration = RimRegistration(s)
+        self.durations = s['durations_ms']
+        self.repeats = s['repeats']
+        self.delay = get_config().get('app', 'scan_delay_seconds')
+    
+    async def _capture(self) -> Image.Image:
+        if self.settle.enabled:
+            img, _ = await self.settle.capture(self.camera)
+        else:
+            await asyncio.sleep(self.delay)
+            img = self.camera.capture_image()
+        if img is None:
+            raise Exception("Calibration capture failed")
+        return img
+    
+    async def run(
+        self,
+        events: Optional[JobEvents] = None,
+        cancel: Optional[asyncio.Event] = None
+    ) -> BurstTable:
+        loop = asyncio.get_event_loop()
+        trials = [d for d in self.durations for _ in range(self.repeats)]
+        measured: List[Tuple[float, float]] = []
+        rejected = 0
+        start = self.turntable.get_position()
+        
+        previous = await loop.run_in_executor(None, self.registration.signature, await self._capture())
+        for i, duration in enumerate(trials):
+            if cancel and cancel.is_set():
+                raise asyncio.CancelledError("Cancelled")
+            if events:
+                events.progress(f"Calibrating: {duration} ms burst ({i + 1}/{len(trials)})...", int(100 * i / len(trials)))
+            
+            await loop.run_in_executor(None, self.turntable.pulse, duration / 1000.0)
+            current = await loop.run_in_executor(None, self.registration.signature, await self._capture())
+            angle, confidence = self.registration.measure(previous, current)
+            previous = current
+            if confidence >= self.registration.min_confidence:
+                measured.append((float(duration), angle))
+            else:
+                rejected += 1
+            print(f"[CALIB] {duration} ms -> {angle:+.1f}° (confidence {confidence:.2f})")
+        
+        if not measured:
+            raise Exception("Calibration failed: no rotation could be measured (check the band/span settings)")
+        direction = 1 if np.median([a for _, a in measured]) >= 0 else -1
+        table = BurstTable.fit([(d, a * direction) for d, a in measured], direction)
+        self.turntable.correct_position(start + sum(table.angle(d) for d in trials))
+        print(f"[CALIB] {table.summary()}; {rejected} low-confidence measurements dropped")
+        return table
+
+
+def main() -> int:
+    path = sys.argv[1] if len(sys.argv) > 1 else get_config().get(
+        'hardware', 'turntable', 'calibration', 'path'
+    )
+    table = BurstTable.load(path)
+    if table is None:
+        print(f"No turntable calibration at {path}")
+        return 1
+    print(table.summary())
+    print(f"{'burst ms':>9} {'measured':>9} {'fit':>7}")
+    for duration, angle in sorted(table.samples):
+        print(f"{duration:>9.0f} {angle:>8.1f}° {table.angle(duration):>6.1f}°")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,323 @@
+import json
+import math
+import os
+import struct
+import time
+import uuid
+from typing import List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from config_loader import get_config
+import image_ops
+from object_crop import ObjectCropper
+
+
+FORMATS = ('glb', 'ply', 'obj')
+
+Mesh = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+_NEIGHBOURS = [(1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)]
+
+
+def _face_corners() -> List[np.ndarray]:
+    tables = []
+    for normal in _NEIGHBOURS:
+        axis = next(i for i, n in enumerate(normal) if n)
+        u, v = [i for i in range(3) if i != axis]
+        base = np.zeros(3, dtype=np.int64)
+        base[axis] = 1 if normal[axis] > 0 else 0
+        corners = []
+        for du, dv in ((0, 0), (1, 0), (1, 1), (0, 1)):
+            c = base.copy()
+            c[u] += du
+            c[v] += dv
+            corners.append(c)
+        corners = np.array(corners)
+        if np.dot(np.cross(corners[1] - corners[0], corners[2] - corners[0]), normal) < 0:
+            corners = corners[::-1]
+        tables.append(corners)
+    return tables
+
+
+_CORNERS = _face_corners()
+
+
+def fill_holes(mask: np.ndarray) -> np.ndarray:
+    outside = np.zeros_like(mask)
+    outside[0, :] = ~mask[0, :]
+    outside[-1, :] = ~mask[-1, :]
+    outside[:, 0] = ~mask[:, 0]
+    outside[:, -1] = ~mask[:, -1]
+    free = ~mask
+    while True:
+        grown = outside.copy()
+        grown[1:, :] |= outside[:-1, :]
+        grown[:-1, :] |= outside[1:, :]
+        grown[:, 1:] |= outside[:, :-1]
+        grown[:, :-1] |= outside[:, 1:]
+        grown &= free
+        if np.array_equal(grown, outside):
+            return ~outside
+        outside = grown
+
+
+def surface(occupied: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    padded = np.pad(occupied, 1)
+    quads = []
+    for normal, corners in zip(_NEIGHBOURS, _CORNERS):
+        neighbour = np.roll(padded, shift=[-n for n in normal], axis=(0, 1, 2))
+        cells = np.argwhere(padded & ~neighbour)
+        if len(cells):
+            quads.append(cells[:, None, :] + corners[None, :, :])
+    if not quads:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)
+    
+    quads = np.concatenate(quads)
+    verts, inverse = np.unique(quads.reshape(-1, 3), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1, 4)
+    faces = np.concatenate([inverse[:, [0, 1, 2]], inverse[:, [0, 2, 3]]])
+    return (verts - 1).astype(np.float64), faces.astype(np.int64)
+
+
+def smooth(verts: np.ndarray, faces: np.ndarray, iterations: int) -> np.ndarray:
+    if iterations <= 0 or len(faces) == 0:
+        return verts
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    edges = np.unique(np.sort(edges, axis=1), axis=0)
+    degree = np.bincount(edges.ravel(), minlength=len(verts)).astype(np.float64)[:, None]
+    degree[degree == 0] = 1.0
+    
+    for _ in range(iterations):
+        for factor in (0.5, -0.53):
+            total = np.zeros_like(verts)
+            np.add.at(total, edges[:, 0], verts[edges[:, 1]])
+            np.add.at(total, edges[:, 1], verts[edges[:, 0]])
+            verts = verts + factor * (total / degree - verts)
+    return verts
+
+
+def vertex_normals(verts: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    tri = verts[faces]
+    face_normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    normals = np.zeros_like(verts)
+    for i in range(3):
+        np.add.at(normals, faces[:, i], face_normals)
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.maximum(length, 1e-12)
+
+
+def write_ply(path: str, verts: np.ndarray, faces: np.ndarray, colors: np.ndarray):
+    header = (
+        "ply\nformat binary_little_endian 1.0\ncomment lighthouse visual hull\n"
+        f"element vertex {len(verts)}\n"
+        "property float x\nproperty float y\nproperty float z\n"
+        "property uchar red\nproperty uchar green\nproperty uchar blue\n"
+        f"element face {len(faces)}\n"
+        "property list uchar int vertex_indices\nend_header\n"
+    )
+    vertex = np.zeros(len(verts), dtype=[('p', '<f4', 3), ('c', 'u1', 3)])
+    vertex['p'] = verts
+    vertex['c'] = colors
+    face = np.zeros(len(faces), dtype=[('n', 'u1'), ('i', '<i4', 3)])
+    face['n'] = 3
+    face['i'] = faces
+    with open(path, 'wb') as f:
+        f.write(header.encode('ascii'))
+        f.write(vertex.tobytes())
+        f.write(face.tobytes())
+
+
+def write_obj(path: str, verts: np.ndarray, faces: np.ndarray, colors: np.ndarray):
+    rgb = colors / 255.0
+    with open(path, 'w') as f:
+        f.write("# lighthouse visual hull\n")
+        f.writelines(f"v {x:.5f} {y:.5f} {z:.5f} {r:.3f} {g:.3f} {b:.3f}\n"
+                     for (x, y, z), (r, g, b) in zip(verts, rgb))
+        f.writelines(f"f {a + 1} {b + 1} {c + 1}\n" for a, b, c in faces)
+
+
+def write_glb(path: str, verts: np.ndarray, faces: np.ndarray, colors: np.ndarray):
+    positions = np.column_stack([verts[:, 0], verts[:, 2], -verts[:, 1]]).astype('<f4')
+    vertex_colors = np.column_stack([colors, np.full(len(colors), 255)]).astype('u1')
+    indices = faces.astype('<u4').ravel()
+    
+    blobs = [positions.tobytes(), vertex_colors.tobytes(), indices.tobytes()]
+    views = []
+    offset = 0
+    for blob, target in zip(blobs, (34962, 34962, 34963)):
+        views.append({'buffer': 0, 'byteOffset': offset, 'byteLength': len(blob), 'target': target})
+        offset += len(blob) + (-len(blob) % 4)
+    binary = b''.join(blob + b'\0' * (-len(blob) % 4) for blob in blobs)
+    
+    gltf = {
+        'asset': {'version': '2.0', 'generator': 'lighthouse visual hull'},
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [{'mesh': 0, 'name': 'VisualHull'}],
+        'meshes': [{'primitives': [{'attributes': {'POSITION': 0, 'COLOR_0': 1}, 'indices': 2, 'material': 0}]}],
+        'materials': [{'pbrMetallicRoughness': {
+            'baseColorFactor': [1.0, 1.0, 1.0, 1.0], 'metallicFactor': 0.0, 'roughnessFactor': 0.9
+        }}],
+        'accessors': [
+            {'bufferView': 0, 'componentType': 5126, 'count': len(positions), 'type': 'VEC3',
+             'min': positions.min(axis=0).tolist(), 'max': positions.max(axis=0).tolist()},
+            {'bufferView': 1, 'componentType': 5121, 'normalized': True, 'count': len(vertex_colors), 'type': 'VEC4'},
+            {'bufferView': 2, 'componentType': 5125, 'count': len(indices), 'type': 'SCALAR'},
+        ],
+        'bufferViews': views,
+        'buffers': [{'byteLength': len(binary)}],
+    }
+    data = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    data += b' ' * (-len(data) % 4)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<III', 0x46546C67, 2, 12 + 8 + len(data) + 8 + len(binary)))
+        f.write(struct.pack('<II', len(data), 0x4E4F534A))
+        f.write(data)
+        f.write(struct.pack('<II', len(binary), 0x004E4942))
+        f.write(binary)
+
+
+class VisualHull:
+    
+    def __init__(self, reference_path: Optional[str] = None):
+        cfg = get_config()
+        self.format = cfg.get('ai', 'reconstruction', 'output_format')
+        self.voxels = cfg.get('ai', 'reconstruction', 'visual_hull', 'voxels')
+        self.fov = cfg.get('ai', 'reconstruction', 'visual_hull', 'fov_degrees')
+        self.silhouette_size = cfg.get('ai', 'reconstruction', 'visual_hull', 'silhouette_size')
+        self.max_misses = cfg.get('ai', 'reconstruction', 'visual_hull', 'max_misses')
+        self.margin = cfg.get('ai', 'reconstruction', 'visual_hull', 'margin')
+        self.smooth_iterations = cfg.get('ai', 'reconstruction', 'visual_hull', 'smooth_iterations')
+        self.output_dir = 'models'
+        self.cropper = ObjectCropper()
+        self.cropper.analysis_size = self.silhouette_size
+        if reference_path:
+            self.cropper.reference_path = reference_path
+        if self.format not in FORMATS:
+            raise Exception(f"Visual hull cannot write {self.format}; use one of {', '.join(FORMATS)}")
+    
+    def silhouettes(self, imgs: List[Image.Image]) -> List[np.ndarray]:
+        return [fill_holes(mask) for mask in self.cropper.masks(imgs)]
+    
+    def _bounds(self, masks: List[np.ndarray], focal: float, dist: float) -> Tuple[float, float, float, float]:
+        h, w = masks[0].shape
+        cx, cy = (w - 1) / 2, (h - 1) / 2
+        union = np.logical_or.reduce(masks)
+        cols = np.flatnonzero(union.any(axis=0))
+        rows = np.flatnonzero(union.any(axis=1))
+        if len(cols) == 0:
+            raise Exception("No object found in the silhouettes")
+        
+        half = max(abs(cols[0] - cx), abs(cols[-1] - cx)) + 1
+        k = min(half / focal, 0.9)
+        axis = dist / (1.0 - k)
+        radius = k * axis * (1.0 + self.margin)
+        top = (cy - rows[0] + 1) / focal * (axis + radius)
+        bottom = (cy - rows[-1] - 1) / focal * (axis + radius)
+        pad = self.margin * (top - bottom)
+        return axis, radius, bottom - pad, top + pad
+    
+    def carve(self, masks: List[np.ndarray], angles: List[float], dist: float) -> Tuple[np.ndarray, np.ndarray, float]:
+        h, w = masks[0].shape
+        focal = (w / 2) / math.tan(math.radians(self.fov) / 2)
+        axis, radius, z_lo, z_hi = self._bounds(masks, focal, dist)
+        size = max(2 * radius, z_hi - z_lo) / self.voxels
+        shape = (
+            max(1, int(math.ceil(2 * radius / size))),
+            max(1, int(math.ceil(2 * radius / size))),
+            max(1, int(math.ceil((z_hi - z_lo) / size))),
+        )
+        origin = np.array([-radius, -radius, z_lo])
+        
+        grid = np.indices(shape, dtype=np.float32).reshape(3, -1).T
+        centres = origin + (grid + 0.5) * size
+        misses = np.zeros(len(centres), dtype=np.int16)
+        cx, cy = (w - 1) / 2, (h - 1) / 2
+        
+        for mask, angle in zip(masks, angles):
+            theta = math.radians(angle)
+            c, s = math.cos(theta), math.sin(theta)
+            x = c * centres[:, 0] - s * centres[:, 1]
+            y = s * centres[:, 0] + c * centres[:, 1]
+            depth = axis + y
+            u = np.rint(cx + focal * x / depth).astype(np.int64)
+            v = np.rint(cy - focal * centres[:, 2] / depth).astype(np.int64)
+            inside = (u >= 0) & (u < w) & (v >= 0) & (v < h) & (depth > 0)
+            hit = np.zeros(len(centres), dtype=bool)
+            hit[inside] = mask[v[inside], u[inside]]
+            misses += ~hit
+        
+        occupied = (misses <= self.max_misses).reshape(shape)
+        return occupied, origin, size
+    
+    def colorize(
+        self,
+        verts: np.ndarray,
+        normals: np.ndarray,
+        imgs: List[Image.Image],
+        angles: List[float],
+        axis: float,
+        focal: float
+    ) -> np.ndarray:
+        arrays = [np.asarray(img.convert('RGB').resize(self.cropper._grid(img), Image.Resampling.BILINEAR))
+                  for img in imgs]
+        h, w = arrays[0].shape[:2]
+        cx, cy = (w - 1) / 2, (h - 1) / 2
+        scores = np.empty((len(verts), len(angles)))
+        for i, angle in enumerate(angles):
+            theta = math.radians(angle)
+            camera = np.array([-axis * math.sin(theta), -axis * math.cos(theta), 0.0])
+            view = camera - verts
+            view /= np.maximum(np.linalg.norm(view, axis=1, keepdims=True), 1e-12)
+            scores[:, i] = (normals * view).sum(axis=1)
+        best = scores.argmax(axis=1)
+        
+        colors = np.zeros((len(verts), 3), dtype=np.uint8)
+        for i, angle in enumerate(angles):
+            sel = best == i
+            if not sel.any():
+                continue
+            theta = math.radians(angle)
+            c, s = math.cos(theta), math.sin(theta)
+            p = verts[sel]
+            x = c * p[:, 0] - s * p[:, 1]
+            depth = axis + s * p[:, 0] + c * p[:, 1]
+            u = np.clip(np.rint(cx + focal * x / depth), 0, w - 1).astype(np.int64)
+            v = np.clip(np.rint(cy - focal * p[:, 2] / depth), 0, h - 1).astype(np.int64)
+            colors[sel] = arrays[i][v, u]
+        return colors
+    
+    def build(self, imgs: List[Image.Image], angles: List[float], dist_cm: float) -> Mesh:
+        if len(imgs) < 2:
+            raise Exception("Visual hull needs at least two views")
+        if len(angles) != len(imgs):
+            angles = [i * 360.0 / len(imgs) for i in range(len(imgs))]
+        
+        dist = dist_cm / 100.0
+        masks = self.silhouettes(imgs)
+        occupied, origin, size = self.carve(masks, angles, dist)
+        if not occupied.any():
+            raise Exception("Visual hull carved away every voxel; check the background reference and angles")
+        
+        lattice, faces = surface(occupied)
+        lattice = smooth(lattice, faces, self.smooth_iterations)
+        verts = origin + lattice * size
+        
+        h, w = masks[0].shape
+        focal = (w / 2) / math.tan(math.radians(self.fov) / 2)
+        axis = self._bounds(masks, focal, dist)[0]
+        colors = self.colorize(verts, vertex_normals(verts, faces), imgs, angles, axis, focal)
+        
+        verts[:, 2] -= verts[:, 2].min()
+        return verts, faces, colors
+    
+    def reconstruct(self, imgs: List[image_ops.Frame], angles: List[float], dist_cm: float) -> Optional[str]:
+        start = time.perf_counter()
+        verts, faces, colors = self.build([image_ops.decode(img) for img in imgs], angles, dist_cm)
+        
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"hull_{time.time_ns()}_{uuid.uuid4().hex[:12]}.{self.format}")
+        writer = {'glb': write_glb, 'ply': write_ply, 'obj': write_obj}[self.format]
+        writer(path, verts, faces, colors)
+        print(f"[TIME] Visual hull: {len(faces)} triangles in {time.perf_counter() - start:.2f} s")
+        return os.path.abspath(path)